@@ -0,0 +1,117 @@
+"""Memory Benchmark for Expression Nodes
+
+Reports the bytes held per node of the HL language, the symbolic language and the results,
+and the Python memory and peak RSS per explored path of a saturating controller whose paths
+multiply with its number of inputs.
+
+    python benchmarks/node_memory.py --nodes 100000 --inputs 6
+"""
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from seereach.fanalysis import function_symbolic_execution
+from seereach.lang import BinaryOp, Literal, Name, Operator, Type, Value, Variable
+from seereach.parser import SReachParser
+from seereach.result import EMPTY_PATH_CONDITION, EvalResult
+from seereach.symlang import SBinaryOp, SReal, SVariable
+
+SATURATION = """
+fn sat(x: real) -> real {
+    if x < -1.0 {
+        return -1.0
+    } else {
+        if x > 1.0 {
+            return 1.0
+        } else {
+            return x
+        }
+    }
+}
+"""
+
+
+def controller_source(inputs: int) -> str:
+    """a controller saturating each of its inputs, with 3 ** inputs paths"""
+    parameters = ", ".join(f"x{i}: real" for i in range(inputs))
+    lets = "\n".join(f"    let u{i}: real = sat(x{i});" for i in range(inputs))
+    total = " + ".join(f"u{i}" for i in range(inputs))
+    return (
+        f"fn controller({parameters}) -> real {{\n{lets}\n    return {total}\n}}\n"
+        + SATURATION
+    )
+
+
+def bytes_per_object(make, count: int) -> float:
+    """traced bytes retained per object built by make(i)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [make(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the list holding them is not part of the nodes
+    size = after - before - sys.getsizeof(objects)
+    del objects
+    return size / count
+
+
+def node_sizes(count: int):
+    name = Name("x")
+    variable = Variable(name)
+    literal = Literal(Value(Type.REAL, 1.0))
+    symbol = SVariable(name, Type.REAL)
+    return {
+        "lang Variable": bytes_per_object(lambda i: Variable(name), count),
+        "lang Value": bytes_per_object(lambda i: Value(Type.REAL, 1.0), count),
+        "lang BinaryOp": bytes_per_object(
+            lambda i: BinaryOp(variable, Operator.ADD, literal), count
+        ),
+        "symlang SReal (interned)": bytes_per_object(lambda i: SReal(float(i)), count),
+        "symlang SBinaryOp + SReal (interned)": bytes_per_object(
+            lambda i: SBinaryOp(symbol, Operator.ADD, SReal(float(i))), count
+        ),
+        "result EvalResult": bytes_per_object(
+            lambda i: EvalResult(symbol, EMPTY_PATH_CONDITION), count
+        ),
+    }
+
+
+def path_sizes(inputs: int):
+    program = SReachParser.parse(controller_source(inputs))
+    gc.collect()
+    tracemalloc.start()
+    results = function_symbolic_execution(program, "controller")
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    paths = len(results)
+    # ru_maxrss is in kilobytes on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {
+        "paths": paths,
+        "retained bytes per path": retained / paths,
+        "peak traced bytes per path": peak / paths,
+        "peak RSS (MiB)": rss / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--inputs", type=int, default=6)
+    args = parser.parse_args()
+    # paths first: peak RSS is for the whole process
+    for label, size in path_sizes(args.inputs).items():
+        print(f"{label:40s} {size:10.1f}")
+    for label, size in node_sizes(args.nodes).items():
+        print(f"{label:40s} {size:10.1f} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Hybrid Automata from Explored Paths
+
+Exploration yields one result per path, and paths that differ only in the branches they
+took often end in the same flow. A HybridAutomaton groups the results by flow (nodes are
+interned, so structurally equal flows are the same node) into one mode each, whose guard is
+the disjunction of the path conditions of its paths.
+
+The disjunction is kept as a set of conjunctions and simplified:
+
+* a conjunction that contains another one is absorbed by it
+* two conjunctions that differ in a single condition and its negation are resolved into
+  one without it, which undoes the case splits that did not change the flow
+* the conditions every remaining conjunction has are factored out as conjuncts of their own
+"""
+
+from functools import reduce
+from typing import Dict, FrozenSet, Iterator, List, Tuple
+from seereach.lang import Operator
+from seereach.merge import conjunction
+from seereach.result import EvalResult, PathCondition
+from seereach.rewrite import fold_binary_op
+from seereach.symlang import SBoolean, SUnaryOp, SymLang
+
+Conjunction = FrozenSet[SymLang]
+
+
+def _atom(condition: SymLang) -> Tuple[SymLang, bool]:
+    """a condition as an atom and a polarity"""
+    if isinstance(condition, SUnaryOp) and condition.operator == Operator.NOT:
+        return condition.expression, False
+    return condition, True
+
+
+def _absorb(conjunctions: List[Conjunction]) -> List[Conjunction]:
+    """drop repeated conjunctions and those that contain another one"""
+    unique = list(dict.fromkeys(conjunctions))
+    by_size = sorted(unique, key=len)
+    kept = []
+    for c in by_size:
+        if not any(k <= c for k in kept):
+            kept.append(c)
+    kept = set(kept)
+    return [c for c in unique if c in kept]
+
+
+def _resolve(conjunctions: List[Conjunction]) -> List[Conjunction]:
+    """(A and x) or (A and not x) becomes A, repeatedly"""
+    conjunctions = _absorb(conjunctions)
+    while True:
+        seen: Dict[Tuple[Conjunction, SymLang], Tuple[int, bool]] = {}
+        resolved = None
+        for i, c in enumerate(conjunctions):
+            for condition in c:
+                atom, positive = _atom(condition)
+                key = (c - {condition}, atom)
+                other = seen.get(key)
+                if other is not None and other[1] != positive:
+                    resolved = (other[0], i, key[0])
+                    break
+                seen[key] = (i, positive)
+            if resolved is not None:
+                break
+        if resolved is None:
+            return conjunctions
+        i, j, rest = resolved
+        conjunctions = [c for k, c in enumerate(conjunctions) if k not in (i, j)]
+        conjunctions = _absorb(conjunctions + [rest])
+
+
+class Mode:
+    """
+    One mode of a hybrid automaton
+
+    :param index: the position of the mode in the automaton
+    :param flow: the value of the mode (the derivative for a dynamics function)
+    :param shared: the conjuncts of the guard that every path of the mode has
+    :param alternatives: the rest of the guard, one conjunction per alternative (a single
+        empty one when the shared conjuncts are the whole guard)
+    :param paths: the indices of the results the mode comes from
+    :param is_return: whether the mode's value is returned
+    """
+
+    def __init__(
+        self,
+        index: int,
+        flow: SymLang,
+        shared: List[SymLang],
+        alternatives: List[List[SymLang]],
+        paths: List[int],
+        is_return: bool,
+    ):
+        self.index = index
+        self.flow = flow
+        self.shared = shared
+        self.alternatives = alternatives
+        self.paths = paths
+        self.is_return = is_return
+
+    @property
+    def guard_conjuncts(self) -> List[SymLang]:
+        """the guard as a list of conjuncts: the shared ones, then the disjunction"""
+        disjunction = reduce(
+            lambda x, y: fold_binary_op(Operator.OR, x, y),
+            [conjunction(a) for a in self.alternatives],
+        )
+        if disjunction is SBoolean(True):
+            return list(self.shared)
+        return list(self.shared) + [disjunction]
+
+    @property
+    def guard(self) -> SymLang:
+        return conjunction(self.guard_conjuncts)
+
+    def result(self) -> EvalResult:
+        """the mode as a single result"""
+        return EvalResult(
+            self.flow, PathCondition.of(self.guard_conjuncts), self.is_return
+        )
+
+    def __repr__(self) -> str:
+        return f"Mode({self.index}, {self.flow}, {len(self.paths)} paths)"
+
+
+class HybridAutomaton:
+    """
+    The modes of a function, one per distinct flow
+
+    :param results: the paths, e.g. from function_symbolic_execution
+    """
+
+    def __init__(self, results: List[EvalResult]):
+        self.paths = list(results)
+        groups: Dict[Tuple[SymLang, bool], List[int]] = {}
+        for i, result in enumerate(self.paths):
+            groups.setdefault((result.expr_eval, result.is_return), []).append(i)
+
+        self.modes: List[Mode] = []
+        # path index -> mode index
+        self.mode_of: List[int] = [0] * len(self.paths)
+        for (flow, is_return), paths in groups.items():
+            index = len(self.modes)
+            for i in paths:
+                self.mode_of[i] = index
+            self.modes.append(self._mode(index, flow, is_return, paths))
+
+    def _mode(self, index, flow, is_return, paths: List[int]) -> Mode:
+        conditions = [list(self.paths[i].path_condition) for i in paths]
+        # conjuncts keep the order in which the paths first have them
+        position = {}
+        for c in conditions:
+            for condition in c:
+                position.setdefault(condition, len(position))
+        # conjuncts are interned, so identity is equality
+        alternatives = _resolve([frozenset(c) - {SBoolean(True)} for c in conditions])
+        common = frozenset.intersection(*alternatives)
+        shared = sorted(common, key=position.get)
+        alternatives = [sorted(a - common, key=position.get) for a in alternatives]
+        return Mode(index, flow, shared, alternatives, paths, is_return)
+
+    def results(self) -> List[EvalResult]:
+        """the modes as results, one each, for the consumers of exploration results"""
+        return [mode.result() for mode in self.modes]
+
+    def __len__(self) -> int:
+        return len(self.modes)
+
+    def __iter__(self) -> Iterator[Mode]:
+        return iter(self.modes)
+
+    def __getitem__(self, index: int) -> Mode:
+        return self.modes[index]
+
+    def __repr__(self) -> str:
+        return f"HybridAutomaton({len(self.modes)} modes from {len(self.paths)} paths)"
+
+
+def hybrid_automaton(results: List[EvalResult]) -> HybridAutomaton:
+    """group the paths of a function by flow"""
+    return HybridAutomaton(results)
@@ -0,0 +1,231 @@
+"""Code Generation of Vectorized Mode Functions
+
+Turns the results of an exploration into one NumPy function of an (N, d) array of states.
+For every row it returns the index of the active mode (the first result whose guard holds,
+-1 for none) and the derivative given by that mode's flow (NaN for none).
+
+Every distinct node of the guards and flows is emitted once as a temporary, so the
+subexpressions the modes share (nodes are interned) are evaluated once per call.
+"""
+
+import math
+from typing import Dict, List, Sequence
+import numpy as np
+from seereach.numeric import BINARY_UFUNCS, UNARY_UFUNCS
+from seereach.result import EvalResult
+from seereach.symlang import (
+    SBinaryOp,
+    SBoolean,
+    SInteger,
+    SIte,
+    SReal,
+    STuple,
+    SUnaryOp,
+    SVariable,
+    SymLang,
+)
+from seereach.z3convert import free_variables
+
+# the emitted code calls the ufuncs the numeric evaluator uses, by their name in numpy
+_BINARY = {op: f"np.{ufunc.__name__}" for op, ufunc in BINARY_UFUNCS.items()}
+_UNARY = {op: f"np.{ufunc.__name__}" for op, ufunc in UNARY_UFUNCS.items()}
+
+
+def _literal(value) -> str:
+    if isinstance(value, bool):
+        return repr(value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return "np.nan" if math.isnan(value) else ("np.inf" if value > 0 else "-np.inf")
+    return repr(value)
+
+
+class _Emitter:
+    """emits one assignment per distinct node, children first"""
+
+    def __init__(self, variables: Dict[str, str]):
+        self.variables = variables
+        self.lines: List[str] = []
+        self.names: Dict[SymLang, str] = {}
+
+    def emit(self, expr: SymLang) -> str:
+        name = self.names.get(expr)
+        if name is not None:
+            return name
+        if isinstance(expr, (SReal, SInteger, SBoolean)):
+            return _literal(expr.value)
+        elif isinstance(expr, SVariable):
+            return self.variables[expr.name]
+        elif isinstance(expr, SBinaryOp):
+            code = (
+                f"{_BINARY[expr.operator]}({self.emit(expr.left)}, "
+                f"{self.emit(expr.right)})"
+            )
+        elif isinstance(expr, SUnaryOp):
+            code = f"{_UNARY[expr.operator]}({self.emit(expr.expression)})"
+        elif isinstance(expr, SIte):
+            code = (
+                f"np.where({self.emit(expr.condition)}, {self.emit(expr.true_value)}, "
+                f"{self.emit(expr.false_value)})"
+            )
+        else:
+            raise ValueError(f"Cannot generate code for {expr}")
+        name = f"t{len(self.names)}"
+        self.names[expr] = name
+        self.lines.append(f"    {name} = {code}")
+        return name
+
+
+class ModeFunction:
+    """
+    A vectorized function of the modes of a hybrid model
+
+    Calling it with an (N, d) array of states, and the remaining free variables of the
+    model as keyword arguments (scalars or (N,) arrays), gives an (N,) array of mode indices
+    and an (N, k) array of derivatives. active() only computes the modes, and flow() the
+    derivatives in given modes.
+
+    :param results: the modes, e.g. from function_symbolic_execution
+    :param state: the state variable names, in the column order of the states
+    :param parameters: constant values for some of the other free variables
+    """
+
+    def __init__(
+        self,
+        results: List[EvalResult],
+        state: Sequence[str],
+        parameters: Dict[str, float] = None,
+    ):
+        self.results = results
+        self.state = list(state)
+        constants = {} if parameters is None else dict(parameters)
+        flows = [self._flow(r.expr_eval) for r in results]
+        self.dimension = len(flows[0]) if flows else len(self.state)
+        if any(len(f) != self.dimension for f in flows):
+            raise ValueError("modes with flows of different dimensions")
+
+        memo = {}
+        free = set()
+        for result, flow in zip(results, flows):
+            for node in list(result.path_condition) + flow:
+                free |= free_variables(node, memo)
+        self.parameters = sorted(
+            str(v) for v in free - set(self.state) - set(constants)
+        )
+
+        # generated names only, whatever the variables are called
+        variables = {name: f"p{i}" for i, name in enumerate(self.parameters)}
+        variables.update({name: f"x{i}" for i, name in enumerate(self.state)})
+        variables.update({name: _literal(float(v)) for name, v in constants.items()})
+        self._variables = variables
+        self._flows = flows
+
+        self.source = "\n".join(
+            [
+                self._generate("modes", guards=True, flows=True),
+                self._generate("active", guards=True, flows=False),
+                self._generate("flows", guards=False, flows=True),
+            ]
+        )
+        namespace = {"np": np}
+        exec(compile(self.source, "<seereach modes>", "exec"), namespace)
+        self._function = namespace["modes"]
+        self._active = namespace["active"]
+        self._flow_function = namespace["flows"]
+
+    def _generate(self, name: str, guards: bool, flows: bool) -> str:
+        """
+        the source of one generated function
+
+        :param guards: compute the active mode from the guards (otherwise it is an argument)
+        :param flows: compute the derivative of the mode
+        """
+        emitter = _Emitter(self._variables)
+        body = [f"    x{i} = states[:, {i}]" for i in range(len(self.state))]
+        body.append("    n = states.shape[0]")
+        arguments = ["states"]
+        if guards:
+            conjunctions = []
+            for result in self.results:
+                guard = "True"
+                for condition in result.path_condition:
+                    code = emitter.emit(condition)
+                    guard = (
+                        code if guard == "True" else f"np.logical_and({guard}, {code})"
+                    )
+                conjunctions.append(guard)
+        else:
+            arguments.append("mode")
+        if flows:
+            components = [[emitter.emit(e) for e in flow] for flow in self._flows]
+        arguments += [f"p{i}" for i in range(len(self.parameters))]
+        body += emitter.lines
+        returns = []
+        if guards:
+            body.append("    mode = np.full(n, -1)")
+            for m, guard in reversed(list(enumerate(conjunctions))):
+                # the first mode whose guard holds wins
+                body.append(f"    mode = np.where({guard}, {m}, mode)")
+            returns.append("mode")
+        if flows:
+            body.append("    derivative = np.full((n, %d), np.nan)" % self.dimension)
+            for m in range(len(self.results)):
+                body.append(f"    s{m} = mode == {m}")
+            for j in range(self.dimension):
+                for m in range(len(self.results)):
+                    body.append(
+                        f"    derivative[:, {j}] = "
+                        f"np.where(s{m}, {components[m][j]}, derivative[:, {j}])"
+                    )
+            returns.append("derivative")
+        body.append(f"    return {', '.join(returns)}")
+        return f"def {name}({', '.join(arguments)}):\n" + "\n".join(body) + "\n"
+
+    @staticmethod
+    def _flow(expr: SymLang) -> List[SymLang]:
+        if isinstance(expr, STuple):
+            return list(expr.elements)
+        return [expr]
+
+    def _parameter_values(self, parameters) -> list:
+        missing = [p for p in self.parameters if p not in parameters]
+        if missing:
+            raise ValueError(f"Missing parameters: {missing}")
+        return [parameters[p] for p in self.parameters]
+
+    def __call__(self, states, **parameters):
+        """
+        :param states: an (N, d) array, one column per state variable
+        :param parameters: the free variables that are not state variables
+        :return: the mode index per row and the derivative per row
+        """
+        states = np.atleast_2d(np.asarray(states, dtype=float))
+        values = self._parameter_values(parameters)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._function(states, *values)
+
+    def active(self, states, **parameters) -> np.ndarray:
+        """the active mode per row, without computing the derivative"""
+        states = np.atleast_2d(np.asarray(states, dtype=float))
+        values = self._parameter_values(parameters)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._active(states, *values)
+
+    def flow(self, states, mode, **parameters) -> np.ndarray:
+        """the derivative per row in the given mode per row, whatever the guards say"""
+        states = np.atleast_2d(np.asarray(states, dtype=float))
+        values = self._parameter_values(parameters)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._flow_function(states, np.asarray(mode), *values)
+
+
+def compile_modes(
+    results: List[EvalResult], state: Sequence[str], parameters: Dict[str, float] = None
+) -> ModeFunction:
+    """
+    generate the vectorized function of a list of modes
+
+    :param results: the modes, e.g. from function_symbolic_execution
+    :param state: the state variable names, in the column order of the states
+    :param parameters: constant values for some of the other free variables
+    """
+    return ModeFunction(results, state, parameters)
@@ -0,0 +1,329 @@
+"""Closure-tree Compilation of Programs
+
+Context.execute dispatches on the expression type and allocates a Context, with a copy of
+the symbol table, for every subexpression. A CompiledProgram lowers each function body once
+into a tree of closures, one per expression, that already know which handler to run and
+hold their compiled children. Running a closure takes the scope (a Context holding the
+symbol table, the session and the exploration settings) and the path condition of the
+expression, so a new Context is only made where the interpreter makes a new scope: at
+blocks and at function calls.
+
+The closures reuse the Context helpers and produce the same results as the interpreter.
+Context.execute hands over to the compiled form when it is given a CompiledProgram, so a
+compiled program can be used anywhere a Program is.
+"""
+
+from typing import Callable, Dict, List
+from seereach.lang import (
+    Assignment,
+    BinaryOp,
+    Block,
+    Conditional,
+    Expression,
+    FunctionCall,
+    Literal,
+    Name,
+    Operator,
+    Program,
+    Return,
+    TupleExpression,
+    Type,
+    UnaryOp,
+    Variable,
+)
+from seereach.merge import merge_results
+from seereach.product import feasible_product, unique_results
+from seereach.result import EMPTY_PATH_CONDITION, EvalResult, PathCondition
+from seereach.rewrite import fold_unary_op
+from seereach.symlang import SBoolean, STuple, SVariable, SymLang
+
+# scope, path condition -> results
+Handler = Callable[["Context", PathCondition], List[EvalResult]]
+
+
+class CompiledProgram(Program):
+    """
+    A program whose function bodies are compiled to closure trees
+
+    :param program: the program to compile
+    """
+
+    def __init__(self, program: Program):
+        super().__init__(program.functions, program.start)
+        from seereach.context import Context
+
+        self.context_class = Context
+        # filled in place: call handlers look the callee up here when they run
+        self.bodies: Dict[Name, Handler] = {}
+        for name, function in program.functions.items():
+            self.bodies[name] = self.compile(function.body)
+        self._body_ids = {
+            id(function.body): name for name, function in program.functions.items()
+        }
+
+    def __reduce__(self):
+        # closures do not pickle: send the source program and compile it again
+        return (self.__class__, (Program(self.functions, self.start),))
+
+    def execute(self, context) -> List[EvalResult]:
+        """run the compiled form of a context's expression"""
+        name = self._body_ids.get(id(context.expression))
+        if name is not None:
+            handler = self.bodies[name]
+        else:
+            # an entry point such as the initial call, its own context is the scope
+            handler = self.compile(context.expression, statement=True)
+        return handler(context, context.path_condition)
+
+    def compile(self, expression: Expression, statement: bool = False) -> Handler:
+        """
+        lower an expression to a closure
+
+        :param statement: whether the expression runs directly in its scope, so that an
+            assignment updates the scope's symbol table (otherwise the interpreter would
+            assign in a throwaway copy)
+        """
+        if isinstance(expression, Literal):
+            return self._compile_literal(expression)
+        elif isinstance(expression, SVariable):
+            return self._compile_constant(expression)
+        elif isinstance(expression, Variable):
+            return self._compile_variable(expression)
+        elif isinstance(expression, Assignment):
+            return self._compile_assignment(expression, statement)
+        elif isinstance(expression, Block):
+            return self._compile_block(expression)
+        elif isinstance(expression, Conditional):
+            return self._compile_conditional(expression)
+        elif isinstance(expression, FunctionCall):
+            return self._compile_function_call(expression)
+        elif isinstance(expression, BinaryOp):
+            return self._compile_binary_op(expression)
+        elif isinstance(expression, UnaryOp):
+            return self._compile_unary_op(expression)
+        elif isinstance(expression, Return):
+            return self._compile_return(expression)
+        elif isinstance(expression, TupleExpression):
+            return self._compile_tuple(expression)
+        raise ValueError(f"Invalid expression: {expression}")
+
+    def _compile_literal(self, expression: Literal) -> Handler:
+        to_sym = self.context_class._literal_to_sym
+        if expression.value.type == Type.TUPLE:
+            value = STuple([to_sym(e.value) for e in expression.value.value])
+        else:
+            value = to_sym(expression.value)
+        return self._compile_constant(value)
+
+    def _compile_constant(self, value: SymLang) -> Handler:
+        def run(scope, path_condition):
+            return [EvalResult(value, path_condition)]
+
+        return run
+
+    def _compile_variable(self, expression: Variable) -> Handler:
+        name = expression.name
+
+        def run(scope, path_condition):
+            return [
+                EvalResult(
+                    evalr.expr_eval, path_condition.join(evalr.path_condition)
+                ).flatten()
+                for evalr in scope.symbol_table[name]
+            ]
+
+        return run
+
+    def _compile_assignment(self, expression: Assignment, statement: bool) -> Handler:
+        value = self.compile(expression.expression)
+        name = expression.variable.name
+        if not statement:
+            return value
+
+        def run(scope, path_condition):
+            values = value(scope, path_condition)
+            scope.symbol_table[name] = values
+            return values
+
+        return run
+
+    def _compile_block(self, expression: Block) -> Handler:
+        statements = [self.compile(e, statement=True) for e in expression.expressions]
+        context_class = self.context_class
+
+        def run(scope, path_condition):
+            # a block is a scope: its assignments do not leak out
+            block_scope = context_class(expression, scope, path_condition)
+            rets = []
+            for statement in statements:
+                rets = statement(block_scope, path_condition)
+            return rets
+
+        return run
+
+    def _compile_conditional(self, expression: Conditional) -> Handler:
+        condition = self.compile(expression.condition)
+        true_branch = self.compile(expression.true_branch)
+        false_branch = self.compile(expression.false_branch)
+
+        def run(scope, path_condition):
+            rets = []
+            for condition_value in condition(scope, path_condition):
+                guard = condition_value.expr_eval
+                # branches start from an empty path condition, the guard is added after
+                if isinstance(guard, SymLang) and not isinstance(guard, SBoolean):
+                    guards = [
+                        (guard, true_branch),
+                        (fold_unary_op(Operator.NOT, guard), false_branch),
+                    ]
+                    if scope.explorer is not None:
+                        choice = scope.explorer.decide(
+                            scope.session, guards[0][0], guards[1][0]
+                        )
+                        guards = [guards[choice]]
+                    for guard, branch in guards:
+                        rets += _run_guarded(scope, guard, branch)
+                else:
+                    branch = true_branch if guard.value else false_branch
+                    rets += branch(scope, EMPTY_PATH_CONDITION)
+            if scope.merge_states:
+                return merge_results(rets)
+            return rets
+
+        return run
+
+    def _compile_function_call(self, expression: FunctionCall) -> Handler:
+        arguments = [self.compile(a) for a in expression.arguments]
+        function_name = expression.function_name
+        context_class = self.context_class
+        bodies = self.bodies
+        program = self
+
+        def run(scope, path_condition):
+            function = program.functions[function_name]
+            values = [argument(scope, path_condition) for argument in arguments]
+            if scope.summaries is not None:
+                caller = scope
+                if scope.path_condition is not path_condition:
+                    caller = context_class(expression, scope, path_condition)
+                return scope.summaries.call(caller, expression, values, program)
+
+            function_context = context_class(
+                function.body,
+                path_condition=path_condition,
+                session=scope.session,
+                merge_policy=scope.merge_policy,
+                explorer=scope.explorer,
+            )
+            function_context.merge_states = scope.merges(expression)
+            for param_values, param in zip(values, function.parameters):
+                function_context.symbol_table[param.name] = param_values
+            results = bodies[function_name](function_context, path_condition)
+            return [
+                EvalResult(r.expr_eval, r.path_condition, False)
+                for r in reversed(results)
+                if r.is_return
+            ]
+
+        return run
+
+    def _compile_binary_op(self, expression: BinaryOp) -> Handler:
+        left = self.compile(expression.left)
+        right = self.compile(expression.right)
+        operator = expression.operator
+
+        def run(scope, path_condition):
+            rets = []
+            for (left_value, right_value), joined in feasible_product(
+                [left(scope, path_condition), right(scope, path_condition)],
+                path_condition,
+                scope.session,
+            ):
+                rets.append(
+                    EvalResult(
+                        scope.execute_binary_op(
+                            operator, left_value.expr_eval, right_value.expr_eval
+                        ),
+                        path_condition=joined,
+                    ).flatten()
+                )
+            return unique_results(rets)
+
+        return run
+
+    def _compile_unary_op(self, expression: UnaryOp) -> Handler:
+        operand = self.compile(expression.expression)
+        operator = expression.operator
+
+        def run(scope, path_condition):
+            return unique_results(
+                [
+                    EvalResult(
+                        fold_unary_op(operator, value.expr_eval),
+                        path_condition=path_condition.join(value.path_condition),
+                    ).flatten()
+                    for value in operand(scope, path_condition)
+                ]
+            )
+
+        return run
+
+    def _compile_return(self, expression: Return) -> Handler:
+        value = self.compile(expression.expression)
+
+        def run(scope, path_condition):
+            return [
+                EvalResult(ret.expr_eval, ret.path_condition, is_return=True)
+                for ret in value(scope, path_condition)
+            ]
+
+        return run
+
+    def _compile_tuple(self, expression: TupleExpression) -> Handler:
+        elements = [self.compile(e) for e in expression.elements]
+
+        def run(scope, path_condition):
+            groups = [element(scope, path_condition) for element in elements]
+            return unique_results(
+                [
+                    EvalResult(STuple([e.expr_eval for e in r]), joined)
+                    for r, joined in feasible_product(
+                        groups, path_condition, scope.session
+                    )
+                ]
+            )
+
+        return run
+
+
+def _run_guarded(scope, guard: SymLang, branch: Handler) -> List[EvalResult]:
+    """run a branch with its guard on the solver stack, keeping the feasible results"""
+    session = scope.session
+    session.push(guard)
+    try:
+        if scope.explorer is None and not session.is_sat:
+            return []
+        feasible = []
+        for br in branch(scope, EMPTY_PATH_CONDITION):
+            if not session.is_feasible(
+                EvalResult(br.expr_eval, br.path_condition.append(guard))
+            ):
+                continue
+            feasible.append(br)
+    finally:
+        session.pop()
+    if scope.merge_states:
+        feasible = merge_results(feasible)
+    return [
+        EvalResult(
+            br.expr_eval, br.path_condition.append(guard), is_return=br.is_return
+        )
+        for br in feasible
+    ]
+
+
+def compile_program(program: Program) -> CompiledProgram:
+    """compile a program once to run it many times"""
+    if isinstance(program, CompiledProgram):
+        return program
+    return CompiledProgram(program)
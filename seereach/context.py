@@ -1,8 +1,13 @@
 """Symbolic Contexts for SEE-Reach"""
+
+from seereach.compile import CompiledProgram
 from seereach.lang import *
-from seereach.result import EvalResult
+from seereach.merge import merge_results
+from seereach.product import feasible_product, unique_results
+from seereach.result import EvalResult, PathCondition
+from seereach.rewrite import fold_binary_op, fold_unary_op
 from seereach.symlang import *
-from seereach.z3convert import Z3SatConverter
+from seereach.z3convert import Z3Session
 
 
 class Context:
@@ -11,18 +16,49 @@ class Context:
     :param expression: the expression to evaluate
     :param parent: the parent context
     :param path_condition: the path condition that led to this context
+    :param session: the incremental solver session (shared with the parent by default)
+    :param merge_policy: which functions merge paths at their join points: a bool for all
+        of them or a collection of function names (inherited from the parent by default)
+    :param summaries: a FunctionSummaryCache used for function calls (inherited from the
+        parent by default, None executes every call)
+    :param explorer: a PathExplorer that decides symbolic branches, so that one path is
+        executed at a time (inherited from the parent by default)
     """
 
-    def __init__(self, expression: Expression, parent=None, path_condition=None):
+    def __init__(
+        self,
+        expression: Expression,
+        parent=None,
+        path_condition=None,
+        session=None,
+        merge_policy=None,
+        summaries=None,
+        explorer=None,
+    ):
         self.parent = parent
         self.expression: Expression = expression
         self.symbol_table: Dict[str, EvalResult] = (
             {} if parent is None else parent.symbol_table.copy()
         )
-        self.path_condition = [] if path_condition is None else path_condition.copy()
+        self.path_condition: PathCondition = PathCondition.of(path_condition)
         self.branches = []
+        if session is None:
+            session = Z3Session() if parent is None else parent.session
+        self.session: Z3Session = session
+        if merge_policy is None:
+            merge_policy = False if parent is None else parent.merge_policy
+        self.merge_policy = merge_policy
+        if summaries is None and parent is not None:
+            summaries = parent.summaries
+        self.summaries = summaries
+        if explorer is None and parent is not None:
+            explorer = parent.explorer
+        self.explorer = explorer
+        # whether the function being executed merges paths, decided at the call
+        self.merge_states: bool = False if parent is None else parent.merge_states
 
-    def _literal_to_sym(self, literal: Literal):
+    @staticmethod
+    def _literal_to_sym(literal: Literal):
         if literal.type == Type.REAL:
             return SReal(literal.value)
         elif literal.type == Type.INTEGER:
@@ -30,10 +66,12 @@ class Context:
         elif literal.type == Type.BOOLEAN:
             return SBoolean(literal.value)
         elif literal.type == Type.TUPLE:
-            return STuple([self._literal_to_sym(e) for e in literal.value])
+            return STuple([Context._literal_to_sym(e) for e in literal.value])
         raise ValueError(f"Invalid literal type: {literal.type}")
 
     def execute(self, program: Program) -> List[EvalResult]:
+        if isinstance(program, CompiledProgram):
+            return program.execute(self)
         if isinstance(self.expression, Literal):
             # convert the literal to a symbolic expression
             if self.expression.value.type == Type.TUPLE:
@@ -61,7 +99,7 @@ class Context:
         elif isinstance(self.expression, Variable):
             return [
                 EvalResult(
-                    evalr.expr_eval, self.path_condition + evalr.path_condition
+                    evalr.expr_eval, self.path_condition.join(evalr.path_condition)
                 ).flatten()
                 for evalr in self.symbol_table[self.expression.name]
             ]
@@ -93,31 +131,52 @@ class Context:
 
                 self.branches.append((condition_value, true_context, false_context))
 
-                if isinstance(condition_value.expr_eval, SymLang):
+                if isinstance(condition_value.expr_eval, SymLang) and not isinstance(
+                    condition_value.expr_eval, SBoolean
+                ):
                     # If condition involves a symbolic value, execute both branches
-                    # add the true path conditions to the tc
-                    tcs = [
-                        EvalResult(
-                            tc.expr_eval,
-                            tc.path_condition + [condition_value.expr_eval],
-                            is_return=tc.is_return,
-                        )
-                        for tc in true_context.execute(program)
+                    # with the guard pushed onto the solver session, so the checks only
+                    # cost the constraints that are new along this path
+                    guard = condition_value.expr_eval
+                    guards = [
+                        (guard, true_context),
+                        (fold_unary_op(Operator.NOT, guard), false_context),
                     ]
-                    # add the false path conditions to the fc
-                    fcs = [
-                        EvalResult(
-                            fc.expr_eval,
-                            fc.path_condition
-                            + [SUnaryOp(Operator.NOT, condition_value.expr_eval)],
-                            is_return=fc.is_return,
+                    if self.explorer is not None:
+                        # single path: the explorer has checked and picked the branch,
+                        # the results are still checked since the guard was only checked
+                        # against the solver stack, not against the conditions of values
+                        # computed in calls that have returned
+                        choice = self.explorer.decide(
+                            self.session, guards[0][0], guards[1][0]
                         )
-                        for fc in false_context.execute(program)
-                    ]
-                    for r in tcs + fcs:
-                        z3c = Z3SatConverter().add_result(r)
-                        if z3c.is_sat:
-                            rets += [r]
+                        guards = [guards[choice]]
+                    for guard, branch_context in guards:
+                        self.session.push(guard)
+                        try:
+                            if self.explorer is None and not self.session.is_sat:
+                                continue
+                            feasible = []
+                            for br in branch_context.execute(program):
+                                r = EvalResult(
+                                    br.expr_eval,
+                                    br.path_condition.append(guard),
+                                    is_return=br.is_return,
+                                )
+                                if self.session.is_feasible(r):
+                                    feasible += [br]
+                        finally:
+                            self.session.pop()
+                        if self.merge_states:
+                            feasible = merge_results(feasible)
+                        rets += [
+                            EvalResult(
+                                br.expr_eval,
+                                br.path_condition.append(guard),
+                                is_return=br.is_return,
+                            )
+                            for br in feasible
+                        ]
                 else:
                     # If condition is concrete, execute appropriate branch
                     branch_context = (
@@ -126,17 +185,29 @@ class Context:
                         else false_context
                     )
                     rets += branch_context.execute(program)
+            if self.merge_states:
+                # join point: fold the paths of both branches back into one
+                return merge_results(rets)
             return rets
 
         elif isinstance(self.expression, FunctionCall):
             function = program.functions[self.expression.function_name]
+            arguments = [
+                self.execute_sub(arg, program) for arg in self.expression.arguments
+            ]
+            if self.summaries is not None:
+                return self.summaries.call(self, self.expression, arguments, program)
+
             function_context = Context(
-                function.body, path_condition=self.path_condition
+                function.body,
+                path_condition=self.path_condition,
+                session=self.session,
+                merge_policy=self.merge_policy,
+                explorer=self.explorer,
             )
-            for arg, param in zip(self.expression.arguments, function.parameters):
-                function_context.symbol_table[param.name] = self.execute_sub(
-                    arg, program
-                )
+            function_context.merge_states = self.merges(self.expression)
+            for values, param in zip(arguments, function.parameters):
+                function_context.symbol_table[param.name] = values
 
             results = function_context.execute(program)
             # Look for the Return statement in the results
@@ -150,21 +221,21 @@ class Context:
             rets = []
             left_values = self.execute_sub(self.expression.left, program)
             right_values = self.execute_sub(self.expression.right, program)
-            for left_value in left_values:
-                for right_value in right_values:
-                    rets.append(
-                        EvalResult(
-                            self.execute_binary_op(
-                                self.expression.operator,
-                                left_value.expr_eval,
-                                right_value.expr_eval,
-                            ),
-                            path_condition=self.path_condition
-                            + left_value.path_condition
-                            + right_value.path_condition,
-                        ).flatten()
-                    )
-            return rets
+            # pair the compatible results, sharing their common conjuncts
+            for (left_value, right_value), path_condition in feasible_product(
+                [left_values, right_values], self.path_condition, self.session
+            ):
+                rets.append(
+                    EvalResult(
+                        self.execute_binary_op(
+                            self.expression.operator,
+                            left_value.expr_eval,
+                            right_value.expr_eval,
+                        ),
+                        path_condition=path_condition,
+                    ).flatten()
+                )
+            return unique_results(rets)
 
         elif isinstance(self.expression, UnaryOp):
             rets = []
@@ -175,10 +246,10 @@ class Context:
                         self.execute_unary_op(
                             self.expression.operator, value.expr_eval
                         ),
-                        path_condition=self.path_condition + value.path_condition,
+                        path_condition=self.path_condition.join(value.path_condition),
                     ).flatten()
                 )
-            return rets
+            return unique_results(rets)
 
         elif isinstance(self.expression, Return):
             rets = self.execute_sub(self.expression.expression, program)
@@ -193,31 +264,33 @@ class Context:
             for element in self.expression.elements:
                 irets.append(self.execute_sub(element, program))
 
-            # iter prod the rets
-            import itertools
-
             rets = []
-            for r in itertools.product(*irets):
+            for r, path_condition in feasible_product(
+                irets, self.path_condition, self.session
+            ):
                 # create a new tuple
                 te = STuple([e.expr_eval for e in r])
-                er = EvalResult(
-                    te,
-                    list(
-                        itertools.chain.from_iterable([ri.path_condition for ri in r])
-                    ),
-                    is_return=False,
-                )
+                er = EvalResult(te, path_condition, is_return=False)
                 rets.append(er)
-            return rets
+            return unique_results(rets)
         else:
             raise ValueError(f"Invalid expression: {self.expression}")
 
+    def merges(self, call: FunctionCall) -> bool:
+        """whether paths are merged inside a call: the call site wins over the function"""
+        if call.merge is not None:
+            return call.merge
+        if isinstance(self.merge_policy, bool):
+            return self.merge_policy
+        return call.function_name in self.merge_policy
+
     def execute_binary_op(
         self, operator: Operator, left_value: SymLang, right_value: SymLang
     ):
         if isinstance(left_value, SymLang) or isinstance(right_value, SymLang):
-            # If either operand is symbolic, the result will also be symbolic
-            return SBinaryOp(left_value, operator, right_value)
+            # If either operand is symbolic, the result will also be symbolic,
+            # up to the constants and identities that fold away
+            return fold_binary_op(operator, left_value, right_value)
         else:
             if isinstance(left_value, Symbolic) or isinstance(right_value, Symbolic):
                 # If either operand is symbolic, the result will also be symbolic
@@ -225,15 +298,25 @@ class Context:
             else:
                 # The existing code for handling concrete values
                 if operator == Operator.ADD:
-                    return Value(Type.INTEGER, left_value.value + right_value.value)
+                    return Value(
+                        self._arithmetic_type(left_value, right_value),
+                        left_value.value + right_value.value,
+                    )
                 elif operator == Operator.SUB:
-                    return Value(Type.INTEGER, left_value.value - right_value.value)
+                    return Value(
+                        self._arithmetic_type(left_value, right_value),
+                        left_value.value - right_value.value,
+                    )
                 elif operator == Operator.MUL:
-                    return Value(Type.INTEGER, left_value.value * right_value.value)
+                    return Value(
+                        self._arithmetic_type(left_value, right_value),
+                        left_value.value * right_value.value,
+                    )
                 elif operator == Operator.DIV:
                     if right_value.value == 0:
                         raise ValueError("Division by zero")
-                    return Value(Type.INTEGER, left_value.value / right_value.value)
+                    # true division, so the result is real even for integers
+                    return Value(Type.REAL, left_value.value / right_value.value)
                 elif operator == Operator.GREATER:
                     return Value(Type.BOOLEAN, left_value.value > right_value.value)
                 elif operator == Operator.LESS:
@@ -251,12 +334,15 @@ class Context:
                 else:
                     raise ValueError(f"Invalid operator: {operator}")
 
+    @staticmethod
+    def _arithmetic_type(left_value: Value, right_value: Value) -> Type:
+        """integers stay integers, anything else involving a real is real"""
+        if left_value.type == Type.INTEGER and right_value.type == Type.INTEGER:
+            return Type.INTEGER
+        return Type.REAL
+
     def execute_unary_op(self, operator: Operator, value: SymLang):
-        return SUnaryOp(operator, value)
-        if isinstance(value, SymbolicBool):
-            return UnaryOp(operator, value)
-        else:
-            raise NotImplementedError(f"Unary operator {operator} not implemented")
+        return fold_unary_op(operator, value)
 
     def execute_sub(self, expression: Expression, program: Program):
         sub_context = Context(expression, self, self.path_condition)
@@ -264,5 +350,3 @@ class Context:
 
     def __repr__(self):
         return f"Context({self.symbol_table}, {self.branches})"
-
-    
\ No newline at end of file
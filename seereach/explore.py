@@ -0,0 +1,364 @@
+"""Path-at-a-time Exploration
+
+The Context executor explores every path of a function in one recursive pass. The
+PathExplorer instead executes one path per run: the Context asks it to decide each
+symbolic branch. A run replays the branch decisions of its prefix, and past the prefix it
+checks both branches. The search strategy holds the pending prefixes and decides whether a
+run continues down one side of a branch or stops there. Pending prefixes are plain tuples
+of booleans, so they are cheap to keep around and to hand to another process.
+"""
+
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+import z3
+from seereach.context import Context
+from seereach.lang import FunctionCall, Name, Program
+from seereach.result import EvalResult
+from seereach.symlang import SBinaryOp, SIte, STuple, SUnaryOp, SymLang
+from seereach.z3convert import Z3QueryCache, Z3Session
+
+# a path is identified by its branch decisions (True takes the true branch)
+Decisions = Tuple[bool, ...]
+
+
+class InfeasiblePath(Exception):
+    """neither side of a branch could be shown feasible (e.g., the solver said unknown)"""
+
+
+class Suspended(Exception):
+    """the run stopped at a branch and left both sides to the strategy"""
+
+
+class BudgetExhausted(Exception):
+    """the exploration ran out of solver calls or time"""
+
+
+class SearchStrategy:
+    """
+    Pending prefixes and the order to explore them in
+
+    An eager strategy lets a run continue down one side of a new branch (the one returned
+    by first_branch) and keeps the other side pending. Otherwise a run stops at the branch
+    and both sides are pending.
+    """
+
+    eager = True
+
+    def push(self, prefix: Decisions, cost: int):
+        raise NotImplementedError
+
+    def pop(self) -> Decisions:
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def drain(self) -> List[Decisions]:
+        """remove and return every pending prefix"""
+        prefixes = []
+        while len(self) > 0:
+            prefixes.append(self.pop())
+        return prefixes
+
+    def first_branch(self) -> bool:
+        return True
+
+
+class DepthFirst(SearchStrategy):
+    """follow each path to its end, true branch first"""
+
+    def __init__(self):
+        self.stack: List[Decisions] = []
+
+    def push(self, prefix: Decisions, cost: int):
+        self.stack.append(prefix)
+
+    def pop(self) -> Decisions:
+        return self.stack.pop()
+
+    def __len__(self):
+        return len(self.stack)
+
+
+class BreadthFirst(SearchStrategy):
+    """explore the branches level by level"""
+
+    eager = False
+
+    def __init__(self):
+        self.queue = deque()
+
+    def push(self, prefix: Decisions, cost: int):
+        self.queue.append(prefix)
+
+    def pop(self) -> Decisions:
+        return self.queue.popleft()
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class RandomPath(SearchStrategy):
+    """continue down a random side of each branch and resume a random pending prefix"""
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.pending: List[Decisions] = []
+
+    def push(self, prefix: Decisions, cost: int):
+        self.pending.append(prefix)
+
+    def pop(self) -> Decisions:
+        index = self.random.randrange(len(self.pending))
+        self.pending[index], self.pending[-1] = self.pending[-1], self.pending[index]
+        return self.pending.pop()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def first_branch(self) -> bool:
+        return self.random.random() < 0.5
+
+
+class ShortestPathConditionFirst(SearchStrategy):
+    """explore the pending prefix with the smallest path condition (in nodes) first"""
+
+    eager = False
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+
+    def push(self, prefix: Decisions, cost: int):
+        heapq.heappush(self.heap, (cost, next(self.counter), prefix))
+
+    def pop(self) -> Decisions:
+        return heapq.heappop(self.heap)[2]
+
+    def __len__(self):
+        return len(self.heap)
+
+
+STRATEGIES = {
+    "dfs": DepthFirst,
+    "bfs": BreadthFirst,
+    "random": RandomPath,
+    "shortest": ShortestPathConditionFirst,
+}
+
+
+class ExplorationBudget:
+    """
+    Limits for an exploration, None meaning unlimited
+
+    :param max_paths: stop after this many completed paths
+    :param max_solver_calls: stop before exceeding this many feasibility checks (every
+        check of the session counts: branches, operand products and results)
+    :param deadline: wall-clock seconds allowed for the search
+    """
+
+    def __init__(
+        self, max_paths: int = None, max_solver_calls: int = None, deadline=None
+    ):
+        self.max_paths = max_paths
+        self.max_solver_calls = max_solver_calls
+        self.deadline = deadline
+
+
+class ExplorationResult:
+    """the results of a (possibly partial) exploration"""
+
+    def __init__(self, results, complete, paths, solver_calls, elapsed):
+        """
+        :param results: the results of the completed paths
+        :param complete: whether every path was explored
+        :param paths: number of completed paths
+        :param solver_calls: number of feasibility checks made
+        :param elapsed: wall-clock seconds spent
+        """
+        self.results: List[EvalResult] = results
+        self.complete: bool = complete
+        self.paths = paths
+        self.solver_calls = solver_calls
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (
+            f"ExplorationResult({len(self.results)} results, complete={self.complete}, "
+            f"paths={self.paths}, solver_calls={self.solver_calls})"
+        )
+
+
+def expression_size(expr: SymLang, sizes: Dict[SymLang, int]) -> int:
+    """number of nodes in an expression tree (memoized in sizes)"""
+    if expr in sizes:
+        return sizes[expr]
+    if isinstance(expr, SBinaryOp):
+        size = (
+            1 + expression_size(expr.left, sizes) + expression_size(expr.right, sizes)
+        )
+    elif isinstance(expr, SUnaryOp):
+        size = 1 + expression_size(expr.expression, sizes)
+    elif isinstance(expr, SIte):
+        size = 1 + sum(
+            expression_size(e, sizes)
+            for e in (expr.condition, expr.true_value, expr.false_value)
+        )
+    elif isinstance(expr, STuple):
+        size = 1 + sum(expression_size(e, sizes) for e in expr.elements)
+    else:
+        size = 1
+    sizes[expr] = size
+    return size
+
+
+class PathExplorer:
+    """
+    Explores the paths of a function one at a time
+
+    :param program: the program containing the function
+    :param funname: the function to explore
+    :param signature_params: the arguments (SVariables or Literals) of the function
+    :param strategy: the search strategy (depth first by default)
+    :param budget: the limits of the exploration (unlimited by default)
+    :param query_cache: a solver query cache to share with other explorations
+    """
+
+    def __init__(
+        self,
+        program: Program,
+        funname: str,
+        signature_params: List,
+        strategy: SearchStrategy = None,
+        budget: ExplorationBudget = None,
+        query_cache: Z3QueryCache = None,
+    ):
+        self.program = program
+        self.funname = funname
+        self.signature_params = signature_params
+        self.strategy = DepthFirst() if strategy is None else strategy
+        self.budget = ExplorationBudget() if budget is None else budget
+        # one session for all runs, so conversions are shared between paths
+        self.session = Z3Session(cache=query_cache)
+        # every check of the session counts, not only the branch decisions
+        self.session.on_check = self._count_check
+        self.solver_calls = 0
+        self.paths_completed = 0
+        self.complete = True
+        self.started = time.monotonic()
+        self.prefix: Decisions = ()
+        self.decisions: List[bool] = []
+        self._sizes: Dict[SymLang, int] = {}
+
+    def _check_budget(self, solver_calls: int):
+        """raise BudgetExhausted unless there is room for this many more solver calls"""
+        budget = self.budget
+        if (
+            budget.max_solver_calls is not None
+            and self.solver_calls + solver_calls > budget.max_solver_calls
+        ):
+            raise BudgetExhausted()
+        if (
+            budget.deadline is not None
+            and time.monotonic() - self.started > budget.deadline
+        ):
+            raise BudgetExhausted()
+
+    def _count_check(self):
+        """count a feasibility check of the session, raising when it exceeds the budget"""
+        self._check_budget(1)
+        self.solver_calls += 1
+
+    def decide(self, session: Z3Session, guard, negated_guard) -> int:
+        """pick the branch to execute: 0 for the true branch, 1 for the false branch"""
+        depth = len(self.decisions)
+        if depth < len(self.prefix):
+            choice = self.prefix[depth]
+        else:
+            self._check_budget(2)
+            feasible = []
+            for g in (guard, negated_guard):
+                feasible.append(session.check([g]) == z3.sat)
+            if not any(feasible):
+                raise InfeasiblePath()
+            if all(feasible):
+                cost = sum(expression_size(f, self._sizes) for f in session.frames)
+                costs = [
+                    cost + expression_size(g, self._sizes)
+                    for g in (guard, negated_guard)
+                ]
+                decisions = tuple(self.decisions)
+                if not self.strategy.eager:
+                    self.strategy.push(decisions + (True,), costs[0])
+                    self.strategy.push(decisions + (False,), costs[1])
+                    raise Suspended()
+                choice = self.strategy.first_branch()
+                self.strategy.push(decisions + (not choice,), costs[int(choice)])
+            else:
+                choice = feasible[0]
+        self.decisions.append(choice)
+        return 0 if choice else 1
+
+    def run(self, prefix: Decisions = ()) -> List[EvalResult]:
+        """
+        execute the path starting with the given decisions
+
+        Decisions are appended past the prefix, and the prefixes of the branches that were
+        not taken are given to the strategy.
+        """
+        self.prefix = prefix
+        self.decisions = []
+        context = Context(
+            FunctionCall(Name(self.funname), self.signature_params),
+            session=self.session,
+            explorer=self,
+        )
+        try:
+            return context.execute(self.program)
+        except (InfeasiblePath, Suspended):
+            return []
+
+    def paths(self, prefixes=((),)) -> Iterator[EvalResult]:
+        """
+        yield the result of each path as soon as it has been executed
+
+        When the budget runs out, the iteration ends with complete set to False.
+
+        :param prefixes: the decisions to start from (the whole function by default)
+        """
+        self.started = time.monotonic()
+        self.complete = True
+        for prefix in prefixes:
+            self.strategy.push(prefix, 0)
+        while len(self.strategy) > 0:
+            budget = self.budget
+            if (
+                budget.max_paths is not None
+                and self.paths_completed >= budget.max_paths
+            ):
+                self.complete = False
+                return
+            try:
+                self._check_budget(0)
+                results = self.run(self.strategy.pop())
+            except BudgetExhausted:
+                self.complete = False
+                return
+            if len(results) > 0:
+                self.paths_completed += 1
+            yield from results
+
+    def search(self) -> ExplorationResult:
+        """explore within the budget and collect the results"""
+        results = list(self.paths())
+        return ExplorationResult(
+            results,
+            self.complete,
+            self.paths_completed,
+            self.solver_calls,
+            time.monotonic() - self.started,
+        )
@@ -1,29 +1,136 @@
 """Function Analyzer"""
 
-from typing import List
+from typing import Iterator, List
 from seereach.context import Context
+from seereach.explore import (
+    STRATEGIES,
+    ExplorationBudget,
+    ExplorationResult,
+    PathExplorer,
+    SearchStrategy,
+)
+from seereach.icp import ICPChecker
 from seereach.lang import FunctionCall, Name, Program, Type
+from seereach.parallel import explore_parallel
 from seereach.result import EvalResult
+from seereach.summary import FunctionSummaryCache
 from seereach.symlang import SVariable
+from seereach.z3convert import Z3QueryCache, Z3Session
 
 
-def function_symbolic_execution(
-    program: Program, funname: str, signature_params=None
-) -> List[EvalResult]:
-    """Symbolic execution of a function inside a program"""
-    # Create the function signature with SVariables
+def function_signature(program: Program, funname: str, signature_params=None) -> List:
+    """the arguments of a function call, SVariables for every parameter by default"""
     if signature_params is None:
         signature_params = []
         for param in program.functions[funname].parameters:
             signature_params.append(SVariable(param.name, param.variable_type))
+    return signature_params
+
+
+def function_symbolic_execution(
+    program: Program,
+    funname: str,
+    signature_params=None,
+    merge=False,
+    summaries: FunctionSummaryCache = None,
+    query_cache: Z3QueryCache = None,
+    prefilter: ICPChecker = None,
+) -> List[EvalResult]:
+    """
+    Symbolic execution of a function inside a program
+
+    :param program: the program, or a CompiledProgram (see seereach.compile) when the same
+        program is executed many times
+    :param merge: merge paths at conditional join points, either for all functions (bool)
+        or for a collection of function names; FunctionCall.merge overrides it per call site
+    :param summaries: reuse function summaries from this cache instead of executing every
+        call (pass the same cache to share summaries between runs)
+    :param query_cache: answer feasibility checks from this solver query cache (pass the
+        same cache to reuse solver results between runs)
+    :param prefilter: decide nonlinear feasibility checks by interval constraint propagation
+        first, e.g. ICPChecker(bounds) for guards with sin; its bounds are assumed for the
+        inputs
+    """
+    # Create the function signature with SVariables
+    signature_params = function_signature(program, funname, signature_params)
 
     # Create the initial context with symbolic variables 'theta' and 'omega'
     initial_context = Context(
         FunctionCall(
             Name(funname),
             signature_params,
-        )
+        ),
+        session=Z3Session(cache=query_cache, prefilter=prefilter),
+        merge_policy=merge,
+        summaries=summaries,
     )
 
     # Execute the program
     return initial_context.execute(program)
+
+
+def iter_function_symbolic_execution(
+    program: Program, funname: str, signature_params=None
+) -> Iterator[EvalResult]:
+    """
+    Streaming symbolic execution of a function inside a program
+
+    Paths are explored one at a time, depth first, and each result is yielded as soon as its
+    path is known to be feasible. Results come in exploration order, which may differ from
+    the order of function_symbolic_execution. Stopping the iteration stops the exploration.
+    """
+    explorer = PathExplorer(
+        program, funname, function_signature(program, funname, signature_params)
+    )
+    return explorer.paths()
+
+
+def scheduled_function_symbolic_execution(
+    program: Program,
+    funname: str,
+    signature_params=None,
+    strategy="dfs",
+    max_paths: int = None,
+    max_solver_calls: int = None,
+    deadline: float = None,
+    query_cache: Z3QueryCache = None,
+) -> ExplorationResult:
+    """
+    Symbolic execution of a function with a search strategy and an exploration budget
+
+    :param strategy: a SearchStrategy, or one of "dfs", "bfs", "random" and "shortest"
+        (shortest path condition first)
+    :param max_paths: stop after this many completed paths
+    :param max_solver_calls: stop before exceeding this many feasibility checks
+    :param deadline: wall-clock seconds allowed for the search
+    :param query_cache: a solver query cache to share between runs
+    :return: the results found, with complete set to False if the budget ran out first
+    """
+    if not isinstance(strategy, SearchStrategy):
+        strategy = STRATEGIES[strategy]()
+    explorer = PathExplorer(
+        program,
+        funname,
+        function_signature(program, funname, signature_params),
+        strategy=strategy,
+        budget=ExplorationBudget(max_paths, max_solver_calls, deadline),
+        query_cache=query_cache,
+    )
+    return explorer.search()
+
+
+def parallel_function_symbolic_execution(
+    program: Program, funname: str, signature_params=None, max_workers: int = None
+) -> List[EvalResult]:
+    """
+    Symbolic execution of a function with its paths explored on a process pool
+
+    The results are in depth-first exploration order, like
+    iter_function_symbolic_execution, however the work was scheduled.
+    """
+    return explore_parallel(
+        program,
+        funname,
+        function_signature(program, funname, signature_params),
+        max_workers=max_workers,
+    )
@@ -0,0 +1,317 @@
+"""Guard Simplification with Z3
+
+Simplifies path conditions on their Z3 form instead of with sympy.simplify:
+
+* a pipeline of Z3 tactics (simplify, propagate-ineqs and ctx-solver-simplify by default)
+  rewrites the conjunction
+* conjuncts implied by the remaining ones are dropped, one incremental solver query each
+* the result is converted back to SymLang
+
+Terms Z3 is not given (sin, powers) and divisions of integers (which Z3 rounds, unlike the
+real division of SymLang) are abstracted as fresh variables for the solver and put back
+afterwards. Results are cached per guard; conjuncts are interned, so a guard is keyed
+by its tuple of conjuncts.
+"""
+
+from fractions import Fraction
+from typing import Dict, List, Sequence, Tuple
+import z3
+from seereach.lang import Name, Operator, Type
+from seereach.result import EvalResult, PathCondition
+from seereach.rewrite import fold_binary_op, fold_unary_op, fold_ite, substitute
+from seereach.symlang import (
+    SBinaryOp,
+    SBoolean,
+    SInteger,
+    SIte,
+    SReal,
+    STuple,
+    SUnaryOp,
+    SVariable,
+    SymLang,
+)
+from seereach.z3convert import Z3SatConverter
+
+# operators Z3SatConverter does not translate
+_OPAQUE = {Operator.SIN, Operator.POW}
+
+_ARITHMETIC = {Operator.ADD, Operator.SUB, Operator.MUL, Operator.DIV}
+
+_Z3_BINARY = {
+    z3.Z3_OP_LE: Operator.LESS_EQUAL,
+    z3.Z3_OP_LT: Operator.LESS,
+    z3.Z3_OP_GE: Operator.GREATER_EQUAL,
+    z3.Z3_OP_GT: Operator.GREATER,
+    z3.Z3_OP_EQ: Operator.EQUAL,
+    z3.Z3_OP_SUB: Operator.SUB,
+    z3.Z3_OP_DIV: Operator.DIV,
+    z3.Z3_OP_POWER: Operator.POW,
+}
+
+# the comparison that holds where one does not
+_NEGATED = {
+    z3.Z3_OP_LE: Operator.GREATER,
+    z3.Z3_OP_LT: Operator.GREATER_EQUAL,
+    z3.Z3_OP_GE: Operator.LESS,
+    z3.Z3_OP_GT: Operator.LESS_EQUAL,
+}
+
+_Z3_NARY = {
+    z3.Z3_OP_ADD: Operator.ADD,
+    z3.Z3_OP_MUL: Operator.MUL,
+    z3.Z3_OP_AND: Operator.AND,
+    z3.Z3_OP_OR: Operator.OR,
+}
+
+
+def z3_to_symlang(expr: z3.ExprRef, variables: Dict[str, SymLang]) -> SymLang:
+    """
+    convert a Z3 expression back to SymLang
+
+    :param expr: the expression
+    :param variables: name -> the SymLang node of each Z3 constant
+    """
+    memo = {}
+
+    def convert(e):
+        key = e.get_id()
+        if key in memo:
+            return memo[key]
+        kind = e.decl().kind() if z3.is_app(e) else None
+        if z3.is_true(e):
+            node = SBoolean(True)
+        elif z3.is_false(e):
+            node = SBoolean(False)
+        elif z3.is_int_value(e):
+            node = SInteger(e.as_long())
+        elif z3.is_rational_value(e):
+            node = SReal(
+                float(Fraction(e.numerator_as_long(), e.denominator_as_long()))
+            )
+        elif z3.is_algebraic_value(e):
+            node = SReal(float(e.approx(20).as_fraction()))
+        elif z3.is_const(e) and kind == z3.Z3_OP_UNINTERPRETED:
+            try:
+                node = variables[e.decl().name()]
+            except KeyError:
+                raise ValueError(f"Unknown variable: {e}")
+        elif kind in _Z3_NARY:
+            arguments = [convert(a) for a in e.children()]
+            node = arguments[0]
+            for argument in arguments[1:]:
+                node = fold_binary_op(_Z3_NARY[kind], node, argument)
+        elif kind in _Z3_BINARY:
+            left, right = (convert(a) for a in e.children())
+            node = fold_binary_op(_Z3_BINARY[kind], left, right)
+        elif kind == z3.Z3_OP_NOT:
+            # Z3 writes x < c as not (x >= c)
+            inner = e.arg(0)
+            inner_kind = inner.decl().kind() if z3.is_app(inner) else None
+            if inner_kind in _NEGATED and z3.is_arith(inner.arg(0)):
+                left, right = (convert(a) for a in inner.children())
+                node = fold_binary_op(_NEGATED[inner_kind], left, right)
+            else:
+                node = fold_unary_op(Operator.NOT, convert(inner))
+        elif kind == z3.Z3_OP_UMINUS:
+            node = fold_binary_op(Operator.MUL, SReal(-1.0), convert(e.arg(0)))
+        elif kind == z3.Z3_OP_DISTINCT and e.num_args() == 2:
+            node = fold_unary_op(
+                Operator.NOT,
+                fold_binary_op(Operator.EQUAL, convert(e.arg(0)), convert(e.arg(1))),
+            )
+        elif kind == z3.Z3_OP_ITE:
+            node = fold_ite(*(convert(a) for a in e.children()))
+        elif kind in (z3.Z3_OP_TO_REAL, z3.Z3_OP_TO_INT):
+            node = convert(e.arg(0))
+        else:
+            raise ValueError(f"Cannot convert {e} to SymLang")
+        memo[key] = node
+        return node
+
+    return convert(expr)
+
+
+def _is_integer(node: SymLang) -> bool:
+    """whether Z3 gives a term the integer sort"""
+    if isinstance(node, SInteger):
+        return True
+    if isinstance(node, SVariable):
+        return node.variable_type == Type.INTEGER
+    if isinstance(node, SBinaryOp) and node.operator in _ARITHMETIC:
+        return _is_integer(node.left) and _is_integer(node.right)
+    if isinstance(node, SIte):
+        return _is_integer(node.true_value) and _is_integer(node.false_value)
+    return False
+
+
+def _is_opaque(node: SymLang) -> bool:
+    if not isinstance(node, (SUnaryOp, SBinaryOp)):
+        return False
+    if node.operator in _OPAQUE:
+        return True
+    # Z3 rounds the quotient of two integers, its simplifications would not hold for DIV
+    return node.operator == Operator.DIV and _is_integer(node)
+
+
+def _abstract(conditions: Sequence[SymLang]) -> Dict[SymLang, SVariable]:
+    """fresh variables for the subterms Z3 is not given, by node"""
+    opaque: Dict[SymLang, SVariable] = {}
+    seen = set()
+    stack = list(conditions)
+    while stack:
+        node = stack.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        if _is_opaque(node):
+            opaque[node] = SVariable(Name(f"opaque!{len(opaque)}"), Type.REAL)
+        elif isinstance(node, SBinaryOp):
+            stack += [node.left, node.right]
+        elif isinstance(node, SUnaryOp):
+            stack.append(node.expression)
+        elif isinstance(node, SIte):
+            stack += [node.condition, node.true_value, node.false_value]
+        elif isinstance(node, STuple):
+            stack += list(node.elements)
+    return opaque
+
+
+class GuardSimplifier:
+    """
+    Simplifies guards (conjunctions of conditions) with Z3, caching the result per guard
+
+    :param tactics: the Z3 tactics to run, in order
+    :param timeout: milliseconds the tactics may take per guard (the guard is only pruned
+        of implied conjuncts when they time out)
+    """
+
+    def __init__(
+        self,
+        tactics: Sequence[str] = ("simplify", "propagate-ineqs", "ctx-solver-simplify"),
+        timeout: int = None,
+    ):
+        self.tactics = list(tactics)
+        self.timeout = timeout
+        self.cache: Dict[Tuple[SymLang, ...], List[SymLang]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def simplify(self, conditions: Sequence[SymLang]) -> List[SymLang]:
+        """
+        a simpler list of conjuncts equivalent to a guard
+
+        :param conditions: the conjuncts, e.g. a path condition
+        """
+        key = tuple(conditions)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return list(cached)
+        self.misses += 1
+        simplified = self._simplify(key)
+        self.cache[key] = simplified
+        return list(simplified)
+
+    def _simplify(self, conditions: Tuple[SymLang, ...]) -> List[SymLang]:
+        conditions = [c for c in conditions if c is not SBoolean(True)]
+        if any(c is SBoolean(False) for c in conditions):
+            return [SBoolean(False)]
+        if len(conditions) == 0:
+            return []
+
+        opaque = _abstract(conditions)
+        memo = {}
+        abstracted = [substitute(c, opaque, memo) for c in conditions]
+        converter = Z3SatConverter()
+        for condition in abstracted:
+            converter.collect_variables(condition)
+        formulas = [converter.convert(c) for c in abstracted]
+
+        goal = z3.Goal()
+        goal.add(*formulas)
+        if len(self.tactics) > 0:
+            if len(self.tactics) == 1:
+                tactic = z3.Tactic(self.tactics[0])
+            else:
+                tactic = z3.Then(*self.tactics)
+            if self.timeout is not None:
+                tactic = z3.TryFor(tactic, self.timeout)
+            try:
+                subgoals = tactic(goal)
+                if len(subgoals) == 1:
+                    formulas = list(subgoals[0])
+            except z3.Z3Exception:
+                # a tactic gave up (e.g. timed out): keep the formulas as they are
+                pass
+        formulas = self._prune(formulas)
+
+        variables = {}
+        for condition in abstracted:
+            self._variables(condition, variables)
+        try:
+            simplified = [z3_to_symlang(f, variables) for f in formulas]
+        except ValueError:
+            # the tactics introduced terms SymLang has no counterpart for
+            return conditions
+        if any(c is SBoolean(False) for c in simplified):
+            return [SBoolean(False)]
+        # put the abstracted subterms back
+        restore = {variable: node for node, variable in opaque.items()}
+        memo = {}
+        simplified = [substitute(c, restore, memo) for c in simplified]
+        return [c for c in simplified if c is not SBoolean(True)]
+
+    @staticmethod
+    def _variables(expr: SymLang, variables: Dict[str, SymLang]):
+        stack = [expr]
+        seen = set()
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            if isinstance(node, SVariable):
+                variables[str(node.name)] = node
+            elif isinstance(node, SBinaryOp):
+                stack += [node.left, node.right]
+            elif isinstance(node, SUnaryOp):
+                stack.append(node.expression)
+            elif isinstance(node, SIte):
+                stack += [node.condition, node.true_value, node.false_value]
+
+    def _prune(self, formulas: List[z3.ExprRef]) -> List[z3.ExprRef]:
+        """drop the formulas implied by the others"""
+        if len(formulas) < 2:
+            return formulas
+        solver = z3.Solver()
+        if self.timeout is not None:
+            solver.set("timeout", self.timeout)
+        keep = [z3.Bool(f"keep!{i}") for i in range(len(formulas))]
+        negated = [z3.Bool(f"negated!{i}") for i in range(len(formulas))]
+        for f, k, n in zip(formulas, keep, negated):
+            solver.add(z3.Implies(k, f))
+            solver.add(z3.Implies(n, z3.Not(f)))
+        kept = list(range(len(formulas)))
+        # later conjuncts first: they are the ones a path added last
+        for i in reversed(range(len(formulas))):
+            others = [keep[j] for j in kept if j != i]
+            if solver.check(*others, negated[i]) == z3.unsat:
+                kept.remove(i)
+        return [formulas[i] for i in kept]
+
+    def simplify_result(self, result: EvalResult) -> EvalResult:
+        """the result with its path condition simplified"""
+        return EvalResult(
+            result.expr_eval,
+            PathCondition.of(self.simplify(result.path_condition)),
+            result.is_return,
+        )
+
+    def simplify_results(self, results: List[EvalResult]) -> List[EvalResult]:
+        return [self.simplify_result(r) for r in results]
+
+    def __repr__(self) -> str:
+        return (
+            f"GuardSimplifier({len(self.cache)} guards, {self.hits} hits, "
+            f"{self.misses} misses)"
+        )
@@ -0,0 +1,493 @@
+"""Interval Constraint Propagation for Feasibility Checks
+
+Decides conjunctions of conditions over boxes of their variables, including the nonlinear
+ones (sin, powers) that are hard for Z3 or that it is not given at all. Boxes are processed
+in batches, one NumPy array per variable:
+
+* HC4 contracts every box: a forward pass encloses each node over the box
+  (interval_evaluate), a backward pass projects the required truth values down to the
+  variables and narrows their domains, and the two repeat while the boxes shrink
+* a box where every condition certainly holds, or whose midpoint satisfies them in
+  floating point, yields a witness
+* a box where some condition certainly fails is dropped
+* the other boxes are bisected along their widest variable, down to a width of delta
+
+The answer is SAT with a witness, UNSAT, or DELTA_SAT with a box narrower than delta that
+interval arithmetic cannot refute. Bounds on the inputs are assumptions: UNSAT means that
+no input within them satisfies the conditions. Both passes round outward (constants are
+enclosed as the decimals z3 reads them as, and every computed bound is widened), so UNSAT
+holds in the reals up to the accuracy of sin and of powers in NumPy; a SAT witness only
+holds in floating point.
+"""
+
+import math
+from enum import Enum
+from typing import Dict, List, Mapping, Sequence, Tuple
+import numpy as np
+import z3
+from seereach.intervals import Interval, interval_evaluate, widen
+from seereach.lang import Name, Operator, Type
+from seereach.numeric import evaluate_conjunction
+from seereach.symlang import (
+    SBinaryOp,
+    SBoolean,
+    SInteger,
+    SIte,
+    SReal,
+    STuple,
+    SUnaryOp,
+    SVariable,
+    SymLang,
+)
+
+
+class ICPStatus(Enum):
+    SAT = "sat"
+    UNSAT = "unsat"
+    DELTA_SAT = "delta-sat"
+    UNKNOWN = "unknown"
+
+
+class ICPResult:
+    """
+    The answer of an ICPChecker
+
+    :param status: the answer
+    :param witness: variable name -> value satisfying the conditions, for SAT
+    :param box: variable name -> (lo, hi) of a box narrower than delta, for DELTA_SAT
+    :param boxes: the number of boxes processed
+    """
+
+    def __init__(
+        self,
+        status: ICPStatus,
+        witness: Dict[Name, object] = None,
+        box: Dict[Name, Tuple[float, float]] = None,
+        boxes: int = 0,
+    ):
+        self.status = status
+        self.witness = witness
+        self.box = box
+        self.boxes = boxes
+
+    def __repr__(self) -> str:
+        found = self.witness if self.status == ICPStatus.SAT else self.box
+        return f"ICPResult({self.status.value}, {found}, {self.boxes} boxes)"
+
+
+_TRUE = Interval(1.0)
+_ARITHMETIC = {Operator.ADD, Operator.SUB, Operator.MUL, Operator.DIV, Operator.POW}
+_COMPARISONS = {
+    Operator.GREATER,
+    Operator.LESS,
+    Operator.GREATER_EQUAL,
+    Operator.LESS_EQUAL,
+}
+
+
+def _meet(a: Interval, b: Interval) -> Interval:
+    """the intersection, ignoring bounds lost to inf - inf"""
+    return Interval(np.fmax(a.lo, b.lo), np.fmin(a.hi, b.hi))
+
+
+def _outward(a: Interval) -> Interval:
+    """
+    a projection widened against rounding in the bounds: relatively, for the roots and the
+    arcsin whose rounding is not bounded by an ulp, then by an ulp for the widening itself
+    """
+    return widen(
+        Interval(a.lo - 1e-12 * (1 + np.abs(a.lo)), a.hi + 1e-12 * (1 + np.abs(a.hi)))
+    )
+
+
+def _entire(shape) -> Interval:
+    return Interval(np.full(shape, -np.inf), np.full(shape, np.inf))
+
+
+def _truth(must: np.ndarray, must_not: np.ndarray) -> Interval:
+    """the truth interval of a requirement"""
+    return Interval(must.astype(float), 1.0 - must_not.astype(float))
+
+
+def _sin_inverse(a: Interval, target: Interval) -> Interval:
+    """
+    the part of a where sin lies within the target, for arguments narrower than 4 pi
+    (wider ones are kept whole)
+    """
+    lo_target = np.arcsin(np.clip(target.lo, -1.0, 1.0))
+    hi_target = np.arcsin(np.clip(target.hi, -1.0, 1.0))
+    finite = np.isfinite(a.lo) & np.isfinite(a.hi) & (a.hi - a.lo < 4 * math.pi)
+    base = np.floor(np.where(finite, a.lo, 0.0) / (2 * math.pi))
+    lo = np.full(np.broadcast(a.lo, target.lo).shape, np.inf)
+    hi = np.full(lo.shape, -np.inf)
+    for k in range(-1, 4):
+        offset = 2 * math.pi * (base + k)
+        # the rising and the falling branch of each period
+        for start, end in (
+            (offset + lo_target, offset + hi_target),
+            (offset + math.pi - hi_target, offset + math.pi - lo_target),
+        ):
+            start, end = start - 1e-12, end + 1e-12
+            overlap_lo = np.maximum(a.lo, start)
+            overlap_hi = np.minimum(a.hi, end)
+            overlaps = overlap_lo <= overlap_hi
+            lo = np.where(overlaps, np.minimum(lo, overlap_lo), lo)
+            hi = np.where(overlaps, np.maximum(hi, overlap_hi), hi)
+    return Interval(np.where(finite, lo, a.lo), np.where(finite, hi, a.hi))
+
+
+def _root(target: Interval, n: int, a: Interval) -> Interval:
+    """the part of a where a ** n lies within the target, for integers n > 0"""
+    if n % 2 == 1:
+        root = lambda x: np.sign(x) * np.abs(x) ** (1.0 / n)
+        return Interval(root(target.lo), root(target.hi))
+    outer = np.maximum(target.hi, 0.0) ** (1.0 / n)
+    inner = np.maximum(target.lo, 0.0) ** (1.0 / n)
+    # the positive or the negative branch when the sign of a is known
+    lo = np.where(a.lo >= 0, inner, -outer)
+    hi = np.where(a.hi <= 0, -inner, outer)
+    return Interval(lo, hi)
+
+
+def _integer_exponent(expr: SymLang):
+    if isinstance(expr, (SInteger, SReal)) and float(expr.value) == int(expr.value):
+        return int(expr.value)
+    return None
+
+
+def _children(node: SymLang) -> List[SymLang]:
+    if isinstance(node, SBinaryOp):
+        return [node.left, node.right]
+    elif isinstance(node, SUnaryOp):
+        return [node.expression]
+    elif isinstance(node, SIte):
+        return [node.condition, node.true_value, node.false_value]
+    elif isinstance(node, STuple):
+        return list(node.elements)
+    return []
+
+
+def _topological(conditions: Sequence[SymLang]) -> List[SymLang]:
+    """the nodes of the conditions, each after all of its parents"""
+    order = []
+    seen = set()
+    for root in conditions:
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                order.append(node)
+                continue
+            if node in seen:
+                continue
+            seen.add(node)
+            stack.append((node, True))
+            stack += [(child, False) for child in _children(node)]
+    return order[::-1]
+
+
+class ICPChecker:
+    """
+    Decides conjunctions of conditions by interval constraint propagation
+
+    :param bounds: variable name -> (lo, hi) assumed for the inputs; other variables range
+        over all reals (integers, booleans)
+    :param delta: boxes narrower than this in every variable are not bisected further
+    :param max_boxes: the number of boxes processed before giving up with UNKNOWN
+    :param batch: the number of boxes contracted together
+    :param sweeps: the most forward-backward passes per contraction
+    :param max_answers: the number of answers of decide() kept, keyed on the bounds and the
+        conditions (UNSAT only holds within the bounds)
+    """
+
+    def __init__(
+        self,
+        bounds: Mapping[str, Tuple[float, float]] = None,
+        delta: float = 1e-6,
+        max_boxes: int = 4096,
+        batch: int = 256,
+        sweeps: int = 8,
+        max_answers: int = 4096,
+    ):
+        self.bounds = {} if bounds is None else dict(bounds)
+        self.delta = delta
+        self.max_boxes = max_boxes
+        self.batch = batch
+        self.sweeps = sweeps
+        self.max_answers = max_answers
+        self.answers: Dict[Tuple, object] = {}
+        self.hits = 0
+
+    def _initial(self, variables: List[SVariable]) -> Tuple[np.ndarray, np.ndarray]:
+        """the input bounds as a single box, one column per variable"""
+        lo = np.empty((1, len(variables)))
+        hi = np.empty((1, len(variables)))
+        for j, variable in enumerate(variables):
+            if variable.variable_type == Type.BOOLEAN:
+                bound = (0.0, 1.0)
+            else:
+                bound = self.bounds.get(str(variable.name), (-np.inf, np.inf))
+            lo[0, j], hi[0, j] = bound
+            if variable.variable_type != Type.REAL:
+                lo[0, j], hi[0, j] = np.ceil(lo[0, j]), np.floor(hi[0, j])
+        return lo, hi
+
+    def _contract(self, order, conditions, variables, integer, lo, hi):
+        """
+        HC4 over a batch of boxes
+
+        :param variables: the variable nodes, one column each
+        :return: the narrowed bounds, and the boxes where the conditions may still hold
+        """
+        names = [v.name for v in variables]
+        for _ in range(self.sweeps):
+            env = {name: Interval(lo[:, j], hi[:, j]) for j, name in enumerate(names)}
+            values = {}
+            for condition in conditions:
+                interval_evaluate(condition, env, values, outward=True)
+            empty = np.zeros(len(lo), dtype=bool)
+            targets = {condition: _TRUE for condition in conditions}
+            for node in order:
+                target = targets.get(node)
+                if target is None:
+                    continue
+                value = _meet(values[node], target)
+                empty |= value.lo > value.hi
+                self._project(node, value, values, targets)
+            narrowed_lo, narrowed_hi = lo.copy(), hi.copy()
+            for j, variable in enumerate(variables):
+                target = targets.get(variable)
+                if target is None:
+                    continue
+                narrowed_lo[:, j] = np.fmax(lo[:, j], target.lo)
+                narrowed_hi[:, j] = np.fmin(hi[:, j], target.hi)
+            narrowed_lo[:, integer] = np.ceil(narrowed_lo[:, integer])
+            narrowed_hi[:, integer] = np.floor(narrowed_hi[:, integer])
+            empty |= np.any(narrowed_lo > narrowed_hi, axis=1)
+            narrowed_lo[empty], narrowed_hi[empty] = np.inf, -np.inf
+            # stop once no box shrinks by more than a few percent
+            before = np.where(np.isfinite(hi - lo), hi - lo, 1e300)
+            after = np.where(
+                np.isfinite(narrowed_hi - narrowed_lo), narrowed_hi - narrowed_lo, 1e300
+            )
+            progress = np.any((before - after > 0.05 * before) & ~empty[:, None])
+            lo, hi = narrowed_lo, narrowed_hi
+            if not progress:
+                break
+        env = {name: Interval(lo[:, j], hi[:, j]) for j, name in enumerate(names)}
+        values = {}
+        possible = ~np.any(lo > hi, axis=1)
+        for condition in conditions:
+            truth = interval_evaluate(condition, env, values, outward=True)
+            possible &= np.broadcast_to(truth.hi == 1.0, possible.shape)
+        return lo, hi, possible
+
+    @staticmethod
+    def _project(node: SymLang, value: Interval, values, targets):
+        """narrow the targets of a node's children to what its value allows"""
+        children = {}
+        if isinstance(node, SBinaryOp):
+            a, b = values[node.left], values[node.right]
+            operator = node.operator
+            if operator == Operator.ADD:
+                children = {node.left: value - b, node.right: value - a}
+            elif operator == Operator.SUB:
+                children = {node.left: value + b, node.right: a - value}
+            elif operator == Operator.MUL:
+                children = {node.left: value / b, node.right: value / a}
+            elif operator == Operator.DIV:
+                children = {node.left: value * b}
+            elif operator == Operator.POW:
+                n = _integer_exponent(node.right)
+                if n is not None and n > 0:
+                    children = {node.left: _root(value, n, a)}
+            if operator in _ARITHMETIC:
+                children = {child: _outward(t) for child, t in children.items()}
+            elif operator in _COMPARISONS:
+                if operator in (Operator.GREATER, Operator.GREATER_EQUAL):
+                    (left, a), (right, b) = (node.right, b), (node.left, a)
+                else:
+                    left, right = node.left, node.right
+                # left <= right where the comparison must hold, left >= right where not
+                must, must_not = value.lo == 1.0, value.hi == 0.0
+                entire = _entire(must.shape)
+                children = {
+                    left: Interval(
+                        np.where(must_not, b.lo, entire.lo),
+                        np.where(must, b.hi, entire.hi),
+                    ),
+                    right: Interval(
+                        np.where(must, a.lo, entire.lo),
+                        np.where(must_not, a.hi, entire.hi),
+                    ),
+                }
+            elif operator == Operator.EQUAL:
+                must = value.lo == 1.0
+                both = _meet(a, b)
+                entire = _entire(must.shape)
+                children = {
+                    node.left: Interval(
+                        np.where(must, both.lo, entire.lo),
+                        np.where(must, both.hi, entire.hi),
+                    ),
+                    node.right: Interval(
+                        np.where(must, both.lo, entire.lo),
+                        np.where(must, both.hi, entire.hi),
+                    ),
+                }
+            elif operator == Operator.AND:
+                must, must_not = value.lo == 1.0, value.hi == 0.0
+                children = {
+                    node.left: _truth(must, must_not & (b.lo == 1.0)),
+                    node.right: _truth(must, must_not & (a.lo == 1.0)),
+                }
+            elif operator == Operator.OR:
+                must, must_not = value.lo == 1.0, value.hi == 0.0
+                children = {
+                    node.left: _truth(must & (b.hi == 0.0), must_not),
+                    node.right: _truth(must & (a.hi == 0.0), must_not),
+                }
+        elif isinstance(node, SUnaryOp):
+            if node.operator == Operator.NOT:
+                children = {node.expression: Interval(1.0 - value.hi, 1.0 - value.lo)}
+            elif node.operator == Operator.SIN:
+                children = {
+                    node.expression: _outward(
+                        _sin_inverse(values[node.expression], value)
+                    )
+                }
+        elif isinstance(node, SIte):
+            condition = values[node.condition]
+            true_value = _meet(values[node.true_value], value)
+            false_value = _meet(values[node.false_value], value)
+            entire = _entire(np.broadcast(condition.lo, value.lo).shape)
+            certain, impossible = condition.lo == 1.0, condition.hi == 0.0
+            children = {
+                node.condition: _truth(
+                    false_value.lo > false_value.hi, true_value.lo > true_value.hi
+                ),
+                node.true_value: Interval(
+                    np.where(certain, value.lo, entire.lo),
+                    np.where(certain, value.hi, entire.hi),
+                ),
+                node.false_value: Interval(
+                    np.where(impossible, value.lo, entire.lo),
+                    np.where(impossible, value.hi, entire.hi),
+                ),
+            }
+        for child, target in children.items():
+            if isinstance(child, (SReal, SInteger, SBoolean)):
+                continue
+            previous = targets.get(child)
+            targets[child] = target if previous is None else _meet(previous, target)
+
+    @staticmethod
+    def _points(lo: np.ndarray, hi: np.ndarray, integer: np.ndarray) -> np.ndarray:
+        """a point inside each box: the midpoint, or one a step away from a finite bound"""
+        with np.errstate(invalid="ignore"):
+            point = (lo + hi) / 2
+            point = np.where(np.isinf(lo) & np.isinf(hi), 0.0, point)
+            point = np.where(
+                np.isinf(hi) & np.isfinite(lo), lo + np.maximum(1.0, np.abs(lo)), point
+            )
+            point = np.where(
+                np.isinf(lo) & np.isfinite(hi), hi - np.maximum(1.0, np.abs(hi)), point
+            )
+        point[:, integer] = np.floor(point[:, integer])
+        return np.clip(point, lo, hi)
+
+    def check(self, conditions: Sequence[SymLang]) -> ICPResult:
+        """
+        decide a conjunction of conditions
+
+        :param conditions: the conjuncts, e.g. a path condition
+        """
+        conditions = list(conditions)
+        order = _topological(conditions)
+        variables = [node for node in order if isinstance(node, SVariable)]
+        names = [v.name for v in variables]
+        types = [v.variable_type for v in variables]
+        integer = np.array([t != Type.REAL for t in types], dtype=bool)
+
+        lo, hi = self._initial(variables)
+        small_box = None
+        processed = 0
+        while len(lo) > 0 and processed < self.max_boxes:
+            # depth first: the most recently split boxes come first
+            take = min(self.batch, len(lo), self.max_boxes - processed)
+            box_lo, box_hi = lo[-take:], hi[-take:]
+            lo, hi = lo[:-take], hi[:-take]
+            processed += take
+            with np.errstate(all="ignore"):
+                box_lo, box_hi, possible = self._contract(
+                    order, conditions, variables, integer, box_lo, box_hi
+                )
+            box_lo, box_hi = box_lo[possible], box_hi[possible]
+            points = self._points(box_lo, box_hi, integer)
+            env = {name: points[:, j] for j, name in enumerate(names)}
+            with np.errstate(all="ignore"):
+                holds = evaluate_conjunction(conditions, env, len(points))
+            if np.any(holds):
+                point = points[np.argmax(holds)]
+                witness = {}
+                for name, variable_type, value in zip(names, types, point):
+                    if variable_type == Type.INTEGER:
+                        value = int(value)
+                    elif variable_type == Type.BOOLEAN:
+                        value = bool(value)
+                    else:
+                        value = float(value)
+                    witness[name] = value
+                return ICPResult(ICPStatus.SAT, witness=witness, boxes=processed)
+
+            width = box_hi - box_lo
+            small = np.all(width <= self.delta, axis=1)
+            if np.any(small) and small_box is None:
+                i = np.argmax(small)
+                small_box = {
+                    name: (float(box_lo[i, j]), float(box_hi[i, j]))
+                    for j, name in enumerate(names)
+                }
+            box_lo, box_hi, width = box_lo[~small], box_hi[~small], width[~small]
+            if len(box_lo) == 0:
+                continue
+
+            # bisect along the widest variable
+            rows = np.arange(len(box_lo))
+            axis = np.argmax(width, axis=1)
+            split = self._points(box_lo, box_hi, integer)[rows, axis]
+            left_hi, right_lo = box_hi.copy(), box_lo.copy()
+            left_hi[rows, axis] = split
+            right_lo[rows, axis] = np.where(integer[axis], split + 1, split)
+            lo = np.concatenate([lo, box_lo, right_lo])
+            hi = np.concatenate([hi, left_hi, box_hi])
+
+        if small_box is not None:
+            return ICPResult(ICPStatus.DELTA_SAT, box=small_box, boxes=processed)
+        if len(lo) == 0:
+            return ICPResult(ICPStatus.UNSAT, boxes=processed)
+        return ICPResult(ICPStatus.UNKNOWN, boxes=processed)
+
+    def decide(self, conditions: Sequence[SymLang]):
+        """
+        z3.sat or z3.unsat when propagation decides the conditions, None otherwise
+
+        Answers are remembered, undecided ones too, so a conjunction is propagated once.
+        """
+        key = (tuple(sorted(self.bounds.items())), frozenset(conditions))
+        if key in self.answers:
+            self.hits += 1
+            return self.answers[key]
+        status = self.check(conditions).status
+        answer = None
+        if status == ICPStatus.SAT:
+            answer = z3.sat
+        elif status == ICPStatus.UNSAT:
+            answer = z3.unsat
+        if len(self.answers) >= self.max_answers:
+            del self.answers[next(iter(self.answers))]
+        self.answers[key] = answer
+        return answer
+
+    def __repr__(self) -> str:
+        return f"ICPChecker({self.bounds}, delta={self.delta})"
@@ -0,0 +1,415 @@
+"""Vectorized Interval Arithmetic over SymLang
+
+An Interval holds lower and upper bounds as NumPy arrays, so one Interval is a whole batch
+of intervals (or boxes, with a trailing axis per dimension). Truth values are intervals
+over {0, 1}: a condition certainly holds where the lower bound is 1 and possibly holds where
+the upper bound is 1.
+
+interval_evaluate encloses the value of a SymLang expression over boxes of its variables,
+and interval_gradient also encloses its gradient (forward mode), as needed for mean value
+forms. Bounds are computed in plain floating point, without outward rounding, so they can
+miss values by a rounding error: they suit plotting and testing, not proofs of
+infeasibility. interval_evaluate(..., outward=True) widens every real constant and every
+arithmetic result by an ulp on each side, which encloses the exact (decimal) values of the
+constants and the rounding of each operation, as needed for decisions.
+"""
+
+import math
+from typing import Dict, List, Mapping, Sequence, Tuple
+import numpy as np
+from seereach.lang import Operator
+from seereach.symlang import (
+    SBinaryOp,
+    SBoolean,
+    SInteger,
+    SIte,
+    SReal,
+    STuple,
+    SUnaryOp,
+    SVariable,
+    SymLang,
+)
+
+
+def _products(alo, ahi, blo, bhi):
+    products = [alo * blo, alo * bhi, ahi * blo, ahi * bhi]
+    # 0 * inf is 0 for the bounds of a product
+    products = [np.where(np.isnan(p), 0.0, p) for p in products]
+    return np.minimum.reduce(products), np.maximum.reduce(products)
+
+
+class Interval:
+    """
+    Elementwise intervals [lo, hi] over arrays
+
+    :param lo: the lower bounds
+    :param hi: the upper bounds (the lower ones for points)
+    """
+
+    __slots__ = ("lo", "hi")
+
+    def __init__(self, lo, hi=None):
+        self.lo = np.asarray(lo, dtype=float)
+        self.hi = self.lo if hi is None else np.asarray(hi, dtype=float)
+
+    @property
+    def shape(self) -> tuple:
+        return np.broadcast_shapes(self.lo.shape, self.hi.shape)
+
+    def mid(self) -> np.ndarray:
+        return (self.lo + self.hi) / 2
+
+    def radius(self) -> np.ndarray:
+        return (self.hi - self.lo) / 2
+
+    def __getitem__(self, index) -> "Interval":
+        # scalar bounds are shared by every element
+        lo = self.lo[index] if self.lo.ndim > 0 else self.lo
+        hi = self.hi[index] if self.hi.ndim > 0 else self.hi
+        return Interval(lo, hi)
+
+    def __add__(self, other) -> "Interval":
+        other = as_interval(other)
+        return Interval(self.lo + other.lo, self.hi + other.hi)
+
+    __radd__ = __add__
+
+    def __neg__(self) -> "Interval":
+        return Interval(-self.hi, -self.lo)
+
+    def __sub__(self, other) -> "Interval":
+        other = as_interval(other)
+        return Interval(self.lo - other.hi, self.hi - other.lo)
+
+    def __rsub__(self, other) -> "Interval":
+        return as_interval(other) - self
+
+    def __mul__(self, other) -> "Interval":
+        other = as_interval(other)
+        return Interval(*_products(self.lo, self.hi, other.lo, other.hi))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other) -> "Interval":
+        other = as_interval(other)
+        # a divisor interval containing 0 gives no bounds
+        zero = (other.lo <= 0) & (other.hi >= 0)
+        with np.errstate(divide="ignore"):
+            inverse = Interval(
+                np.where(zero, -np.inf, 1 / other.hi),
+                np.where(zero, np.inf, 1 / other.lo),
+            )
+        return self * inverse
+
+    def __rtruediv__(self, other) -> "Interval":
+        return as_interval(other) / self
+
+    def power(self, exponent: "Interval") -> "Interval":
+        exponent = as_interval(exponent)
+        n = float(exponent.lo) if exponent.lo.ndim == 0 else None
+        if n is not None and exponent.hi == n and n == int(n):
+            n = int(n)
+            if n == 0:
+                return Interval(np.ones(self.shape))
+            if n < 0:
+                # as a reciprocal, so that a base containing 0 has no bounds
+                return 1.0 / self.power(Interval(-n))
+            lo, hi = self.lo**n, self.hi**n
+            if n % 2 == 1:
+                return Interval(lo, hi)
+            # even: the minimum is at 0 when the base contains it
+            zero = (self.lo <= 0) & (self.hi >= 0)
+            return Interval(np.where(zero, 0.0, np.minimum(lo, hi)), np.maximum(lo, hi))
+        # a power with a positive base is monotone in each argument
+        corners = [
+            self.lo**exponent.lo,
+            self.lo**exponent.hi,
+            self.hi**exponent.lo,
+            self.hi**exponent.hi,
+        ]
+        positive = self.lo > 0
+        return Interval(
+            np.where(positive, np.minimum.reduce(corners), -np.inf),
+            np.where(positive, np.maximum.reduce(corners), np.inf),
+        )
+
+    def sin(self) -> "Interval":
+        lo = np.minimum(np.sin(self.lo), np.sin(self.hi))
+        hi = np.maximum(np.sin(self.lo), np.sin(self.hi))
+        # the extrema inside the interval: pi/2 + 2k pi and -pi/2 + 2k pi
+        peak = math.pi / 2 + 2 * math.pi * np.ceil(
+            (self.lo - math.pi / 2) / (2 * math.pi)
+        )
+        trough = -math.pi / 2 + 2 * math.pi * np.ceil(
+            (self.lo + math.pi / 2) / (2 * math.pi)
+        )
+        whole = ~(self.hi - self.lo < 2 * math.pi)
+        return Interval(
+            np.where((trough <= self.hi) | whole, -1.0, lo),
+            np.where((peak <= self.hi) | whole, 1.0, hi),
+        )
+
+    def cos(self) -> "Interval":
+        return (self + math.pi / 2).sin()
+
+    def hull(self, other: "Interval") -> "Interval":
+        other = as_interval(other)
+        return Interval(np.minimum(self.lo, other.lo), np.maximum(self.hi, other.hi))
+
+    def subset(self, other: "Interval") -> np.ndarray:
+        """where this interval lies within the other"""
+        return (self.lo >= other.lo) & (self.hi <= other.hi)
+
+    def sum(self, axis=None) -> "Interval":
+        return Interval(self.lo.sum(axis=axis), self.hi.sum(axis=axis))
+
+    def __repr__(self) -> str:
+        return f"Interval({self.lo}, {self.hi})"
+
+
+ENTIRE = Interval(-np.inf, np.inf)
+
+
+def as_interval(value) -> Interval:
+    """an Interval, points for plain numbers and arrays"""
+    if isinstance(value, Interval):
+        return value
+    return Interval(value)
+
+
+def _compare(operator: Operator, a: Interval, b: Interval) -> Interval:
+    """the truth interval of a comparison"""
+    if operator == Operator.GREATER:
+        operator, a, b = Operator.LESS, b, a
+    elif operator == Operator.GREATER_EQUAL:
+        operator, a, b = Operator.LESS_EQUAL, b, a
+    if operator == Operator.LESS:
+        certain, possible = a.hi < b.lo, a.lo < b.hi
+    elif operator == Operator.LESS_EQUAL:
+        certain, possible = a.hi <= b.lo, a.lo <= b.hi
+    else:
+        certain = (a.lo == a.hi) & (b.lo == b.hi) & (a.lo == b.lo)
+        possible = (a.lo <= b.hi) & (b.lo <= a.hi)
+    return Interval(certain.astype(float), possible.astype(float))
+
+
+_COMPARISONS = {
+    Operator.GREATER,
+    Operator.LESS,
+    Operator.GREATER_EQUAL,
+    Operator.LESS_EQUAL,
+    Operator.EQUAL,
+}
+
+
+def _binary(operator: Operator, a: Interval, b: Interval) -> Interval:
+    if operator == Operator.ADD:
+        return a + b
+    elif operator == Operator.SUB:
+        return a - b
+    elif operator == Operator.MUL:
+        return a * b
+    elif operator == Operator.DIV:
+        return a / b
+    elif operator == Operator.POW:
+        return a.power(b)
+    elif operator in _COMPARISONS:
+        return _compare(operator, a, b)
+    elif operator == Operator.AND:
+        return Interval(np.minimum(a.lo, b.lo), np.minimum(a.hi, b.hi))
+    elif operator == Operator.OR:
+        return Interval(np.maximum(a.lo, b.lo), np.maximum(a.hi, b.hi))
+    raise ValueError(f"Invalid operator: {operator}")
+
+
+def _unary(operator: Operator, a: Interval) -> Interval:
+    if operator == Operator.NOT:
+        return Interval(1.0 - a.hi, 1.0 - a.lo)
+    elif operator == Operator.SIN:
+        return a.sin()
+    raise ValueError(f"Invalid operator: {operator}")
+
+
+def _ite(condition: Interval, true_value: Interval, false_value: Interval) -> Interval:
+    """the branch the condition decides, the hull of both where it is uncertain"""
+    certain = condition.lo == 1.0
+    impossible = condition.hi == 0.0
+    both = true_value.hull(false_value)
+    return Interval(
+        np.where(certain, true_value.lo, np.where(impossible, false_value.lo, both.lo)),
+        np.where(certain, true_value.hi, np.where(impossible, false_value.hi, both.hi)),
+    )
+
+
+def _constant(expr: SymLang) -> Interval:
+    return Interval(float(expr.value))
+
+
+def widen(a: Interval) -> Interval:
+    """an interval widened by an ulp on each side"""
+    return Interval(np.nextafter(a.lo, -np.inf), np.nextafter(a.hi, np.inf))
+
+
+# the operators whose results are rounded
+_ROUNDED = {Operator.ADD, Operator.SUB, Operator.MUL, Operator.DIV, Operator.POW}
+
+
+def interval_evaluate(
+    expr: SymLang, env: Mapping[str, object], memo: Dict = None, outward: bool = False
+):
+    """
+    enclose the value of an expression with its variables bound to intervals
+
+    :param expr: the expression to evaluate
+    :param env: variable name -> Interval (or point values)
+    :param memo: node -> enclosure, shared between calls with the same env and outward
+    :param outward: widen real constants and arithmetic results (sin too) by an ulp
+    :return: an Interval, or a tuple of them for a tuple
+    """
+    if memo is None:
+        memo = {}
+    value = memo.get(expr)
+    if value is not None:
+        return value
+    if isinstance(expr, (SReal, SInteger, SBoolean)):
+        value = _constant(expr)
+        if outward and isinstance(expr, SReal):
+            # the nearest double to a decimal constant is within an ulp of it
+            value = widen(value)
+    elif isinstance(expr, SVariable):
+        try:
+            value = as_interval(env[expr.name])
+        except KeyError:
+            raise ValueError(f"Unbound variable: {expr.name}")
+    elif isinstance(expr, SBinaryOp):
+        value = _binary(
+            expr.operator,
+            interval_evaluate(expr.left, env, memo, outward),
+            interval_evaluate(expr.right, env, memo, outward),
+        )
+        if outward and expr.operator in _ROUNDED:
+            value = widen(value)
+    elif isinstance(expr, SUnaryOp):
+        value = _unary(
+            expr.operator, interval_evaluate(expr.expression, env, memo, outward)
+        )
+        if outward and expr.operator == Operator.SIN:
+            value = widen(value)
+    elif isinstance(expr, SIte):
+        value = _ite(
+            interval_evaluate(expr.condition, env, memo, outward),
+            interval_evaluate(expr.true_value, env, memo, outward),
+            interval_evaluate(expr.false_value, env, memo, outward),
+        )
+    elif isinstance(expr, STuple):
+        value = tuple(interval_evaluate(e, env, memo, outward) for e in expr.elements)
+    else:
+        raise ValueError(f"Invalid expression: {expr}")
+    memo[expr] = value
+    return value
+
+
+def _expand(a: Interval) -> Interval:
+    """a value against a gradient, which has a trailing axis per variable"""
+    return Interval(a.lo[..., None], a.hi[..., None])
+
+
+def interval_gradient(
+    expr: SymLang,
+    env: Mapping[str, object],
+    variables: Sequence[str],
+    memo: Dict = None,
+) -> Tuple[Interval, Interval]:
+    """
+    enclose the value of an expression and its gradient with respect to some variables
+
+    A branch whose condition is uncertain may jump, so its gradient is unbounded.
+
+    :param expr: a numeric expression
+    :param env: variable name -> Interval (or point values)
+    :param variables: the variables of the gradient
+    :param memo: node -> (value, gradient), shared between calls with the same env
+    :return: the value and the gradient, an Interval with a trailing axis per variable
+        (None for a gradient that is 0)
+    """
+    if memo is None:
+        memo = {}
+    cached = memo.get(expr)
+    if cached is not None:
+        return cached
+    gradient = None
+    if isinstance(expr, (SReal, SInteger, SBoolean)):
+        value = _constant(expr)
+    elif isinstance(expr, SVariable):
+        value = interval_evaluate(expr, env)
+        if expr.name in variables:
+            unit = np.zeros(value.shape + (len(variables),))
+            unit[..., list(variables).index(expr.name)] = 1.0
+            gradient = Interval(unit)
+    elif isinstance(expr, SBinaryOp):
+        a, da = interval_gradient(expr.left, env, variables, memo)
+        b, db = interval_gradient(expr.right, env, variables, memo)
+        value = _binary(expr.operator, a, b)
+        gradient = _binary_gradient(expr.operator, a, da, b, db, value)
+    elif isinstance(expr, SUnaryOp):
+        a, da = interval_gradient(expr.expression, env, variables, memo)
+        value = _unary(expr.operator, a)
+        if expr.operator == Operator.SIN and da is not None:
+            gradient = _expand(a.cos()) * da
+    elif isinstance(expr, SIte):
+        condition = interval_evaluate(expr.condition, env)
+        t, dt = interval_gradient(expr.true_value, env, variables, memo)
+        f, df = interval_gradient(expr.false_value, env, variables, memo)
+        value = _ite(condition, t, f)
+        if dt is not None or df is not None:
+            zero = np.zeros(value.shape + (len(variables),))
+            dt = Interval(zero) if dt is None else dt
+            df = Interval(zero) if df is None else df
+            certain = (condition.lo == 1.0)[..., None]
+            impossible = (condition.hi == 0.0)[..., None]
+            gradient = Interval(
+                np.where(certain, dt.lo, np.where(impossible, df.lo, -np.inf)),
+                np.where(certain, dt.hi, np.where(impossible, df.hi, np.inf)),
+            )
+    else:
+        raise ValueError(f"No gradient for {expr}")
+    memo[expr] = (value, gradient)
+    return value, gradient
+
+
+def _binary_gradient(operator, a, da, b, db, value) -> Interval:
+    if da is None and db is None:
+        return None
+    if operator in (Operator.ADD, Operator.SUB):
+        if db is None:
+            return da
+        db = -db if operator == Operator.SUB else db
+        return db if da is None else da + db
+    elif operator == Operator.MUL:
+        terms = []
+        if da is not None:
+            terms.append(da * _expand(b))
+        if db is not None:
+            terms.append(_expand(a) * db)
+        return terms[0] if len(terms) == 1 else terms[0] + terms[1]
+    elif operator == Operator.DIV:
+        # (a' - (a / b) b') / b
+        numerator = da
+        if db is not None:
+            numerator = (
+                -(_expand(value) * db) if da is None else da - _expand(value) * db
+            )
+        return numerator / _expand(b)
+    elif operator == Operator.POW:
+        constant = b.lo.ndim == 0 and b.lo == b.hi and db is None
+        if constant:
+            n = float(b.lo)
+            return _expand(n * a.power(Interval(n - 1))) * da
+        return ENTIRE
+    # truth values have no gradient
+    return None
+
+
+def box_env(names: List[str], box: Interval) -> Dict[str, Interval]:
+    """variable name -> Interval from boxes with a trailing axis per variable"""
+    return {name: box[..., i] for i, name in enumerate(names)}
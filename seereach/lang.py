@@ -6,10 +6,12 @@ from enum import Enum
 class HLLang:
     """HL Language Base Class"""
 
-    pass
+    __slots__ = ()
 
 
 class Name(str, HLLang):
+    __slots__ = ()
+
     def __repr__(self) -> str:
         return f"Name({super().__repr__()})"
 
@@ -41,6 +43,8 @@ class Type(Enum):
 
 
 class Value:
+    __slots__ = ("type", "value")
+
     def __init__(self, value_type: Type, value: Union[float, int, bool, Tuple]):
         self.type = value_type
         self.value = value
@@ -50,10 +54,12 @@ class Value:
 
 
 class Expression:
-    pass
+    __slots__ = ()
 
 
 class Variable(Expression):
+    __slots__ = ("name",)
+
     def __init__(self, name: Name):
         self.name = name
 
@@ -62,6 +68,8 @@ class Variable(Expression):
 
 
 class Literal(Expression):
+    __slots__ = ("value",)
+
     def __init__(self, value: Value):
         self.value = value
 
@@ -70,6 +78,8 @@ class Literal(Expression):
 
 
 class BinaryOp(Expression):
+    __slots__ = ("left", "operator", "right")
+
     def __init__(self, left: Expression, operator: Operator, right: Expression):
         self.left = left
         self.operator = operator
@@ -80,6 +90,8 @@ class BinaryOp(Expression):
 
 
 class UnaryOp(Expression):
+    __slots__ = ("operator", "expression")
+
     def __init__(self, operator: Operator, expression: Expression):
         self.operator = operator
         self.expression = expression
@@ -89,15 +101,28 @@ class UnaryOp(Expression):
 
 
 class FunctionCall(Expression):
-    def __init__(self, function_name: Name, arguments: List[Expression]):
+    __slots__ = ("function_name", "arguments", "merge")
+
+    def __init__(
+        self, function_name: Name, arguments: List[Expression], merge: bool = None
+    ):
+        """
+        :param function_name: the function to call
+        :param arguments: the argument expressions
+        :param merge: merge paths at the join points of this call (None defers to the
+            function-level choice)
+        """
         self.function_name = function_name
         self.arguments = arguments
+        self.merge = merge
 
     def __repr__(self) -> str:
         return f"FunctionCall({self.function_name}, {self.arguments})"
 
 
 class Conditional(Expression):
+    __slots__ = ("condition", "true_branch", "false_branch")
+
     def __init__(
         self, condition: Expression, true_branch: Expression, false_branch: Expression
     ):
@@ -110,6 +135,8 @@ class Conditional(Expression):
 
 
 class Block(Expression):
+    __slots__ = ("expressions",)
+
     def __init__(self, expressions: List[Expression]):
         self.expressions = expressions
 
@@ -118,6 +145,8 @@ class Block(Expression):
 
 
 class TupleExpression(Expression):
+    __slots__ = ("elements",)
+
     def __init__(self, elements: List[Expression]):
         self.elements = elements
 
@@ -126,6 +155,8 @@ class TupleExpression(Expression):
 
 
 class Assignment(Expression):
+    __slots__ = ("variable", "expression")
+
     def __init__(self, variable: "TypedVariable", expression: Expression):
         self.variable = variable
         self.expression = expression
@@ -135,6 +166,8 @@ class Assignment(Expression):
 
 
 class Return(Expression):
+    __slots__ = ("expression",)
+
     def __init__(self, expression: Expression):
         self.expression = expression
 
@@ -143,6 +176,8 @@ class Return(Expression):
 
 
 class TypedVariable:
+    __slots__ = ("name", "variable_type")
+
     def __init__(self, name: Name, variable_type: Type):
         self.name = name
         self.variable_type = variable_type
@@ -152,6 +187,8 @@ class TypedVariable:
 
 
 class Symbolic:
+    __slots__ = ("name", "variable_type")
+
     def __init__(self, name: str, variable_type: Type):
         self.name = name
         self.variable_type = variable_type
@@ -161,6 +198,8 @@ class Symbolic:
 
 
 class Function:
+    __slots__ = ("name", "parameters", "return_type", "body")
+
     def __init__(
         self,
         name: Name,
@@ -175,6 +214,8 @@ class Function:
 
 
 class Program:
+    __slots__ = ("functions", "start")
+
     def __init__(self, functions: Dict[Name, Function], start: Name):
         self.functions = functions
         self.start = start
@@ -0,0 +1,56 @@
+"""State Merging at Conditional Join Points"""
+
+from functools import reduce
+from typing import Dict, List
+from seereach.lang import Operator
+from seereach.result import EvalResult
+from seereach.rewrite import fold_binary_op, fold_ite
+from seereach.symlang import SBoolean, SymLang
+
+
+def conjunction(conditions) -> SymLang:
+    """AND a sequence of conditions together (true when empty)"""
+    return reduce(
+        lambda x, y: fold_binary_op(Operator.AND, x, y), conditions, SBoolean(True)
+    )
+
+
+def merge_results(results: List[EvalResult]) -> List[EvalResult]:
+    """
+    Merge the results reaching a join point into one result per kind (return or not)
+
+    The paths of a group keep their shared path condition prefix. The rest of each path
+    condition becomes the selector of an if-then-else over the values, and the guard of the
+    merged result is the disjunction of those selectors. The paths reaching a join point
+    come from distinct branch decisions, so the selectors are mutually exclusive.
+    """
+    groups: Dict[bool, List[EvalResult]] = {}
+    for result in results:
+        groups.setdefault(result.is_return, []).append(result)
+    return [
+        group[0] if len(group) == 1 else _merge_group(group, is_return)
+        for is_return, group in groups.items()
+    ]
+
+
+def _merge_group(group: List[EvalResult], is_return: bool) -> EvalResult:
+    conditions = [list(r.path_condition) for r in group]
+
+    # longest shared prefix, conjuncts are interned so identity will do
+    shared = 0
+    shortest = min(len(c) for c in conditions)
+    while shared < shortest and all(
+        c[shared] is conditions[0][shared] for c in conditions
+    ):
+        shared += 1
+    prefix = group[0].path_condition.prefix(shared)
+
+    selectors = [conjunction(c[shared:]) for c in conditions]
+    value = group[-1].expr_eval
+    for selector, result in zip(reversed(selectors[:-1]), reversed(group[:-1])):
+        value = fold_ite(selector, result.expr_eval, value)
+
+    guard = reduce(lambda x, y: fold_binary_op(Operator.OR, x, y), selectors)
+    if guard is not SBoolean(True):
+        prefix = prefix.append(guard)
+    return EvalResult(value, prefix, is_return=is_return)
@@ -0,0 +1,100 @@
+"""Vectorized Numeric Evaluation of SymLang
+
+Evaluates symbolic expressions over NumPy arrays: variables are bound to arrays (or
+scalars), operators map to ufuncs, and if-then-else becomes a masked select, so one call
+evaluates an expression for a whole batch of points.
+"""
+
+from typing import Dict, Mapping
+import numpy as np
+from seereach.lang import Operator
+from seereach.symlang import (
+    SBinaryOp,
+    SBoolean,
+    SInteger,
+    SIte,
+    SReal,
+    STuple,
+    SUnaryOp,
+    SVariable,
+    SymLang,
+)
+
+BINARY_UFUNCS = {
+    Operator.ADD: np.add,
+    Operator.SUB: np.subtract,
+    Operator.MUL: np.multiply,
+    Operator.DIV: np.true_divide,
+    Operator.POW: np.power,
+    Operator.GREATER: np.greater,
+    Operator.LESS: np.less,
+    Operator.GREATER_EQUAL: np.greater_equal,
+    Operator.LESS_EQUAL: np.less_equal,
+    Operator.EQUAL: np.equal,
+    Operator.AND: np.logical_and,
+    Operator.OR: np.logical_or,
+}
+
+UNARY_UFUNCS = {
+    Operator.NOT: np.logical_not,
+    Operator.SIN: np.sin,
+}
+
+
+def evaluate(expr: SymLang, env: Mapping[str, object], memo: Dict = None):
+    """
+    evaluate an expression with its variables bound to arrays
+
+    Constants stay scalars and broadcast against the arrays; a tuple evaluates to a tuple of
+    its elements.
+
+    :param expr: the expression to evaluate
+    :param env: variable name -> value (array or scalar)
+    :param memo: node -> value, shared between calls with the same env (nodes are interned,
+        so shared subterms are evaluated once)
+    """
+    if memo is None:
+        memo = {}
+    value = memo.get(expr)
+    if value is not None:
+        return value
+    if isinstance(expr, (SReal, SInteger, SBoolean)):
+        value = expr.value
+    elif isinstance(expr, SVariable):
+        try:
+            value = env[expr.name]
+        except KeyError:
+            raise ValueError(f"Unbound variable: {expr.name}")
+    elif isinstance(expr, SBinaryOp):
+        value = BINARY_UFUNCS[expr.operator](
+            evaluate(expr.left, env, memo), evaluate(expr.right, env, memo)
+        )
+    elif isinstance(expr, SUnaryOp):
+        value = UNARY_UFUNCS[expr.operator](evaluate(expr.expression, env, memo))
+    elif isinstance(expr, SIte):
+        value = np.where(
+            evaluate(expr.condition, env, memo),
+            evaluate(expr.true_value, env, memo),
+            evaluate(expr.false_value, env, memo),
+        )
+    elif isinstance(expr, STuple):
+        value = tuple(evaluate(e, env, memo) for e in expr.elements)
+    else:
+        raise ValueError(f"Invalid expression: {expr}")
+    memo[expr] = value
+    return value
+
+
+def evaluate_conjunction(conditions, env: Mapping[str, object], size: int, memo=None):
+    """
+    the rows where every condition holds, as a boolean array of the given size
+
+    :param conditions: the conjuncts (e.g. a path condition)
+    :param env: variable name -> array of the given size (or scalar)
+    """
+    if memo is None:
+        memo = {}
+    mask = np.ones(size, dtype=bool)
+    for condition in conditions:
+        mask &= np.broadcast_to(evaluate(condition, env, memo), size).astype(bool)
+    return mask
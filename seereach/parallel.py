@@ -0,0 +1,73 @@
+"""Parallel Path Exploration
+
+Pending paths are identified by their branch decisions (see seereach.explore), which are
+just tuples of booleans. Each worker process holds the program and its own PathExplorer,
+and with it its own Z3 session and context. A task explores a subtree for a bounded number
+of paths and hands back the prefixes it did not get to, which go back on the pool's shared
+queue for whichever worker is idle. Results are ordered by their decisions, so the output
+is the same as a sequential depth-first exploration whatever the scheduling.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Tuple
+from seereach.explore import Decisions, DepthFirst, PathExplorer
+from seereach.lang import Program
+from seereach.result import EvalResult
+
+# the explorer of this worker process
+_explorer: PathExplorer = None
+
+
+def _init_worker(program: Program, funname: str, signature_params: List):
+    global _explorer
+    _explorer = PathExplorer(program, funname, signature_params)
+
+
+def _explore_subtree(
+    prefix: Decisions, max_paths: int
+) -> Tuple[List[Tuple[Decisions, List[EvalResult]]], List[Decisions]]:
+    """explore depth first from prefix, returning the finished paths and what is left"""
+    paths = []
+    _explorer.strategy = DepthFirst()
+    _explorer.strategy.push(prefix, 0)
+    while len(_explorer.strategy) > 0 and len(paths) < max_paths:
+        results = _explorer.run(_explorer.strategy.pop())
+        if len(results) > 0:
+            paths.append((tuple(_explorer.decisions), results))
+    return paths, _explorer.strategy.drain()
+
+
+def _dfs_order(decisions: Decisions):
+    # the true branch is explored first
+    return [not d for d in decisions]
+
+
+def explore_parallel(
+    program: Program,
+    funname: str,
+    signature_params: List,
+    max_workers: int = None,
+    paths_per_task: int = 16,
+) -> List[EvalResult]:
+    """
+    explore all paths of a function on a pool of worker processes
+
+    :param max_workers: number of worker processes (the number of CPUs by default)
+    :param paths_per_task: paths a worker finishes before it gives back its pending work
+    """
+    finished = []
+    with ProcessPoolExecutor(
+        max_workers,
+        initializer=_init_worker,
+        initargs=(program, funname, signature_params),
+    ) as pool:
+        futures = {pool.submit(_explore_subtree, (), paths_per_task)}
+        while len(futures) > 0:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                paths, pending = future.result()
+                finished += paths
+                for prefix in pending:
+                    futures.add(pool.submit(_explore_subtree, prefix, paths_per_task))
+    finished.sort(key=lambda path: _dfs_order(path[0]))
+    return [result for _, results in finished for result in results]
@@ -63,6 +63,8 @@ class SymLangPrinter:
             return self.visit_sbinaryop(node)
         elif isinstance(node, SUnaryOp):
             return self.visit_sunaryop(node)
+        elif isinstance(node, SIte):
+            return self.visit_site(node)
         elif isinstance(node, STuple):
             return self.visit_stuple(node)
         else:
@@ -94,6 +96,9 @@ class SymLangPrinter:
     def visit_stuple(self, node: STuple) -> str:
         return f"({', '.join([self.visit(e) for e in node.elements])})"
 
+    def visit_site(self, node: SIte) -> str:
+        return f"({self.visit(node.condition)} ? {self.visit(node.true_value)} : {self.visit(node.false_value)})"
+
 
 class HLTargetPrinter:
     def print(self, node: HLLang) -> str:
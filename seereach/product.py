@@ -0,0 +1,91 @@
+"""Feasibility-aware Products of Results
+
+A binary operator or a tuple combines one result of each operand. The combined path
+condition keeps the conjuncts that the operands share once, and combinations whose path
+conditions contradict each other are dropped as soon as they are formed.
+"""
+
+from typing import List, Tuple
+import z3
+from seereach.lang import Operator
+from seereach.result import EvalResult, PathCondition
+from seereach.symlang import SBoolean, SUnaryOp
+
+
+def _negation(condition):
+    if isinstance(condition, SUnaryOp) and condition.operator == Operator.NOT:
+        return condition.expression
+    return SUnaryOp(Operator.NOT, condition)
+
+
+def _contradicts(path_condition: PathCondition, new_conditions) -> bool:
+    """cheap syntactic check: a false conjunct, or a conjunct next to its negation"""
+    conditions = set(path_condition)
+    for condition in new_conditions:
+        if condition is SBoolean(False) or _negation(condition) in conditions:
+            return True
+    return False
+
+
+def feasible_product(
+    groups: List[List[EvalResult]], base: PathCondition, session=None
+) -> List[Tuple[Tuple[EvalResult, ...], PathCondition]]:
+    """
+    Combinations of one result per group, with their joined path conditions
+
+    Groups are combined smallest first, so that partial combinations are pruned while
+    there are few of them, and the combinations are returned in the order of
+    itertools.product. A partial combination is dropped when joining a result adds a
+    conjunct that contradicts it syntactically, or, given a solver session, when both sides
+    bring conjuncts of their own and their conjunction is unsatisfiable.
+
+    :param groups: the results of each operand
+    :param base: the path condition of the enclosing context
+    :param session: the Z3Session to check combinations with (None skips the solver)
+    """
+    order = sorted(range(len(groups)), key=lambda i: len(groups[i]))
+    # (index per group in combination order, path condition)
+    partial: List[Tuple[Tuple[int, ...], PathCondition]] = [((), base)]
+    for group_index in order:
+        extended = []
+        for indices, path_condition in partial:
+            for result_index, result in enumerate(groups[group_index]):
+                joined = path_condition.join(result.path_condition)
+                if joined is path_condition:
+                    extended.append((indices + (result_index,), joined))
+                    continue
+                new_conditions = joined.suffix(path_condition.length)
+                if _contradicts(path_condition, new_conditions):
+                    continue
+                if (
+                    session is not None
+                    and path_condition.length > base.length
+                    and session.check(joined) != z3.sat
+                ):
+                    continue
+                extended.append((indices + (result_index,), joined))
+        partial = extended
+
+    # back to the order of the groups
+    position = {group_index: i for i, group_index in enumerate(order)}
+    combinations = []
+    for indices, path_condition in partial:
+        key = tuple(indices[position[g]] for g in range(len(groups)))
+        combinations.append((key, path_condition))
+    combinations.sort(key=lambda c: c[0])
+    return [
+        (tuple(groups[g][i] for g, i in enumerate(key)), path_condition)
+        for key, path_condition in combinations
+    ]
+
+
+def unique_results(results: List[EvalResult]) -> List[EvalResult]:
+    """drop repeated results (same value, path condition and kind), keeping the first"""
+    seen = set()
+    unique = []
+    for result in results:
+        key = (result.expr_eval, result.path_condition, result.is_return)
+        if key not in seen:
+            seen.add(key)
+            unique.append(result)
+    return unique
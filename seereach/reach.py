@@ -0,0 +1,394 @@
+"""Set-Based Reachability of Hybrid Models
+
+Computes flowpipes of the hybrid model extracted by the symbolic executor, for a batch of
+initial boxes at once. Each mode has a guard (its path condition) and a flow, and a state
+follows the flow of the mode whose guard holds.
+
+Every step of length h:
+
+* an a priori box B enclosing the states over the whole step is found by Picard iteration,
+  X + [0, h] F(B) within B, where F is the hull of the flows of the modes whose guards
+  possibly hold on B (interval evaluation)
+* where a single mode is possible on B, the set moves by the mean value form of its flow
+  around the center c of the set, x(h) in c + h f(c) + (I + h J(c)) (x0 - c) + R, with the
+  remainder R enclosed from the interval Jacobian over B
+* where several modes are possible, the set moves by h F(B), which covers any switching
+  between them; the pairs of modes possible in the step (or the next one) are the possible
+  transitions
+
+Sets are zonotopes (center and generators) or, with method="interval", boxes. Bounds are
+computed in plain floating point, without outward rounding, so a flowpipe can miss states
+by a rounding error: it is meant for plotting and testing, not as a proof of safety.
+"""
+
+from typing import Dict, List, Sequence
+import numpy as np
+from seereach.intervals import Interval, box_env, interval_evaluate, interval_gradient
+from seereach.result import EvalResult
+from seereach.symlang import STuple, SymLang
+
+
+class ReachResult:
+    """
+    The flowpipes of a batch of initial boxes
+
+    :param times: (T + 1,) step boundaries
+    :param lower: (T, N, d) lower bounds of the box enclosing each step
+    :param upper: (T, N, d) upper bounds of the box enclosing each step
+    :param modes: (T, N, M) the modes possible in each step
+    :param transitions: (M, M) the possible mode switches, from row to column
+    :param escaped: (N,) the sets that left every guard, or could not be enclosed (their
+        boxes are NaN from then on)
+    :param center: (N, d) the center of the final sets
+    :param generators: (N, d, m) the generators of the final sets
+    """
+
+    def __init__(
+        self, times, lower, upper, modes, transitions, escaped, center, generators
+    ):
+        self.times = times
+        self.lower = lower
+        self.upper = upper
+        self.modes = modes
+        self.transitions = transitions
+        self.escaped = escaped
+        self.center = center
+        self.generators = generators
+
+    def final_box(self):
+        """the lower and upper bounds of the final sets"""
+        radius = np.abs(self.generators).sum(axis=2)
+        return self.center - radius, self.center + radius
+
+    def __repr__(self):
+        return (
+            f"ReachResult({self.lower.shape[1]} sets, {len(self.times) - 1} steps, "
+            f"{int(self.transitions.sum())} transitions, "
+            f"{int(self.escaped.sum())} escaped)"
+        )
+
+
+def _parameter(value) -> Interval:
+    """an Interval from a point, an array of points, a (lo, hi) pair or an Interval"""
+    if isinstance(value, Interval):
+        return value
+    if isinstance(value, tuple):
+        return Interval(*value)
+    return Interval(value)
+
+
+def _stack(components: List[Interval], shape: tuple) -> Interval:
+    """one Interval from a list, along a new last axis"""
+    return Interval(
+        np.stack([np.broadcast_to(c.lo, shape) for c in components], axis=-1),
+        np.stack([np.broadcast_to(c.hi, shape) for c in components], axis=-1),
+    )
+
+
+class ReachabilityAnalysis:
+    """
+    Batched flowpipe construction for the modes of a function
+
+    :param results: the modes, e.g. from function_symbolic_execution
+    :param state: the state variable names, in the column order of the boxes
+    :param parameters: constant values for some of the other free variables
+    :param method: "zonotope" or "interval"
+    :param order: zonotopes keep at most order * d generators
+    :param iterations: Picard iterations for the a priori enclosure of a step
+    """
+
+    def __init__(
+        self,
+        results: List[EvalResult],
+        state: Sequence[str],
+        parameters: Dict[str, float] = None,
+        method: str = "zonotope",
+        order: int = 10,
+        iterations: int = 10,
+    ):
+        if method not in ("zonotope", "interval"):
+            raise ValueError(f"Unknown method: {method}")
+        if order < 2:
+            raise ValueError("zonotopes need an order of at least 2")
+        self.results = results
+        self.state = list(state)
+        self.constants = {} if parameters is None else dict(parameters)
+        self.method = method
+        self.order = order
+        self.iterations = iterations
+        self.flows: List[List[SymLang]] = []
+        for result in results:
+            flow = result.expr_eval
+            flow = list(flow.elements) if isinstance(flow, STuple) else [flow]
+            if len(flow) != len(self.state):
+                raise ValueError(
+                    f"a flow of dimension {len(flow)} for {len(self.state)} state variables"
+                )
+            self.flows.append(flow)
+
+    def _env(self, box: Interval, parameters: Dict[str, Interval]) -> Dict:
+        env = {name: Interval(value) for name, value in self.constants.items()}
+        env.update(parameters)
+        env.update(box_env(self.state, box))
+        return env
+
+    def _possible(self, env: Dict, n: int) -> np.ndarray:
+        """(n, M) the modes whose guards possibly hold"""
+        memo = {}
+        possible = np.ones((n, len(self.results)), dtype=bool)
+        for m, result in enumerate(self.results):
+            for condition in result.path_condition:
+                truth = interval_evaluate(condition, env, memo)
+                possible[:, m] &= np.broadcast_to(truth.hi == 1.0, (n,))
+        return possible
+
+    def _flow(self, m: int, env: Dict, n: int, memo: Dict) -> Interval:
+        """(n, d) the flow of a mode"""
+        return _stack(
+            [interval_evaluate(e, env, memo) for e in self.flows[m]],
+            (n,),
+        )
+
+    def _flow_hull(self, env: Dict, possible: np.ndarray) -> Interval:
+        """(n, d) the hull of the flows of the possible modes"""
+        n = possible.shape[0]
+        d = len(self.state)
+        lo = np.full((n, d), np.inf)
+        hi = np.full((n, d), -np.inf)
+        memo = {}
+        for m in range(len(self.results)):
+            rows = possible[:, m]
+            if rows.any():
+                flow = self._flow(m, env, n, memo)
+                lo[rows] = np.minimum(lo[rows], flow.lo[rows])
+                hi[rows] = np.maximum(hi[rows], flow.hi[rows])
+        return Interval(lo, hi)
+
+    def _enclose(self, box: Interval, h: float, parameters: Dict[str, Interval]):
+        """
+        the a priori enclosures of a step from boxes
+
+        :return: the enclosure, the modes possible on it, the hull of their flows over the
+            enclosure the iteration converged from, and the rows the iteration failed for
+        """
+        n = box.shape[0]
+        step = Interval(0.0, h)
+        possible = self._possible(self._env(box, parameters), n)
+        flows = self._flow_hull(self._env(box, parameters), possible)
+        enclosure = box + step * flows
+        done = np.zeros(n, dtype=bool)
+        result = Interval(enclosure.lo.copy(), enclosure.hi.copy())
+        result_flows = Interval(flows.lo.copy(), flows.hi.copy())
+        for _ in range(self.iterations):
+            # widen the candidate a little so that the iteration can close
+            radius = 1.1 * enclosure.radius() + 1e-9 * (1.0 + np.abs(enclosure.mid()))
+            candidate = Interval(enclosure.mid() - radius, enclosure.mid() + radius)
+            env = self._env(candidate, parameters)
+            possible = self._possible(env, n)
+            flows = self._flow_hull(env, possible)
+            enclosure = box + step * flows
+            closed = (
+                ~done & possible.any(axis=1) & enclosure.subset(candidate).all(axis=1)
+            )
+            result.lo[closed] = enclosure.lo[closed]
+            result.hi[closed] = enclosure.hi[closed]
+            result_flows.lo[closed] = flows.lo[closed]
+            result_flows.hi[closed] = flows.hi[closed]
+            done |= closed
+            if done.all():
+                break
+        possible = self._possible(self._env(result, parameters), n)
+        failed = ~done | ~possible.any(axis=1)
+        return result, possible, result_flows, failed
+
+    def _linearized(self, m, center, enclosure, h, parameters):
+        """
+        the linear map and remainder of a step in one mode
+
+        :return: the (n, d, d) map of the offsets from the center, the (n, d) new center and
+            the (n, d) radius of the remainder
+        """
+        n, d = center.shape
+        values, jacobian = [], []
+        for env, target in (
+            (self._env(enclosure, parameters), jacobian),
+            (self._env(Interval(center), parameters), values),
+        ):
+            memo = {}
+            rows_value, rows_gradient = [], []
+            for e in self.flows[m]:
+                value, gradient = interval_gradient(e, env, self.state, memo)
+                rows_value.append(value)
+                rows_gradient.append(
+                    Interval(np.zeros((n, d))) if gradient is None else gradient
+                )
+            target.append(_stack(rows_value, (n,)))
+            # one row of the Jacobian per component
+            target.append(
+                Interval(
+                    np.stack([np.broadcast_to(g.lo, (n, d)) for g in rows_gradient], 1),
+                    np.stack([np.broadcast_to(g.hi, (n, d)) for g in rows_gradient], 1),
+                )
+            )
+        flows_enclosure, jacobian_enclosure = jacobian
+        flow_center, jacobian_center = values
+        linear = jacobian_center.mid()
+        # f(x) in f(c) + J (x - c) + (J(B) - J) (x - c), and x(s) - x0 in s F(B)
+        remainder = (
+            (h * h / 2) * (Interval(linear) * flows_enclosure[:, None, :]).sum(axis=2)
+            + h
+            * (
+                (jacobian_enclosure - Interval(linear))
+                * (enclosure - Interval(center))[:, None, :]
+            ).sum(axis=2)
+            + h * (flow_center - Interval(flow_center.mid()))
+        )
+        mapping = np.eye(d) + h * linear
+        return (
+            mapping,
+            center + h * flow_center.mid() + remainder.mid(),
+            remainder.radius(),
+        )
+
+    def _reduce(self, generators: np.ndarray) -> np.ndarray:
+        """bound the number of generators, boxing the smallest ones (Girard's method)"""
+        n, d, m = generators.shape
+        if self.method == "interval":
+            return np.abs(generators).sum(axis=2)[:, :, None] * np.eye(d)[None]
+        limit = self.order * d
+        if m <= limit:
+            return generators
+        magnitude = np.abs(generators)
+        score = magnitude.sum(axis=1) - magnitude.max(axis=1)
+        order = np.argsort(-score, axis=1)
+        keep = np.take_along_axis(generators, order[:, None, : limit - d], axis=2)
+        rest = np.take_along_axis(magnitude, order[:, None, limit - d :], axis=2)
+        boxed = rest.sum(axis=2)[:, :, None] * np.eye(d)[None]
+        return np.concatenate([keep, boxed], axis=2)
+
+    def reach(self, lower, upper, t_final: float, step: float, **parameters):
+        """
+        the flowpipes of a batch of initial boxes
+
+        :param lower: (N, d) lower bounds of the initial boxes
+        :param upper: (N, d) upper bounds of the initial boxes
+        :param t_final: the time horizon
+        :param step: the step length
+        :param parameters: the remaining free variables: scalars, (N,) arrays, (lo, hi)
+            pairs or Intervals
+        :return: a ReachResult
+        """
+        lower = np.atleast_2d(np.asarray(lower, dtype=float))
+        upper = np.atleast_2d(np.asarray(upper, dtype=float))
+        n, d = lower.shape
+        if d != len(self.state):
+            raise ValueError(f"boxes of dimension {d} for {len(self.state)} variables")
+        parameters = {name: _parameter(v) for name, v in parameters.items()}
+        steps = int(np.ceil(t_final / step - 1e-9))
+        times = np.minimum(np.arange(steps + 1) * step, t_final)
+        modes_count = len(self.results)
+
+        center = (lower + upper) / 2
+        generators = ((upper - lower) / 2)[:, :, None] * np.eye(d)[None]
+        escaped = np.zeros(n, dtype=bool)
+        out_lower = np.full((steps, n, d), np.nan)
+        out_upper = np.full((steps, n, d), np.nan)
+        out_modes = np.zeros((steps, n, modes_count), dtype=bool)
+        transitions = np.zeros((modes_count, modes_count), dtype=bool)
+        previous = None
+
+        with np.errstate(invalid="ignore", over="ignore"):
+            for k in range(steps):
+                h = times[k + 1] - times[k]
+                live = np.flatnonzero(~escaped)
+                if live.size == 0:
+                    break
+                p = {name: value[live] for name, value in parameters.items()}
+                c = center[live]
+                g = generators[live]
+                radius = np.abs(g).sum(axis=2)
+                box = Interval(c - radius, c + radius)
+                enclosure, possible, flows, failed = self._enclose(box, h, p)
+
+                # several possible modes: any switching between them within h F(B)
+                mapping = np.broadcast_to(np.eye(d), (live.size, d, d)).copy()
+                new_center = c + h * flows.mid()
+                extra = h * flows.radius()
+                single = possible.sum(axis=1) == 1
+                mode = np.argmax(possible, axis=1)
+                for m in np.unique(mode[single]):
+                    rows = np.flatnonzero(single & (mode == m))
+                    mapping[rows], new_center[rows], extra[rows] = self._linearized(
+                        m,
+                        c[rows],
+                        enclosure[rows],
+                        h,
+                        {name: value[rows] for name, value in p.items()},
+                    )
+
+                g = np.einsum("nij,njk->nik", mapping, g)
+                g = np.concatenate([g, extra[:, :, None] * np.eye(d)[None]], axis=2)
+                g = self._reduce(g)
+                failed |= ~np.isfinite(new_center).all(axis=1)
+                failed |= ~np.isfinite(g).all(axis=(1, 2))
+
+                if generators.shape[2] != g.shape[2]:
+                    resized = np.zeros((n, d, g.shape[2]))
+                    resized[live] = g
+                    generators = resized
+                else:
+                    generators[live] = g
+                center[live] = new_center
+                escaped[live[failed]] = True
+                ok = live[~failed]
+                out_lower[k, ok] = enclosure.lo[~failed]
+                out_upper[k, ok] = enclosure.hi[~failed]
+                out_modes[k, live] = possible
+
+                # a mode possible now can switch to any mode possible now or next step
+                current = out_modes[k]
+                transitions |= np.einsum("ni,nj->ij", current, current) > 0
+                if previous is not None:
+                    transitions |= np.einsum("ni,nj->ij", previous, current) > 0
+                previous = current
+
+        np.fill_diagonal(transitions, False)
+        center[escaped] = np.nan
+        generators[escaped] = np.nan
+        return ReachResult(
+            times,
+            out_lower,
+            out_upper,
+            out_modes,
+            transitions,
+            escaped,
+            center,
+            generators,
+        )
+
+
+def reach_modes(
+    results: List[EvalResult],
+    state: Sequence[str],
+    lower,
+    upper,
+    t_final: float,
+    step: float,
+    method: str = "zonotope",
+    **parameters,
+) -> ReachResult:
+    """
+    the flowpipes of the modes of a function from a batch of initial boxes
+
+    :param results: the modes, e.g. from function_symbolic_execution
+    :param state: the state variable names, in the column order of the boxes
+    :param lower: (N, d) lower bounds of the initial boxes
+    :param upper: (N, d) upper bounds of the initial boxes
+    :param t_final: the time horizon
+    :param step: the step length
+    :param method: "zonotope" or "interval"
+    :param parameters: the remaining free variables: scalars, (N,) arrays, (lo, hi) pairs
+        or Intervals
+    """
+    analysis = ReachabilityAnalysis(results, state, method=method)
+    return analysis.reach(lower, upper, t_final, step, **parameters)
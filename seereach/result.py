@@ -1,9 +1,151 @@
 """Symbolic execution result"""
 
 
+class PathCondition:
+    """
+    An immutable path condition stored as a parent-pointer chain
+
+    Extending a path condition shares the existing chain as its tail, so forking a path
+    costs one node instead of a copy of every conjunct. Length and hash are cached per node.
+    Iteration yields the conjuncts oldest first, like the lists this replaces.
+    """
+
+    __slots__ = ("condition", "parent", "length", "_hash")
+
+    def __init__(self, condition=None, parent: "PathCondition" = None):
+        """
+        :param condition: the newest conjunct (None for the empty path condition)
+        :param parent: the path condition this one extends
+        """
+        self.condition = condition
+        self.parent = parent
+        if parent is None:
+            self.length = 0
+            self._hash = hash(())
+        else:
+            self.length = parent.length + 1
+            self._hash = hash((parent._hash, condition))
+
+    @classmethod
+    def of(cls, conditions) -> "PathCondition":
+        """build a path condition from an iterable (returned as-is if already one)"""
+        if isinstance(conditions, PathCondition):
+            return conditions
+        pc = EMPTY_PATH_CONDITION
+        if conditions is not None:
+            for condition in conditions:
+                pc = PathCondition(condition, pc)
+        return pc
+
+    def append(self, condition) -> "PathCondition":
+        """extend the path condition by one conjunct, sharing this chain as the tail"""
+        return PathCondition(condition, self)
+
+    def prefix(self, length: int) -> "PathCondition":
+        """the (shared) path condition made of the first length conjuncts"""
+        node = self
+        while node.length > length:
+            node = node.parent
+        return node
+
+    def join(self, other) -> "PathCondition":
+        """
+        conjunction with another path condition, without repeating shared conjuncts
+
+        When other extends this path condition (shares it as its tail), other is returned
+        as-is. Otherwise the conjuncts of other that are new are appended to this one.
+        """
+        other = PathCondition.of(other)
+        if other.length == 0 or other is self:
+            return self
+        if self.length == 0:
+            return other
+        # walk both chains back to their shared tail
+        a = self.prefix(min(self.length, other.length))
+        b = other.prefix(min(self.length, other.length))
+        while a is not b:
+            a, b = a.parent, b.parent
+        if a is self:
+            return other
+        if a is other:
+            return self
+        seen = set(self)
+        pc = self
+        for condition in other.suffix(a.length):
+            if condition not in seen:
+                seen.add(condition)
+                pc = PathCondition(condition, pc)
+        return pc
+
+    def suffix(self, length: int) -> list:
+        """the conjuncts after the first length ones, oldest first"""
+        conditions = []
+        node = self
+        while node.length > length:
+            conditions.append(node.condition)
+            node = node.parent
+        conditions.reverse()
+        return conditions
+
+    def copy(self) -> "PathCondition":
+        # immutable, so there is nothing to copy
+        return self
+
+    def __add__(self, other) -> "PathCondition":
+        # a conjunction, so conjuncts already on this path are not repeated
+        return self.join(other)
+
+    def __radd__(self, other) -> "PathCondition":
+        return PathCondition.of(other) + self
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        conditions = []
+        node = self
+        while node.length > 0:
+            conditions.append(node.condition)
+            node = node.parent
+        return reversed(conditions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("path condition index out of range")
+        return self.prefix(index + 1).condition
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # pickle as a flat list rather than a deeply nested chain
+        return (PathCondition.of, (list(self),))
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, PathCondition):
+            return NotImplemented
+        if self.length != other.length or self._hash != other._hash:
+            return False
+        return all(a is b or a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"PathCondition({list(self)})"
+
+
+EMPTY_PATH_CONDITION = PathCondition()
+
+
 class EvalResult:
     """EvalResult is *path* the return of evaluating an expression, meaning that branching expressions can return a list of EvalResults's"""
 
+    __slots__ = ("expr_eval", "path_condition", "is_return")
+
     def __init__(self, expr_eval, path_condition, is_return=False):
         """
         :param expr_eval: the result of evaluating the expression
@@ -11,7 +153,7 @@ class EvalResult:
         :param is_return: whether this result is a return statement (is that a good idea?)
         """
         self.expr_eval = expr_eval
-        self.path_condition = path_condition
+        self.path_condition = PathCondition.of(path_condition)
         self.is_return = is_return
 
     def flatten(self):
@@ -20,7 +162,7 @@ class EvalResult:
         if isinstance(self.expr_eval, EvalResult):
             er = EvalResult(
                 self.expr_eval.expr_eval,
-                self.path_condition + self.expr_eval.path_condition,
+                self.path_condition.join(self.expr_eval.path_condition),
             )
             return er.flatten()
         else:
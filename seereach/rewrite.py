@@ -0,0 +1,292 @@
+"""Constant Folding and Algebraic Normalization for SymLang
+
+The executor builds symbolic operators through these functions instead of the node
+constructors, so concrete subterms are folded away as soon as they appear and commutative
+operators get a canonical operand order.
+"""
+
+import math
+import operator as op
+import weakref
+from typing import Dict
+from seereach.lang import Operator
+from seereach.symlang import (
+    SBinaryOp,
+    SBoolean,
+    SInteger,
+    SIte,
+    SReal,
+    STuple,
+    SUnaryOp,
+    SVariable,
+    SymLang,
+)
+
+_ARITHMETIC = {
+    Operator.ADD: op.add,
+    Operator.SUB: op.sub,
+    Operator.MUL: op.mul,
+    Operator.DIV: op.truediv,
+    Operator.POW: op.pow,
+}
+
+_COMPARISON = {
+    Operator.GREATER: op.gt,
+    Operator.LESS: op.lt,
+    Operator.GREATER_EQUAL: op.ge,
+    Operator.LESS_EQUAL: op.le,
+    Operator.EQUAL: op.eq,
+}
+
+_COMMUTATIVE = {Operator.ADD, Operator.MUL, Operator.AND, Operator.OR, Operator.EQUAL}
+
+# interned nodes never change, so their order keys can be cached
+_order_keys = weakref.WeakKeyDictionary()
+
+
+def is_number(node) -> bool:
+    return isinstance(node, (SReal, SInteger))
+
+
+def _number(left, right, value):
+    """build the constant for an arithmetic result, keeping integers integral"""
+    if isinstance(left, SInteger) and isinstance(right, SInteger):
+        if isinstance(value, int):
+            return SInteger(value)
+    return SReal(float(value))
+
+
+def order_key(node):
+    """
+    deterministic structural sort key: constants, then variables, then compound terms
+    """
+    try:
+        return _order_keys[node]
+    except (KeyError, TypeError):
+        pass
+    if isinstance(node, (SReal, SInteger, SBoolean)):
+        key = (0, type(node).__name__, node.value)
+    elif isinstance(node, SVariable):
+        key = (1, str(node.name))
+    elif isinstance(node, SUnaryOp):
+        key = (2, node.operator.value, order_key(node.expression))
+    elif isinstance(node, SBinaryOp):
+        key = (
+            3,
+            node.operator.value,
+            order_key(node.left),
+            order_key(node.right),
+        )
+    elif isinstance(node, STuple):
+        key = (4, tuple(order_key(e) for e in node.elements))
+    elif isinstance(node, SIte):
+        key = (
+            5,
+            order_key(node.condition),
+            order_key(node.true_value),
+            order_key(node.false_value),
+        )
+    else:
+        key = (6, type(node).__name__, repr(node))
+    try:
+        _order_keys[node] = key
+    except TypeError:
+        pass
+    return key
+
+
+def _complementary(left, right) -> bool:
+    """whether one operand is the negation of the other"""
+    return (
+        isinstance(left, SUnaryOp)
+        and left.operator == Operator.NOT
+        and left.expression is right
+    ) or (
+        isinstance(right, SUnaryOp)
+        and right.operator == Operator.NOT
+        and right.expression is left
+    )
+
+
+def _has_coefficient(node, operator: Operator) -> bool:
+    """whether node is `c op x` for a constant c"""
+    return (
+        isinstance(node, SBinaryOp)
+        and node.operator == operator
+        and is_number(node.left)
+    )
+
+
+def fold_binary_op(operator: Operator, left: SymLang, right: SymLang) -> SymLang:
+    """
+    build a binary operator, folding constants and eliminating identities and annihilators
+
+    :param operator: the operator to apply
+    :param left: the left operand
+    :param right: the right operand
+    """
+    # constant folding
+    if is_number(left) and is_number(right):
+        if operator in _ARITHMETIC:
+            if operator == Operator.DIV and right.value == 0:
+                # leave it symbolic, the path may well be infeasible
+                return SBinaryOp(left, operator, right)
+            try:
+                value = _ARITHMETIC[operator](left.value, right.value)
+            except (OverflowError, ZeroDivisionError):
+                return SBinaryOp(left, operator, right)
+            if isinstance(value, complex):
+                return SBinaryOp(left, operator, right)
+            return _number(left, right, value)
+        elif operator in _COMPARISON:
+            return SBoolean(_COMPARISON[operator](left.value, right.value))
+    if isinstance(left, SBoolean) and isinstance(right, SBoolean):
+        if operator == Operator.AND:
+            return SBoolean(left.value and right.value)
+        elif operator == Operator.OR:
+            return SBoolean(left.value or right.value)
+        elif operator == Operator.EQUAL:
+            return SBoolean(left.value == right.value)
+
+    # canonical operand order for commutative operators
+    if operator in _COMMUTATIVE and order_key(right) < order_key(left):
+        left, right = right, left
+
+    # identity and annihilator elimination (constants are ordered to the left)
+    if operator == Operator.ADD:
+        if is_number(left) and left.value == 0:
+            return right
+    elif operator == Operator.SUB:
+        if is_number(right) and right.value == 0:
+            return left
+    elif operator == Operator.MUL:
+        if is_number(left) and left.value == 1:
+            return right
+        if is_number(left) and left.value == 0:
+            return left
+    elif operator == Operator.DIV:
+        if is_number(right) and right.value == 1:
+            return left
+    elif operator == Operator.POW:
+        if is_number(right) and right.value == 1:
+            return left
+        if is_number(right) and right.value == 0:
+            return _number(right, right, 1)
+    elif operator == Operator.AND:
+        if isinstance(left, SBoolean):
+            return right if left.value else left
+        if left is right:
+            return left
+        if _complementary(left, right):
+            return SBoolean(False)
+    elif operator == Operator.OR:
+        if isinstance(left, SBoolean):
+            return left if left.value else right
+        if left is right:
+            return left
+        if _complementary(left, right):
+            return SBoolean(True)
+
+    # reassociate so that constants collect on the left:
+    #   c1 op (c2 op x) -> (c1 op c2) op x
+    #   x op (c op y) -> c op (x op y), and likewise (c op y) op x
+    if operator in (Operator.ADD, Operator.MUL):
+        if _has_coefficient(right, operator):
+            if is_number(left):
+                return fold_binary_op(
+                    operator, fold_binary_op(operator, left, right.left), right.right
+                )
+            return fold_binary_op(
+                operator, right.left, fold_binary_op(operator, left, right.right)
+            )
+        if _has_coefficient(left, operator) and not is_number(right):
+            return fold_binary_op(
+                operator, left.left, fold_binary_op(operator, left.right, right)
+            )
+
+    return SBinaryOp(left, operator, right)
+
+
+def fold_unary_op(operator: Operator, value: SymLang) -> SymLang:
+    """
+    build a unary operator, folding constants and double negation
+
+    :param operator: the operator to apply
+    :param value: the operand
+    """
+    if operator == Operator.NOT:
+        if isinstance(value, SBoolean):
+            return SBoolean(not value.value)
+        if isinstance(value, SUnaryOp) and value.operator == Operator.NOT:
+            return value.expression
+    elif operator == Operator.SIN:
+        if is_number(value):
+            return SReal(math.sin(value.value))
+    return SUnaryOp(operator, value)
+
+
+def fold_ite(condition: SymLang, true_value: SymLang, false_value: SymLang) -> SymLang:
+    """
+    build an if-then-else, selecting statically where possible and pushing it into tuples
+
+    :param condition: the boolean selector
+    :param true_value: the value when condition holds
+    :param false_value: the value otherwise
+    """
+    if isinstance(condition, SBoolean):
+        return true_value if condition.value else false_value
+    if true_value is false_value:
+        return true_value
+    if (
+        isinstance(true_value, STuple)
+        and isinstance(false_value, STuple)
+        and len(true_value.elements) == len(false_value.elements)
+    ):
+        return STuple(
+            [
+                fold_ite(condition, t, f)
+                for t, f in zip(true_value.elements, false_value.elements)
+            ]
+        )
+    return SIte(condition, true_value, false_value)
+
+
+def substitute(expr: SymLang, mapping: Dict[SymLang, SymLang], memo=None) -> SymLang:
+    """
+    replace nodes of an expression, rebuilding the changed parts through the folding
+    constructors so that the result is folded and normalized again
+
+    :param expr: the expression to rewrite
+    :param mapping: node -> replacement (typically variables to values)
+    :param memo: node -> rewritten node, shared between calls with the same mapping
+    """
+    if memo is None:
+        memo = {}
+    if expr in mapping:
+        return mapping[expr]
+    if expr in memo:
+        return memo[expr]
+    if isinstance(expr, SBinaryOp):
+        left = substitute(expr.left, mapping, memo)
+        right = substitute(expr.right, mapping, memo)
+        if left is expr.left and right is expr.right:
+            result = expr
+        else:
+            result = fold_binary_op(expr.operator, left, right)
+    elif isinstance(expr, SUnaryOp):
+        value = substitute(expr.expression, mapping, memo)
+        if value is expr.expression:
+            result = expr
+        else:
+            result = fold_unary_op(expr.operator, value)
+    elif isinstance(expr, SIte):
+        condition = substitute(expr.condition, mapping, memo)
+        true_value = substitute(expr.true_value, mapping, memo)
+        false_value = substitute(expr.false_value, mapping, memo)
+        result = fold_ite(condition, true_value, false_value)
+    elif isinstance(expr, STuple):
+        result = STuple([substitute(e, mapping, memo) for e in expr.elements])
+    else:
+        result = expr
+    memo[expr] = result
+    return result
@@ -0,0 +1,127 @@
+"""JSON Encoding of SymLang Expressions and Results
+
+Expressions are written as a node table in post order, with children referenced by their
+index, so an expression takes space linear in the size of its DAG.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, TextIO
+from seereach.lang import Name, Operator, Type
+from seereach.result import EvalResult
+from seereach.symlang import (
+    SBinaryOp,
+    SBoolean,
+    SInteger,
+    SIte,
+    SReal,
+    STuple,
+    SUnaryOp,
+    SVariable,
+    SymLang,
+)
+
+
+class NodeTable:
+    """encodes SymLang nodes into a shared table of JSON-friendly lists"""
+
+    def __init__(self):
+        self.nodes: List[List[Any]] = []
+        self.index: Dict[SymLang, int] = {}
+
+    def add(self, node: SymLang) -> int:
+        if node in self.index:
+            return self.index[node]
+        if isinstance(node, SReal):
+            entry = ["real", node.value]
+        elif isinstance(node, SInteger):
+            entry = ["int", node.value]
+        elif isinstance(node, SBoolean):
+            entry = ["bool", node.value]
+        elif isinstance(node, SVariable):
+            entry = ["var", str(node.name), node.variable_type.value]
+        elif isinstance(node, STuple):
+            entry = ["tuple", [self.add(e) for e in node.elements]]
+        elif isinstance(node, SBinaryOp):
+            entry = [
+                "bin",
+                node.operator.value,
+                self.add(node.left),
+                self.add(node.right),
+            ]
+        elif isinstance(node, SUnaryOp):
+            entry = ["un", node.operator.value, self.add(node.expression)]
+        elif isinstance(node, SIte):
+            entry = [
+                "ite",
+                self.add(node.condition),
+                self.add(node.true_value),
+                self.add(node.false_value),
+            ]
+        else:
+            raise ValueError(f"Cannot serialize {type(node)}")
+        self.index[node] = len(self.nodes)
+        self.nodes.append(entry)
+        return self.index[node]
+
+
+def decode_nodes(nodes: List[List[Any]]) -> List[SymLang]:
+    """rebuild (interned) SymLang nodes from a node table"""
+    decoded: List[SymLang] = []
+    for entry in nodes:
+        kind = entry[0]
+        if kind == "real":
+            node = SReal(entry[1])
+        elif kind == "int":
+            node = SInteger(entry[1])
+        elif kind == "bool":
+            node = SBoolean(entry[1])
+        elif kind == "var":
+            node = SVariable(Name(entry[1]), Type(entry[2]))
+        elif kind == "tuple":
+            node = STuple([decoded[i] for i in entry[1]])
+        elif kind == "bin":
+            node = SBinaryOp(decoded[entry[2]], Operator(entry[1]), decoded[entry[3]])
+        elif kind == "un":
+            node = SUnaryOp(Operator(entry[1]), decoded[entry[2]])
+        elif kind == "ite":
+            node = SIte(decoded[entry[1]], decoded[entry[2]], decoded[entry[3]])
+        else:
+            raise ValueError(f"Unknown node kind: {kind}")
+        decoded.append(node)
+    return decoded
+
+
+def result_to_json(result: EvalResult) -> Dict[str, Any]:
+    """encode a result (a mode: flow and guard conjuncts) as a JSON object"""
+    table = NodeTable()
+    flow = table.add(result.expr_eval)
+    guard = [table.add(c) for c in result.path_condition]
+    return {"nodes": table.nodes, "flow": flow, "guard": guard}
+
+
+def result_from_json(data: Dict[str, Any]) -> EvalResult:
+    nodes = decode_nodes(data["nodes"])
+    return EvalResult(
+        nodes[data["flow"]], [nodes[i] for i in data["guard"]], is_return=False
+    )
+
+
+def write_jsonl(results: Iterable[EvalResult], fp: TextIO) -> int:
+    """
+    write results as JSON lines as they arrive, returning the number written
+
+    Each line is flushed, so a consumer can follow the file while a streaming exploration
+    is still running.
+    """
+    count = 0
+    for result in results:
+        fp.write(json.dumps(result_to_json(result)) + "\n")
+        fp.flush()
+        count += 1
+    return count
+
+
+def read_jsonl(fp: TextIO) -> Iterable[EvalResult]:
+    for line in fp:
+        if line.strip():
+            yield result_from_json(json.loads(line))
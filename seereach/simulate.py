@@ -0,0 +1,361 @@
+"""Batched Simulation of Hybrid Models
+
+Simulates the hybrid model extracted by the symbolic executor: each mode has a guard over
+the state and a flow (the derivative), and a trajectory follows the flow of its current mode
+until the state leaves that mode's guard. Thousands of initial states are integrated at once
+on NumPy arrays, with the modes compiled by seereach.codegen.
+
+Within a step a trajectory keeps the flow of its current mode. When the state at the end of
+the step is in another mode, the crossing is located by bisection on the step length, the
+switch is recorded as an event, and the trajectory continues in the new mode for the rest
+of the step. A trajectory that reaches a state no mode covers stops (NaN from then on).
+
+Two integrators are available: classic fixed-step RK4, and adaptive Dormand-Prince 5(4)
+with a step size per trajectory. Both report the states on a fixed output grid.
+"""
+
+from typing import Dict, List, Sequence, Union
+import numpy as np
+from seereach.codegen import ModeFunction, compile_modes
+from seereach.result import EvalResult
+
+# Dormand-Prince 5(4) tableau
+_DP_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+_DP_B5 = np.array([35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0.0])
+_DP_B4 = np.array(
+    [
+        5179 / 57600,
+        0.0,
+        7571 / 16695,
+        393 / 640,
+        -92097 / 339200,
+        187 / 2100,
+        1 / 40,
+    ]
+)
+
+
+def _rows(parameters: Dict[str, object], rows) -> Dict[str, object]:
+    """the parameters of a subset of the trajectories (per-trajectory arrays are indexed)"""
+    return {
+        name: value[rows] if np.ndim(value) > 0 else value
+        for name, value in parameters.items()
+    }
+
+
+class SwitchEvents:
+    """the mode switches of a simulation, one entry per switch in each array"""
+
+    def __init__(self, trajectory, time, source, target, state):
+        self.trajectory: np.ndarray = trajectory
+        self.time: np.ndarray = time
+        self.source: np.ndarray = source
+        self.target: np.ndarray = target
+        self.state: np.ndarray = state
+
+    def __len__(self):
+        return len(self.trajectory)
+
+    def __repr__(self):
+        return f"SwitchEvents({len(self)} switches)"
+
+
+class Simulation:
+    """
+    The result of a batched simulation
+
+    :param times: (T,) output times
+    :param states: (T, N, d) state of every trajectory at every output time
+    :param modes: (T, N) mode of every trajectory at every output time (-1 once stopped)
+    :param events: the mode switches
+    """
+
+    def __init__(self, times, states, modes, events: SwitchEvents):
+        self.times = times
+        self.states = states
+        self.modes = modes
+        self.events = events
+
+    def __repr__(self):
+        return (
+            f"Simulation({self.states.shape[1]} trajectories, "
+            f"{len(self.times)} times, {len(self.events)} switches)"
+        )
+
+
+class HybridSimulator:
+    """
+    Batched simulator of the modes of a function
+
+    :param model: the modes (e.g. from function_symbolic_execution) or a ModeFunction
+    :param state: the state variable names, in the column order of the states
+    :param parameters: constant values for some of the other free variables
+    :param method: "rk4" (fixed step) or "dopri5" (adaptive)
+    :param rtol: relative tolerance of the adaptive method
+    :param atol: absolute tolerance of the adaptive method
+    :param bisection_steps: bisections locating a switch within a step
+    :param max_switches: switches handled per trajectory and step, the rest of a step is
+        integrated without switching (guards against chattering)
+    """
+
+    def __init__(
+        self,
+        model: Union[List[EvalResult], ModeFunction],
+        state: Sequence[str] = None,
+        parameters: Dict[str, float] = None,
+        method: str = "rk4",
+        rtol: float = 1e-6,
+        atol: float = 1e-9,
+        bisection_steps: int = 30,
+        max_switches: int = 8,
+    ):
+        if not isinstance(model, ModeFunction):
+            model = compile_modes(model, state, parameters)
+        if method not in ("rk4", "dopri5"):
+            raise ValueError(f"Unknown method: {method}")
+        self.modes = model
+        self.method = method
+        self.rtol = rtol
+        self.atol = atol
+        self.bisection_steps = bisection_steps
+        self.max_switches = max_switches
+
+    def _rk4(self, x, mode, h, parameters):
+        def f(y):
+            return self.modes.flow(y, mode, **parameters)
+
+        h = h[:, None]
+        k1 = f(x)
+        k2 = f(x + h / 2 * k1)
+        k3 = f(x + h / 2 * k2)
+        k4 = f(x + h * k3)
+        return x + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+    def _dopri(self, x, mode, h, parameters):
+        """the 5th order step and its error estimate"""
+        h = h[:, None]
+        k = []
+        for a in _DP_A:
+            y = x
+            for a_j, k_j in zip(a, k):
+                if a_j != 0.0:
+                    y = y + h * a_j * k_j
+            k.append(self.modes.flow(y, mode, **parameters))
+        x5 = x + h * sum(b * k_j for b, k_j in zip(_DP_B5, k) if b != 0.0)
+        x4 = x + h * sum(b * k_j for b, k_j in zip(_DP_B4, k) if b != 0.0)
+        return x5, x5 - x4
+
+    def _step(self, x, mode, h, parameters):
+        if self.method == "rk4":
+            return self._rk4(x, mode, h, parameters)
+        return self._dopri(x, mode, h, parameters)[0]
+
+    def _locate(self, x, x_end, mode, h, parameters):
+        """
+        bisect a step for the first state out of the current mode
+
+        The states within the step come from the cubic Hermite interpolant of its ends, so
+        the bisection only evaluates the guards.
+
+        :return: the time up to just past the switch, the state there and its mode
+        """
+        h = h[:, None]
+        slope = h * self.modes.flow(x, mode, **parameters)
+        slope_end = h * self.modes.flow(x_end, mode, **parameters)
+        lo = np.zeros((x.shape[0], 1))
+        hi = np.ones((x.shape[0], 1))
+
+        def interpolate(s):
+            return (
+                (1 + 2 * s) * (1 - s) ** 2 * x
+                + s * (1 - s) ** 2 * slope
+                + s**2 * (3 - 2 * s) * x_end
+                - s**2 * (1 - s) * slope_end
+            )
+
+        for _ in range(self.bisection_steps):
+            mid = (lo + hi) / 2
+            changed = self.modes.active(interpolate(mid), **parameters) != mode
+            hi = np.where(changed[:, None], mid, hi)
+            lo = np.where(changed[:, None], lo, mid)
+        tau = (hi * h)[:, 0]
+        # integrated to the switch; where the interpolant was early the mode is unchanged
+        # and the rest of the step finds the switch again
+        x_event = self._step(x, mode, tau, parameters)
+        return tau, x_event, self.modes.active(x_event, **parameters)
+
+    def simulate(
+        self, initial_states, t_final: float, dt: float, **parameters
+    ) -> Simulation:
+        """
+        simulate every initial state from time 0 to t_final
+
+        :param initial_states: an (N, d) array of initial states
+        :param t_final: the end time
+        :param dt: the output interval, which is also the step of the fixed-step method
+        :param parameters: the remaining free variables, scalars or (N,) arrays
+        """
+        x = np.atleast_2d(np.asarray(initial_states, dtype=float)).copy()
+        n = x.shape[0]
+        steps = int(np.ceil(t_final / dt - 1e-9))
+        times = np.arange(steps + 1) * dt
+        times[-1] = min(times[-1], t_final)
+        mode = self.modes.active(x, **parameters)
+        x[mode < 0] = np.nan
+        states = np.empty((steps + 1,) + x.shape)
+        modes = np.empty((steps + 1, n), dtype=int)
+        states[0], modes[0] = x, mode
+        self._events = []
+        # per trajectory step sizes of the adaptive method
+        self._h = np.full(n, dt)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for k in range(steps):
+                h = times[k + 1] - times[k]
+                if self.method == "rk4":
+                    self._advance_fixed(x, mode, times[k], h, parameters)
+                else:
+                    self._advance_adaptive(x, mode, times[k], h, parameters)
+                states[k + 1], modes[k + 1] = x, mode
+        events = self._events
+        del self._events
+        if events:
+            events = [np.concatenate(column) for column in zip(*events)]
+        else:
+            d = x.shape[1]
+            events = [
+                np.empty(0, int),
+                np.empty(0),
+                np.empty(0, int),
+                np.empty(0, int),
+                np.empty((0, d)),
+            ]
+        return Simulation(times, states, modes, SwitchEvents(*events))
+
+    def _switch(self, x, mode, elapsed, t, rows, x_start, x_end, h, parameters):
+        """
+        handle the rows that left their mode during a step of length h
+
+        :return: the rows that go on (in their new mode, or the old one if the switch
+            lies a little further)
+        """
+        tau, x_event, target = self._locate(
+            x_start, x_end, mode[rows], h, _rows(parameters, rows)
+        )
+        elapsed[rows] += tau
+        switched = target != mode[rows]
+        self._events.append(
+            (
+                rows[switched],
+                t + elapsed[rows[switched]],
+                mode[rows[switched]],
+                target[switched],
+                x_event[switched],
+            )
+        )
+        x[rows] = x_event
+        mode[rows] = target
+        stopped = target < 0
+        x[rows[stopped]] = np.nan
+        return rows[~stopped]
+
+    def _advance_fixed(self, x, mode, t, h, parameters):
+        elapsed = np.zeros(x.shape[0])
+        pending = np.flatnonzero(mode >= 0)
+        for switches in range(self.max_switches + 1):
+            if pending.size == 0:
+                return
+            p = _rows(parameters, pending)
+            remaining = h - elapsed[pending]
+            x_start = x[pending]
+            x_new = self._rk4(x_start, mode[pending], remaining, p)
+            if switches == self.max_switches:
+                # too many switches within one step: finish it where it is
+                x[pending] = x_new
+                return
+            switching = self.modes.active(x_new, **p) != mode[pending]
+            x[pending[~switching]] = x_new[~switching]
+            pending = self._switch(
+                x,
+                mode,
+                elapsed,
+                t,
+                pending[switching],
+                x_start[switching],
+                x_new[switching],
+                remaining[switching],
+                parameters,
+            )
+
+    def _advance_adaptive(self, x, mode, t, h, parameters):
+        elapsed = np.zeros(x.shape[0])
+        switches = np.zeros(x.shape[0], dtype=int)
+        min_step = h * 1e-12
+        pending = np.flatnonzero(mode >= 0)
+        while pending.size > 0:
+            p = _rows(parameters, pending)
+            step = np.minimum(self._h[pending], h - elapsed[pending])
+            x_start = x[pending]
+            x_new, error = self._dopri(x_start, mode[pending], step, p)
+            scale = self.atol + self.rtol * np.maximum(np.abs(x_start), np.abs(x_new))
+            norm = np.sqrt(np.mean((error / scale) ** 2, axis=1))
+            norm = np.where(np.isfinite(norm), norm, np.inf)
+            accept = (norm <= 1.0) | (step <= min_step)
+            factor = np.clip(0.9 * norm**-0.2, 0.2, 5.0)
+            self._h[pending] = np.maximum(step * factor, min_step)
+
+            done = pending[accept]
+            x_new, x_start, step = x_new[accept], x_start[accept], step[accept]
+            switching = (
+                self.modes.active(x_new, **_rows(parameters, done)) != mode[done]
+            )
+            # too many switches within one output interval: carry on in the same mode
+            switching &= switches[done] < self.max_switches
+            stay = done[~switching]
+            x[stay] = x_new[~switching]
+            elapsed[stay] += step[~switching]
+            switched = done[switching]
+            switches[switched] += 1
+            self._switch(
+                x,
+                mode,
+                elapsed,
+                t,
+                switched,
+                x_start[switching],
+                x_new[switching],
+                step[switching],
+                parameters,
+            )
+            pending = pending[(elapsed[pending] < h - min_step) & (mode[pending] >= 0)]
+
+
+def simulate_modes(
+    results: List[EvalResult],
+    state: Sequence[str],
+    initial_states,
+    t_final: float,
+    dt: float,
+    method: str = "rk4",
+    **parameters,
+) -> Simulation:
+    """
+    simulate the modes of a function from a batch of initial states
+
+    :param results: the modes, e.g. from function_symbolic_execution
+    :param state: the state variable names, in the column order of the states
+    :param initial_states: an (N, d) array of initial states
+    :param t_final: the end time
+    :param dt: the output interval (and step of the fixed-step method)
+    :param method: "rk4" (fixed step) or "dopri5" (adaptive)
+    :param parameters: the remaining free variables, scalars or (N,) arrays
+    """
+    simulator = HybridSimulator(results, state, method=method)
+    return simulator.simulate(initial_states, t_final, dt, **parameters)
@@ -0,0 +1,147 @@
+"""Function Summaries for Repeated Calls"""
+
+import itertools
+from typing import Dict, List, NamedTuple, Tuple
+from seereach.lang import Function, FunctionCall, Name, Program
+from seereach.result import EvalResult
+from seereach.rewrite import substitute
+from seereach.symlang import SBoolean, SInteger, SReal, SVariable, SymLang
+from seereach.z3convert import Z3QueryCache, Z3Session
+
+
+class SummaryKey(NamedTuple):
+    """
+    what a summary depends on
+
+    :param function: the definition of the callee (compared by identity, so that functions
+        of the same name in different programs do not share summaries)
+    :param merge: whether paths are merged inside the callee
+    :param arguments: the concrete arguments, and placeholders for the symbolic ones
+    """
+
+    function: Function
+    merge: bool
+    arguments: Tuple[SymLang, ...]
+
+
+class FunctionSummaryCache:
+    """
+    Summaries of function calls, reused across call sites
+
+    A summary is the list of (return value, path condition) pairs of a function executed
+    once with placeholder variables for its symbolic parameters. Concrete parameters are
+    part of the key, as they steer the control flow of the callee. A call instantiates the
+    summary by substituting its argument values for the placeholders, refolding, and
+    dropping the paths that became infeasible under the caller's path.
+
+    Each combination of argument results is instantiated jointly, so a parameter that is
+    used twice keeps one value per caller path. The cache can be shared between runs.
+    """
+
+    def __init__(self):
+        self.summaries: Dict[SummaryKey, List[EvalResult]] = {}
+        # callee queries are over placeholders, so they can share one solver cache
+        self.queries = Z3QueryCache()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def placeholder(function: Function, parameter) -> SVariable:
+        return SVariable(
+            Name(f"{function.name}::{parameter.name}"), parameter.variable_type
+        )
+
+    @staticmethod
+    def _is_concrete(arguments: List[EvalResult]) -> bool:
+        return len(arguments) == 1 and isinstance(
+            arguments[0].expr_eval, (SReal, SInteger, SBoolean)
+        )
+
+    def key(
+        self, function: Function, arguments: List[List[EvalResult]], merge: bool
+    ) -> SummaryKey:
+        """the function definition and the canonical form of the argument results"""
+        canonical = tuple(
+            (
+                args[0].expr_eval
+                if self._is_concrete(args)
+                else self.placeholder(function, param)
+            )
+            for args, param in zip(arguments, function.parameters)
+        )
+        return SummaryKey(function, merge, canonical)
+
+    def summarize(self, caller, function: Function, key: SummaryKey, program: Program):
+        """execute the callee once on its canonical arguments"""
+        from seereach.context import Context
+
+        # a fresh session: the summary must not depend on the caller's path
+        session = Z3Session(cache=self.queries)
+        session.on_check = caller.session.on_check
+        function_context = Context(
+            function.body,
+            session=session,
+            merge_policy=caller.merge_policy,
+            summaries=self,
+        )
+        function_context.merge_states = key.merge
+        for param, value in zip(function.parameters, key.arguments):
+            function_context.symbol_table[param.name] = [EvalResult(value, None)]
+        results = function_context.execute(program)
+        return [
+            EvalResult(r.expr_eval, r.path_condition, False)
+            for r in reversed(results)
+            if r.is_return
+        ]
+
+    def call(
+        self,
+        caller,
+        call: FunctionCall,
+        arguments: List[List[EvalResult]],
+        program: Program,
+    ) -> List[EvalResult]:
+        """
+        results of a call, instantiated from the summary of the callee
+
+        :param caller: the calling context (provides the path condition and the session)
+        :param call: the function call being executed
+        :param arguments: the results of each argument expression
+        """
+        function = program.functions[call.function_name]
+        key = self.key(function, arguments, caller.merges(call))
+        summary = self.summaries.get(key)
+        if summary is None:
+            self.misses += 1
+            summary = self.summarize(caller, function, key, program)
+            self.summaries[key] = summary
+        else:
+            self.hits += 1
+
+        rets = []
+        for combination in itertools.product(*arguments):
+            mapping: Dict[SymLang, SymLang] = {}
+            path_condition = caller.path_condition
+            for param, value, result in zip(
+                function.parameters, key.arguments, combination
+            ):
+                if isinstance(value, SVariable):
+                    mapping[value] = result.expr_eval
+                path_condition = path_condition.join(result.path_condition)
+            memo = {}
+            for result in summary:
+                conditions = [
+                    substitute(c, mapping, memo) for c in result.path_condition
+                ]
+                if any(c is SBoolean(False) for c in conditions):
+                    continue
+                conditions = [c for c in conditions if c is not SBoolean(True)]
+                r = EvalResult(
+                    substitute(result.expr_eval, mapping, memo),
+                    path_condition.join(conditions),
+                    False,
+                )
+                if len(conditions) > 0 and not caller.session.is_feasible(r):
+                    continue
+                rets.append(r)
+        return rets
@@ -0,0 +1,213 @@
+"""Parameter Sweeps
+
+Tuning a controller means analyzing the same function for many concrete gains. A
+ParameterSweep executes the function once with the swept parameters symbolic and then
+instantiates the resulting modes for whole arrays of parameter values.
+
+Feasibility of a mode for each parameter row is decided in batch:
+
+* conjuncts over the parameters alone are evaluated on the parameter array directly
+* the other conjuncts also involve state variables; a solver model for one row gives a
+  witness state, and every remaining row whose conjuncts hold at that witness is feasible
+  too, so the solver is only asked again for the rows no witness covers yet
+
+Rows the solver cannot decide (unknown) keep the mode, so the feasible modes are never
+fewer than the reachable ones.
+"""
+
+from typing import Dict, List, Sequence
+import numpy as np
+import z3
+from seereach.fanalysis import function_signature, function_symbolic_execution
+from seereach.lang import Program, Type
+from seereach.numeric import evaluate_conjunction
+from seereach.result import EvalResult
+from seereach.rewrite import substitute
+from seereach.symlang import SBoolean, SInteger, SReal, SVariable, SymLang
+from seereach.z3convert import Z3Session, free_variables
+
+
+def constant(variable_type: Type, value) -> SymLang:
+    """the SymLang constant for a value of the given type"""
+    if variable_type == Type.INTEGER:
+        return SInteger(int(value))
+    elif variable_type == Type.BOOLEAN:
+        return SBoolean(bool(value))
+    return SReal(float(value))
+
+
+def z3_to_python(value):
+    """a number or bool from a z3 value (algebraic numbers are approximated)"""
+    if z3.is_true(value):
+        return True
+    if z3.is_false(value):
+        return False
+    if z3.is_int_value(value):
+        return value.as_long()
+    if z3.is_rational_value(value):
+        return float(value.as_fraction())
+    if z3.is_algebraic_value(value):
+        return float(value.approx(20).as_fraction())
+    raise ValueError(f"Not a value: {value}")
+
+
+class ParameterSweep:
+    """
+    Symbolic execution of a function once, instantiated for many parameter values
+
+    Witness states are checked in floating point, like a simulation would use them.
+
+    :param program: the program
+    :param funname: the function to analyze
+    :param parameters: the names of the swept parameters (kept symbolic)
+    :param signature_params: the arguments of the call, SVariables for every parameter by
+        default (the swept parameters are symbolic whatever is given for them)
+    :param merge: merge paths, as in function_symbolic_execution
+    """
+
+    def __init__(
+        self,
+        program: Program,
+        funname: str,
+        parameters: Sequence[str],
+        signature_params=None,
+        merge=False,
+    ):
+        function = program.functions[funname]
+        by_name = {p.name: p for p in function.parameters}
+        for name in parameters:
+            if name not in by_name:
+                raise ValueError(f"{funname} has no parameter {name}")
+        self.parameters = [
+            SVariable(by_name[name].name, by_name[name].variable_type)
+            for name in parameters
+        ]
+        signature = list(function_signature(program, funname, signature_params))
+        for i, param in enumerate(function.parameters):
+            if param.name in parameters:
+                signature[i] = SVariable(param.name, param.variable_type)
+        self.results: List[EvalResult] = function_symbolic_execution(
+            program, funname, signature, merge=merge
+        )
+        self.session = Z3Session()
+        self.solver_calls = 0
+        # rows whose mode was kept because the solver answered unknown
+        self.undecided = 0
+        # per mode: the conjuncts over the parameters only, and the others
+        names = set(parameters)
+        variables = {}
+        self._conjuncts = []
+        for result in self.results:
+            ground, mixed = [], []
+            for condition in result.path_condition:
+                if free_variables(condition, variables) <= names:
+                    ground.append(condition)
+                else:
+                    mixed.append(condition)
+            self._conjuncts.append((ground, mixed))
+        self._variables = variables
+
+    def _as_rows(self, values) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values.reshape(-1, len(self.parameters))
+        if values.shape[1] != len(self.parameters):
+            raise ValueError(
+                f"expected {len(self.parameters)} parameter columns, got {values.shape[1]}"
+            )
+        return values
+
+    def _env(self, values: np.ndarray) -> Dict[str, np.ndarray]:
+        return {p.name: values[:, i] for i, p in enumerate(self.parameters)}
+
+    def mapping(self, row) -> Dict[SymLang, SymLang]:
+        """swept parameter -> constant for one row of values"""
+        return {p: constant(p.variable_type, v) for p, v in zip(self.parameters, row)}
+
+    def feasible(self, values) -> np.ndarray:
+        """
+        which modes are feasible for each row of parameter values
+
+        :param values: an (N, P) array, one column per swept parameter in order
+        :return: an (N, M) boolean array, one column per mode of self.results
+        """
+        values = self._as_rows(values)
+        n = values.shape[0]
+        env = self._env(values)
+        feasible = np.zeros((n, len(self.results)), dtype=bool)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for m, (ground, mixed) in enumerate(self._conjuncts):
+                mask = evaluate_conjunction(ground, env, n)
+                if len(mixed) > 0:
+                    mask = self._decide(mixed, values, mask)
+                feasible[:, m] = mask
+        return feasible
+
+    def _decide(self, conditions, values: np.ndarray, candidates: np.ndarray):
+        """the candidate rows for which the state-dependent conditions are satisfiable"""
+        feasible = np.zeros(values.shape[0], dtype=bool)
+        pending = np.flatnonzero(candidates)
+        state = set().union(*(self._variables[c] for c in conditions))
+        state -= {p.name for p in self.parameters}
+        while pending.size > 0:
+            row = values[pending[0]]
+            memo = {}
+            instance = [substitute(c, self.mapping(row), memo) for c in conditions]
+            self.solver_calls += 1
+            result, model = z3.unsat, None
+            if not any(c is SBoolean(False) for c in instance):
+                result, model = self.session.model(
+                    [c for c in instance if c is not SBoolean(True)]
+                )
+            if result != z3.sat:
+                # every row with the same values gets the same answer
+                same = np.all(values[pending] == row, axis=1)
+                if result != z3.unsat:
+                    feasible[pending[same]] = True
+                    self.undecided += int(np.count_nonzero(same))
+                pending = pending[~same]
+                continue
+            witness = self._env(values[pending])
+            for name in state:
+                # a variable the instance no longer mentions can take any value
+                variable = self.session.converter.variables.get(name)
+                witness[name] = (
+                    0.0
+                    if variable is None
+                    else z3_to_python(model.eval(variable, model_completion=True))
+                )
+            holds = evaluate_conjunction(conditions, witness, pending.size)
+            # the solved row is feasible, whatever the rounding at its witness
+            holds[0] = True
+            feasible[pending[holds]] = True
+            pending = pending[~holds]
+        return feasible
+
+    def instantiate(self, values) -> List[List[EvalResult]]:
+        """
+        the feasible modes for each row of parameter values, with the parameters
+        substituted in their flows and guards
+
+        :param values: an (N, P) array, one column per swept parameter in order
+        """
+        values = self._as_rows(values)
+        feasible = self.feasible(values)
+        instances = []
+        for row, modes in zip(values, feasible):
+            mapping = self.mapping(row)
+            memo = {}
+            results = []
+            for m in np.flatnonzero(modes):
+                result = self.results[m]
+                conditions = [
+                    substitute(c, mapping, memo) for c in result.path_condition
+                ]
+                results.append(
+                    EvalResult(
+                        substitute(result.expr_eval, mapping, memo),
+                        [c for c in conditions if c is not SBoolean(True)],
+                        result.is_return,
+                    )
+                )
+            instances.append(results)
+        return instances
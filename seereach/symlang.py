@@ -3,15 +3,82 @@
 This is what the executor compiles *to* and the HL target language is what the executor compiles *from*.
 """
 
+import weakref
 from typing import List, Union
 from seereach.lang import Name, Operator, Expression
 
 
-class SymLang:
-    pass
+def _intern_key(arg):
+    """key for a constructor argument; children are already interned, so identity will do"""
+    if isinstance(arg, SymLang):
+        return arg
+    elif isinstance(arg, (list, tuple)):
+        return tuple(_intern_key(a) for a in arg)
+    elif isinstance(arg, str):
+        # Name and str spell the same variable
+        return (str, arg)
+    # keep the type so that SReal(1.0), SInteger(1) and SBoolean(True) stay apart
+    return (type(arg), arg)
+
+
+class InternFactory(type):
+    """
+    Metaclass that hash-conses SymLang nodes
+
+    Constructing a node with the same class and the same (interned) children returns the
+    existing node, so every distinct expression exists once in memory as a shared DAG.
+    Structural equality is then identity, and nodes can be used directly as cache keys.
+    Keys are specific to each class, so a one-field node is keyed on its field alone.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls._table = weakref.WeakValueDictionary()
+
+    def __call__(cls, *args, **kwargs):
+        if kwargs:
+            args = args + tuple(kwargs[f] for f in cls._fields[len(args) :])
+        try:
+            if len(args) == 1:
+                # a one-field node does not need a tuple around its key
+                key = _intern_key(args[0])
+            else:
+                key = tuple(_intern_key(a) for a in args)
+            node = cls._table.get(key)
+        except TypeError:
+            # unhashable argument, so the node cannot be shared
+            return super().__call__(*args)
+        if node is None:
+            node = super().__call__(*args)
+            cls._table[key] = node
+        return node
+
+    def interned_count(cls) -> int:
+        """number of live interned nodes of this class"""
+        return len(cls._table)
+
+
+class SymLang(metaclass=InternFactory):
+    """
+    Symbolic expression node
+
+    Nodes are hash-consed by InternFactory: equality and hashing are by identity, which
+    coincides with structural equality. Nodes must not be mutated after construction.
+    """
+
+    _fields = ()
+    # the intern tables hold their nodes weakly
+    __slots__ = ("__weakref__",)
+
+    def __reduce__(self):
+        # rebuild through the factory so that unpickled nodes are interned too
+        return (type(self), tuple(getattr(self, f) for f in self._fields))
 
 
 class SReal(SymLang):
+    _fields = ("value",)
+    __slots__ = _fields
+
     def __init__(self, value: float):
         self.value = value
 
@@ -20,6 +87,9 @@ class SReal(SymLang):
 
 
 class SInteger(SymLang):
+    _fields = ("value",)
+    __slots__ = _fields
+
     def __init__(self, value: int):
         self.value = value
 
@@ -28,6 +98,9 @@ class SInteger(SymLang):
 
 
 class SBoolean(SymLang):
+    _fields = ("value",)
+    __slots__ = _fields
+
     def __init__(self, value: bool):
         self.value = value
 
@@ -36,6 +109,9 @@ class SBoolean(SymLang):
 
 
 class SVariable(SymLang):
+    _fields = ("name", "variable_type")
+    __slots__ = _fields + ("value",)
+
     def __init__(self, name: Name, variable_type):
         self.name = name
         self.value = self
@@ -46,14 +122,21 @@ class SVariable(SymLang):
 
 
 class STuple(SymLang):
+    _fields = ("elements",)
+    __slots__ = _fields
+
     def __init__(self, elements: List[SymLang]):
-        self.elements = elements
+        # a tuple, so the interned node cannot change through the caller's list
+        self.elements = tuple(elements)
 
     def __repr__(self) -> str:
-        return f"STuple({self.elements})"
+        return f"STuple({list(self.elements)})"
 
 
 class SBinaryOp(SymLang):
+    _fields = ("left", "operator", "right")
+    __slots__ = _fields
+
     def __init__(self, left: SymLang, operator: Operator, right: SymLang):
         self.left = left
         self.operator = operator
@@ -79,6 +162,9 @@ class SBinaryOp(SymLang):
 
 
 class SUnaryOp(SymLang):
+    _fields = ("operator", "expression")
+    __slots__ = _fields
+
     def __init__(self, operator: Operator, expression: SymLang):
         self.operator = operator
         self.expression = expression
@@ -87,7 +173,25 @@ class SUnaryOp(SymLang):
         return f"SUnaryOp({self.operator}, {self.expression})"
 
 
+class SIte(SymLang):
+    """if-then-else, produced when paths are merged at a join point"""
+
+    _fields = ("condition", "true_value", "false_value")
+    __slots__ = _fields
+
+    def __init__(self, condition: SymLang, true_value: SymLang, false_value: SymLang):
+        self.condition = condition
+        self.true_value = true_value
+        self.false_value = false_value
+
+    def __repr__(self) -> str:
+        return f"SIte({self.condition}, {self.true_value}, {self.false_value})"
+
+
 class SymbolicBool(SymLang):
+    _fields = ("expression",)
+    __slots__ = _fields
+
     def __init__(self, expression: Expression):
         self.expression = expression
 
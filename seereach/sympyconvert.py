@@ -1,4 +1,6 @@
 """SymPy interface for SeeReach"""
+
+from typing import Dict, List
 from seereach.lang import Type, Value
 from seereach.symlang import (
     STuple,
@@ -8,6 +10,7 @@ from seereach.symlang import (
     SBoolean,
     SBinaryOp,
     SUnaryOp,
+    SIte,
     Operator,
     Name,
     SymLang,
@@ -16,12 +19,6 @@ from sympy import (
     symbols,
     simplify,
     sin,
-    cos,
-    tan,
-    sqrt,
-    pi,
-    E,
-    log,
     Eq,
     Lt,
     Le,
@@ -34,133 +31,202 @@ from sympy import (
 from sympy.core.symbol import Symbol
 import sympy
 
+# associative operators, converted n-ary in both directions
+_NARY = {
+    Operator.ADD: sympy.Add,
+    Operator.MUL: sympy.Mul,
+    Operator.AND: And,
+    Operator.OR: Or,
+}
+
+_BINARY = {
+    Operator.SUB: lambda x, y: x - y,
+    Operator.DIV: lambda x, y: x / y,
+    Operator.POW: lambda x, y: x**y,
+    Operator.EQUAL: lambda x, y: Eq(x, y),
+    Operator.LESS: lambda x, y: Lt(x, y),
+    Operator.LESS_EQUAL: lambda x, y: Le(x, y),
+    Operator.GREATER: lambda x, y: Gt(x, y),
+    Operator.GREATER_EQUAL: lambda x, y: Ge(x, y),
+}
+
+_UNARY = {
+    Operator.NOT: lambda x: Not(x),
+    Operator.SIN: lambda x: sin(x),
+}
+
+_RELATIONS = [
+    (Eq, Operator.EQUAL),
+    (Lt, Operator.LESS),
+    (Le, Operator.LESS_EQUAL),
+    (Gt, Operator.GREATER),
+    (Ge, Operator.GREATER_EQUAL),
+]
+
 
 class SymPyConverter:
+    """
+    Converts between SymLang and SymPy
+
+    Both directions are memoized by node, so shared subterms are converted once and a
+    converter can be reused across the results of a function. Variables are interned in a
+    symbol table: every SVariable maps to one sympy Symbol and back to the same SVariable.
+    Sums, products, conjunctions and disjunctions are converted as n-ary sympy nodes, and
+    back into balanced SymLang trees.
+    """
+
+    def __init__(self):
+        # name -> symbol, and symbol -> variable
+        self.symbols: Dict[str, Symbol] = {}
+        self.variables: Dict[Symbol, SVariable] = {}
+        self._to_memo: Dict[SymLang, sympy.Basic] = {}
+        self._from_memo: Dict[sympy.Basic, SymLang] = {}
+
+    def symbol(self, variable: SVariable) -> Symbol:
+        """the symbol of a variable"""
+        name = str(variable.name)
+        symbol = self.symbols.get(name)
+        if symbol is None:
+            symbol = symbols(name)
+            self.symbols[name] = symbol
+            self.variables[symbol] = variable
+        return symbol
+
+    def _balanced(self, operator: Operator, args) -> SymLang:
+        """a balanced tree of a binary operator over the converted arguments"""
+        nodes = [self.from_sympy(a) for a in args]
+        while len(nodes) > 1:
+            pairs = [
+                SBinaryOp(nodes[i], operator, nodes[i + 1])
+                for i in range(0, len(nodes) - 1, 2)
+            ]
+            if len(nodes) % 2 == 1:
+                pairs.append(nodes[-1])
+            nodes = pairs
+        return nodes[0]
+
     def from_sympy(self, expr: sympy.Expr) -> SymLang:
         """
         Convert a sympy expression to a SymLang expression.
         """
+        result = self._from_memo.get(expr)
+        if result is not None:
+            return result
         if isinstance(expr, Symbol):
-            return SVariable(
-                Name(str(expr)), Type.REAL if expr.is_real else Type.INTEGER
-            )
+            result = self.variables.get(expr)
+            if result is None:
+                result = SVariable(
+                    Name(str(expr)), Type.REAL if expr.is_real else Type.INTEGER
+                )
         elif isinstance(expr, sympy.core.numbers.Integer):
-            return SInteger(int(expr))
-        elif isinstance(expr, sympy.core.numbers.Float):
-            return SReal(float(expr))
+            result = SInteger(int(expr))
+        elif isinstance(expr, (sympy.core.numbers.Float, sympy.core.numbers.Rational)):
+            result = SReal(float(expr))
         elif isinstance(expr, sympy.logic.boolalg.BooleanTrue):
-            return SBoolean(True)
+            result = SBoolean(True)
         elif isinstance(expr, sympy.logic.boolalg.BooleanFalse):
-            return SBoolean(False)
+            result = SBoolean(False)
         elif isinstance(expr, sympy.Add):
-            return SBinaryOp(
-                self.from_sympy(expr.args[0]),
-                Operator.ADD,
-                self.from_sympy(expr.args[1]),
-            )
+            result = self._balanced(Operator.ADD, expr.args)
         elif isinstance(expr, sympy.Mul):
-            return SBinaryOp(
-                self.from_sympy(expr.args[0]),
-                Operator.MUL,
-                self.from_sympy(expr.args[1]),
-            )
-        elif isinstance(expr, sympy.Pow):
-            return SBinaryOp(
-                self.from_sympy(expr.args[0]),
-                Operator.POW,
-                self.from_sympy(expr.args[1]),
-            )
-        elif isinstance(expr, Eq):
-            return SBinaryOp(
-                self.from_sympy(expr.args[0]),
-                Operator.EQUAL,
-                self.from_sympy(expr.args[1]),
-            )
-        elif isinstance(expr, Lt):
-            return SBinaryOp(
-                self.from_sympy(expr.args[0]),
-                Operator.LESS,
-                self.from_sympy(expr.args[1]),
-            )
-        elif isinstance(expr, Le):
-            return SBinaryOp(
-                self.from_sympy(expr.args[0]),
-                Operator.LESS_EQUAL,
-                self.from_sympy(expr.args[1]),
-            )
-        elif isinstance(expr, Gt):
-            return SBinaryOp(
-                self.from_sympy(expr.args[0]),
-                Operator.GREATER,
-                self.from_sympy(expr.args[1]),
-            )
-        elif isinstance(expr, Ge):
-            return SBinaryOp(
-                self.from_sympy(expr.args[0]),
-                Operator.GREATER_EQUAL,
-                self.from_sympy(expr.args[1]),
-            )
+            result = self._balanced(Operator.MUL, expr.args)
         elif isinstance(expr, And):
-            return SBinaryOp(
-                self.from_sympy(expr.args[0]),
-                Operator.AND,
-                self.from_sympy(expr.args[1]),
-            )
+            result = self._balanced(Operator.AND, expr.args)
         elif isinstance(expr, Or):
-            return SBinaryOp(
+            result = self._balanced(Operator.OR, expr.args)
+        elif isinstance(expr, sympy.Pow):
+            result = SBinaryOp(
                 self.from_sympy(expr.args[0]),
-                Operator.OR,
+                Operator.POW,
                 self.from_sympy(expr.args[1]),
             )
+        elif isinstance(expr, sympy.core.relational.Relational):
+            for relation, operator in _RELATIONS:
+                if isinstance(expr, relation):
+                    result = SBinaryOp(
+                        self.from_sympy(expr.args[0]),
+                        operator,
+                        self.from_sympy(expr.args[1]),
+                    )
+                    break
+            else:
+                raise ValueError(f"Cannot convert {type(expr)} from sympy")
         elif isinstance(expr, Not):
-            return SUnaryOp(Operator.NOT, self.from_sympy(expr.args[0]))
+            result = SUnaryOp(Operator.NOT, self.from_sympy(expr.args[0]))
         elif isinstance(expr, sin):
-            return SUnaryOp(Operator.SIN, self.from_sympy(expr.args[0]))
+            result = SUnaryOp(Operator.SIN, self.from_sympy(expr.args[0]))
+        elif isinstance(expr, sympy.Piecewise):
+            # the last piece is the fallback, the others nest in front of it
+            *pieces, (value, _) = expr.args
+            result = self.from_sympy(value)
+            for value, condition in reversed(pieces):
+                result = SIte(
+                    self.from_sympy(condition), self.from_sympy(value), result
+                )
         else:
             raise ValueError(f"Cannot convert {type(expr)} from sympy")
+        # numbers are cheap, and older sympy has Float(1.0) == Integer(1)
+        if not expr.is_Number:
+            self._from_memo[expr] = result
+        return result
+
+    def _operands(self, expr: SBinaryOp) -> List[SymLang]:
+        """the operands of a chain of one associative operator, left to right"""
+        operands = []
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            # converted chains are not walked again
+            if (
+                isinstance(node, SBinaryOp)
+                and node.operator == expr.operator
+                and (node is expr or node not in self._to_memo)
+            ):
+                stack += [node.right, node.left]
+            else:
+                operands.append(node)
+        return operands
 
     def to_sympy(self, expr: SymLang):
         """
         Convert a SymLang expression to a sympy expression.
         """
+        result = self._to_memo.get(expr)
+        if result is not None:
+            return result
         if isinstance(expr, SVariable):
-            return symbols(str(expr.name))
+            result = self.symbol(expr)
         elif isinstance(expr, Value):
             return expr.value
         elif isinstance(expr, SInteger):
-            return sympy.core.numbers.Integer(expr.value)
+            result = sympy.core.numbers.Integer(expr.value)
         elif isinstance(expr, SReal):
-            return sympy.core.numbers.Float(expr.value)
+            result = sympy.core.numbers.Float(expr.value)
         elif isinstance(expr, SBoolean):
-            return (
+            result = (
                 sympy.logic.boolalg.BooleanTrue()
                 if expr.value
                 else sympy.logic.boolalg.BooleanFalse()
             )
+        elif isinstance(expr, SBinaryOp) and expr.operator in _NARY:
+            result = _NARY[expr.operator](
+                *(self.to_sympy(e) for e in self._operands(expr))
+            )
         elif isinstance(expr, SBinaryOp):
-            operator_func = {
-                Operator.ADD: lambda x, y: x + y,
-                Operator.SUB: lambda x, y: x - y,
-                Operator.MUL: lambda x, y: x * y,
-                Operator.DIV: lambda x, y: x / y,
-                Operator.POW: lambda x, y: x**y,
-                Operator.EQUAL: lambda x, y: Eq(x, y),
-                Operator.LESS: lambda x, y: Lt(x, y),
-                Operator.LESS_EQUAL: lambda x, y: Le(x, y),
-                Operator.GREATER: lambda x, y: Gt(x, y),
-                Operator.GREATER_EQUAL: lambda x, y: Ge(x, y),
-                Operator.AND: lambda x, y: And(x, y),
-                Operator.OR: lambda x, y: Or(x, y),
-            }[expr.operator]
-            return operator_func(self.to_sympy(expr.left), self.to_sympy(expr.right))
+            operator_func = _BINARY[expr.operator]
+            result = operator_func(self.to_sympy(expr.left), self.to_sympy(expr.right))
         elif isinstance(expr, SUnaryOp):
-            operator_func = {
-                Operator.NOT: lambda x: Not(x),
-                Operator.SIN: lambda x: sin(x),
-            }[expr.operator]
-            return operator_func(self.to_sympy(expr.expression))
+            operator_func = _UNARY[expr.operator]
+            result = operator_func(self.to_sympy(expr.expression))
+        elif isinstance(expr, SIte):
+            result = sympy.Piecewise(
+                (self.to_sympy(expr.true_value), self.to_sympy(expr.condition)),
+                (self.to_sympy(expr.false_value), True),
+            )
         else:
             raise ValueError(f"Cannot convert {type(expr)} to sympy")
+        self._to_memo[expr] = result
+        return result
 
     def simplify(self, expr: SymLang):
         """applies simplification to a SymLang expression"""
@@ -0,0 +1,313 @@
+"""Concrete Test Inputs from Path Conditions
+
+Generates test vectors for the modes of a function: for every mode, inputs that satisfy its
+path condition, so that each vector exercises the path the mode was extracted from.
+
+Inputs come from Z3 models. After each model a blocking clause excludes a box around it
+(relative to the magnitude of each value), so the next model lies elsewhere; when the
+boxes leave no room, they shrink, down to excluding just the models found. Modes are
+solved in parallel on a pool of worker processes.
+
+The vectors can be replayed through the concrete vectorized interpreter to confirm that
+each one satisfies its mode's guard and that the program returns the mode's value.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence
+import numpy as np
+import z3
+from seereach.fanalysis import function_signature, function_symbolic_execution
+from seereach.lang import Literal, Program, Type
+from seereach.numeric import evaluate, evaluate_conjunction
+from seereach.result import EvalResult
+from seereach.symlang import SVariable, SymLang
+from seereach.sweep import z3_to_python
+from seereach.vectorized import VectorizedProgram
+from seereach.z3convert import Z3SatConverter
+
+
+def _block(variables, model, spread: float):
+    """
+    a clause that excludes a box around a model
+
+    :param model: the values as floats and as z3 values; boxes are placed around the floats,
+        which keeps the bounds in later models short, and a spread of 0 excludes exactly the
+        z3 values
+    """
+    values, exact = model
+    outside = []
+    for variable, value, exact_value in zip(variables, values, exact):
+        if z3.is_bool(variable) or spread == 0.0:
+            outside.append(variable != exact_value)
+            continue
+        width = spread * max(1.0, abs(value))
+        if z3.is_int(variable):
+            width = int(width)
+        outside.append(variable < value - width)
+        outside.append(variable > value + width)
+    return z3.Or(*outside)
+
+
+def generate_inputs(
+    conditions: Sequence[SymLang],
+    variables: Sequence[SVariable],
+    count: int,
+    spread: float = 0.1,
+    seed: int = 0,
+    timeout: int = None,
+) -> np.ndarray:
+    """
+    diverse inputs that satisfy a conjunction of conditions
+
+    :param conditions: the conjuncts, e.g. a path condition
+    :param variables: the input variables, one column each
+    :param count: the number of inputs wanted (fewer if the conditions have fewer models)
+    :param spread: the initial half-width of the excluded boxes, relative to the magnitude
+        of each value
+    :param seed: the random seed of the solver
+    :param timeout: solver timeout per model in milliseconds
+    :return: a (k, len(variables)) array of inputs that satisfy the conditions in floating
+        point too (models on a boundary may not once rounded)
+    """
+    converter = Z3SatConverter()
+    for variable in variables:
+        converter.collect_variables(variable)
+    solver = z3.Solver()
+    solver.set("random_seed", seed)
+    if timeout is not None:
+        solver.set("timeout", timeout)
+    for condition in conditions:
+        converter.collect_variables(condition)
+        solver.add(converter.convert(condition))
+    z3_variables = [converter.variables[v.name] for v in variables]
+
+    models = []
+    rows = []
+    halvings = 0
+    solver.push()
+    # models that do not hold once rounded to floats are excluded, up to count of them
+    while len(rows) < count and len(models) - len(rows) <= count:
+        if solver.check() != z3.sat:
+            if spread == 0.0:
+                break
+            # the excluded boxes cover what is left: shrink them
+            halvings += 1
+            spread = spread / 2 if halvings < 8 else 0.0
+            solver.pop()
+            solver.push()
+            for model in models:
+                solver.add(_block(z3_variables, model, spread))
+            continue
+        model = solver.model()
+        exact = [model.eval(v, model_completion=True) for v in z3_variables]
+        values = [float(z3_to_python(v)) for v in exact]
+        models.append((values, exact))
+        solver.add(_block(z3_variables, models[-1], spread))
+        env = {v.name: value for v, value in zip(variables, values)}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if evaluate_conjunction(conditions, env, 1)[0]:
+                rows.append(values)
+    return np.array(rows, dtype=float).reshape(len(rows), len(variables))
+
+
+class TestVectors:
+    """
+    Test inputs, one row per vector
+
+    :param names: the function parameters, one column each
+    :param inputs: (n, P) the argument values
+    :param modes: (n,) the mode each vector was generated for
+    """
+
+    def __init__(self, names: List[str], inputs: np.ndarray, modes: np.ndarray):
+        self.names = list(names)
+        self.inputs = inputs
+        self.modes = modes
+
+    def __len__(self):
+        return len(self.modes)
+
+    def save(self, path: str):
+        """write as .npz (compressed) or .csv (a mode column, then the arguments)"""
+        if str(path).endswith(".csv"):
+            np.savetxt(
+                path,
+                np.column_stack([self.modes, self.inputs]),
+                delimiter=",",
+                header=",".join(["mode"] + self.names),
+                comments="",
+                fmt="%.17g",
+            )
+        else:
+            np.savez_compressed(
+                path, names=np.array(self.names), inputs=self.inputs, modes=self.modes
+            )
+
+    @staticmethod
+    def load(path: str) -> "TestVectors":
+        if str(path).endswith(".csv"):
+            with open(path) as fp:
+                names = fp.readline().strip().split(",")[1:]
+            table = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+            return TestVectors(names, table[:, 1:], table[:, 0].astype(int))
+        with np.load(path) as data:
+            return TestVectors(
+                [str(n) for n in data["names"]], data["inputs"], data["modes"]
+            )
+
+    def __repr__(self):
+        return f"TestVectors({len(self)} vectors, {self.names})"
+
+
+def _typed(column: np.ndarray, variable_type: Type) -> np.ndarray:
+    if variable_type == Type.INTEGER:
+        return column.astype(int)
+    elif variable_type == Type.BOOLEAN:
+        return column.astype(bool)
+    return column
+
+
+def _matches(value, expected, n: int) -> np.ndarray:
+    """rows where two values agree, elementwise for tuples"""
+    if isinstance(value, tuple) or isinstance(expected, tuple):
+        if not (isinstance(value, tuple) and isinstance(expected, tuple)):
+            return np.zeros(n, dtype=bool)
+        matches = np.ones(n, dtype=bool)
+        for v, e in zip(value, expected):
+            matches &= _matches(v, e, n)
+        return matches
+    return np.broadcast_to(
+        np.isclose(
+            np.asarray(value, dtype=float),
+            np.asarray(expected, dtype=float),
+            rtol=1e-9,
+            atol=1e-12,
+            equal_nan=True,
+        ),
+        (n,),
+    )
+
+
+class TestGenerator:
+    """
+    Test vectors for the modes of a function
+
+    :param program: the program
+    :param funname: the function under test
+    :param results: its modes (by default from function_symbolic_execution)
+    :param signature_params: the arguments of the call, as in function_symbolic_execution;
+        literal arguments are fixed in every vector
+    :param per_mode: the number of vectors wanted per mode
+    :param spread: the initial half-width of the boxes around models that later models
+        avoid, relative to the magnitude of each value
+    :param seed: the random seed of the solver (plus the mode index)
+    :param timeout: solver timeout per model in milliseconds
+    """
+
+    def __init__(
+        self,
+        program: Program,
+        funname: str,
+        results: List[EvalResult] = None,
+        signature_params=None,
+        per_mode: int = 10,
+        spread: float = 0.1,
+        seed: int = 0,
+        timeout: int = None,
+    ):
+        self.program = program
+        self.funname = funname
+        self.signature = function_signature(program, funname, signature_params)
+        if results is None:
+            results = function_symbolic_execution(program, funname, self.signature)
+        self.results = results
+        self.per_mode = per_mode
+        self.spread = spread
+        self.seed = seed
+        self.timeout = timeout
+        function = program.functions[funname]
+        self.names = [str(param.name) for param in function.parameters]
+        self.types = [param.variable_type for param in function.parameters]
+        self.variables: List[SVariable] = []
+        for argument in self.signature:
+            if isinstance(argument, SVariable):
+                self.variables.append(argument)
+            elif not isinstance(argument, Literal):
+                raise ValueError(
+                    f"test inputs need variables or constants as arguments: {argument}"
+                )
+
+    def _task(self, m: int) -> tuple:
+        conditions = [c for c in self.results[m].path_condition]
+        return (
+            conditions,
+            self.variables,
+            self.per_mode,
+            self.spread,
+            self.seed + m,
+            self.timeout,
+        )
+
+    def generate(self, max_workers: int = None) -> TestVectors:
+        """
+        generate the vectors of every mode
+
+        :param max_workers: number of worker processes (the number of CPUs by default, 1
+            to solve in this process)
+        """
+        tasks = [self._task(m) for m in range(len(self.results))]
+        if max_workers is None:
+            max_workers = min(len(tasks), os.cpu_count() or 1)
+        if max_workers <= 1:
+            solved = [generate_inputs(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers) as pool:
+                solved = list(pool.map(generate_inputs, *zip(*tasks)))
+
+        n = sum(len(rows) for rows in solved)
+        inputs = np.empty((n, len(self.signature)))
+        modes = np.concatenate(
+            [np.full(len(rows), m) for m, rows in enumerate(solved)] + [np.empty(0)]
+        ).astype(int)
+        columns = {v.name: j for j, v in enumerate(self.variables)}
+        solved = np.concatenate(solved + [np.empty((0, len(self.variables)))], axis=0)
+        for i, argument in enumerate(self.signature):
+            if isinstance(argument, SVariable):
+                inputs[:, i] = solved[:, columns[argument.name]]
+            else:
+                inputs[:, i] = float(argument.value.value)
+        return TestVectors(self.names, inputs, modes)
+
+    def replay(self, vectors: TestVectors) -> np.ndarray:
+        """
+        run the vectors through the concrete interpreter
+
+        :return: (n,) which vectors satisfy the guard of their mode and make the program
+            return the value of their mode
+        """
+        columns = [_typed(vectors.inputs[:, i], t) for i, t in enumerate(self.types)]
+        n = len(vectors)
+        output = VectorizedProgram(self.program).run(self.funname, *columns)
+        env = {}
+        for argument, column in zip(self.signature, columns):
+            if isinstance(argument, SVariable):
+                env[argument.name] = column
+        landed = np.zeros(n, dtype=bool)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for m, result in enumerate(self.results):
+                rows = np.flatnonzero(vectors.modes == m)
+                if rows.size == 0:
+                    continue
+                env_rows = {name: column[rows] for name, column in env.items()}
+                memo = {}
+                guard = evaluate_conjunction(
+                    result.path_condition, env_rows, rows.size, memo
+                )
+                expected = evaluate(result.expr_eval, env_rows, memo)
+                if isinstance(output, tuple):
+                    value = tuple(o[rows] for o in output)
+                else:
+                    value = output[rows]
+                landed[rows] = guard & _matches(value, expected, rows.size)
+        return landed
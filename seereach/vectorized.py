@@ -0,0 +1,225 @@
+"""Vectorized Concrete Interpretation of HL Programs
+
+Runs a program on concrete inputs given as NumPy arrays, one row per input, evaluating the
+whole batch at once. Like seereach.compile, the program is lowered once into a tree of
+closures. Each closure maps the variables in scope (name -> array) to a value and a mask of
+the rows for which that value is returned. A conditional evaluates both branches on the
+whole batch and selects per row, and operators use the ufuncs of seereach.numeric.
+
+The semantics follow the symbolic executor: a block evaluates to its last expression, and a
+call evaluates to what the body returns. Rows for which the function returns nothing are
+NaN.
+"""
+
+from typing import Callable, Dict, Tuple
+import numpy as np
+from seereach.lang import (
+    Assignment,
+    BinaryOp,
+    Block,
+    Conditional,
+    Expression,
+    FunctionCall,
+    Literal,
+    Name,
+    Program,
+    Return,
+    TupleExpression,
+    Type,
+    UnaryOp,
+    Value,
+    Variable,
+)
+from seereach.numeric import BINARY_UFUNCS, UNARY_UFUNCS
+
+# scope -> (value, returned)
+Handler = Callable[[Dict[str, object]], Tuple[object, object]]
+
+
+def _literal(value: Value):
+    if value.type == Type.REAL:
+        return float(value.value)
+    elif value.type == Type.INTEGER:
+        return int(value.value)
+    elif value.type == Type.BOOLEAN:
+        return bool(value.value)
+    elif value.type == Type.TUPLE:
+        return tuple(_literal(e) for e in value.value)
+    raise ValueError(f"Invalid literal type: {value.type}")
+
+
+def _select(condition, true_value, false_value):
+    """masked select, elementwise for tuples"""
+    if isinstance(true_value, tuple) or isinstance(false_value, tuple):
+        # a missing value (None) stands for a tuple of missing values
+        if true_value is None:
+            true_value = (None,) * len(false_value)
+        if false_value is None:
+            false_value = (None,) * len(true_value)
+        return tuple(_select(condition, t, f) for t, f in zip(true_value, false_value))
+    if true_value is None:
+        true_value = np.nan
+    if false_value is None:
+        false_value = np.nan
+    return np.where(condition, true_value, false_value)
+
+
+def _returned(value, returned, shape):
+    """the returned value broadcast to the batch, NaN where nothing is returned"""
+    if isinstance(value, tuple):
+        return tuple(_returned(v, returned, shape) for v in value)
+    if value is None:
+        return np.full(shape, np.nan)
+    value = np.broadcast_to(value, shape)
+    if np.all(returned):
+        return value
+    return np.where(returned, value, np.nan)
+
+
+class VectorizedProgram:
+    """
+    A program compiled for batched concrete evaluation
+
+    :param program: the program to compile
+    """
+
+    def __init__(self, program: Program):
+        self.program = program
+        # filled in place: call handlers look the callee up here when they run
+        self.bodies: Dict[Name, Handler] = {}
+        for name, function in program.functions.items():
+            self.bodies[name] = self.compile(function.body)
+
+    def run(self, funname: str, *args, **kwargs):
+        """
+        evaluate a function on a batch of inputs
+
+        :param args: an array (or scalar) per parameter, in order
+        :param kwargs: arrays by parameter name
+        :return: an array per row of the broadcast inputs, or a tuple of arrays for a
+            function returning a tuple
+        """
+        function = self.program.functions[funname]
+        names = [param.name for param in function.parameters]
+        if len(args) > len(names):
+            raise ValueError(f"{funname} takes {len(names)} arguments")
+        inputs = dict(zip(names, args))
+        inputs.update(kwargs)
+        missing = [name for name in names if name not in inputs]
+        if missing:
+            raise ValueError(f"Missing arguments for {funname}: {missing}")
+        scope = {name: np.asarray(inputs[name]) for name in names}
+        shape = np.broadcast_shapes(*(v.shape for v in scope.values()))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            value, returned = self.bodies[funname](scope)
+            return _returned(value, returned, shape)
+
+    __call__ = run
+
+    def compile(self, expression: Expression, statement: bool = False) -> Handler:
+        """
+        lower an expression to a closure
+
+        :param statement: whether the expression runs directly in its scope, so that an
+            assignment binds in it
+        """
+        if isinstance(expression, Literal):
+            value = _literal(expression.value)
+            return lambda scope: (value, False)
+        elif isinstance(expression, Variable):
+            name = expression.name
+            return lambda scope: (scope[name], False)
+        elif isinstance(expression, Assignment):
+            return self._compile_assignment(expression, statement)
+        elif isinstance(expression, Block):
+            return self._compile_block(expression)
+        elif isinstance(expression, Conditional):
+            return self._compile_conditional(expression)
+        elif isinstance(expression, FunctionCall):
+            return self._compile_function_call(expression)
+        elif isinstance(expression, BinaryOp):
+            return self._compile_binary_op(expression)
+        elif isinstance(expression, UnaryOp):
+            ufunc = UNARY_UFUNCS[expression.operator]
+            operand = self.compile(expression.expression)
+            return lambda scope: (ufunc(operand(scope)[0]), False)
+        elif isinstance(expression, Return):
+            value = self.compile(expression.expression)
+            return lambda scope: (value(scope)[0], True)
+        elif isinstance(expression, TupleExpression):
+            elements = [self.compile(e) for e in expression.elements]
+            return lambda scope: (tuple(e(scope)[0] for e in elements), False)
+        raise ValueError(f"Invalid expression: {expression}")
+
+    def _compile_assignment(self, expression: Assignment, statement: bool) -> Handler:
+        value = self.compile(expression.expression)
+        name = expression.variable.name
+        if not statement:
+            return value
+
+        def run(scope):
+            result = value(scope)
+            scope[name] = result[0]
+            return result
+
+        return run
+
+    def _compile_block(self, expression: Block) -> Handler:
+        statements = [self.compile(e, statement=True) for e in expression.expressions]
+
+        def run(scope):
+            # a block is a scope: its assignments do not leak out
+            block_scope = dict(scope)
+            result = (None, False)
+            for statement in statements:
+                result = statement(block_scope)
+            return result
+
+        return run
+
+    def _compile_conditional(self, expression: Conditional) -> Handler:
+        condition = self.compile(expression.condition)
+        true_branch = self.compile(expression.true_branch)
+        false_branch = self.compile(expression.false_branch)
+
+        def run(scope):
+            mask = condition(scope)[0]
+            true_value, true_returned = true_branch(scope)
+            false_value, false_returned = false_branch(scope)
+            return (
+                _select(mask, true_value, false_value),
+                np.where(mask, true_returned, false_returned),
+            )
+
+        return run
+
+    def _compile_function_call(self, expression: FunctionCall) -> Handler:
+        arguments = [self.compile(a) for a in expression.arguments]
+        function_name = expression.function_name
+        program = self.program
+        bodies = self.bodies
+
+        def run(scope):
+            function = program.functions[function_name]
+            callee_scope = {
+                param.name: argument(scope)[0]
+                for param, argument in zip(function.parameters, arguments)
+            }
+            value, returned = bodies[function_name](callee_scope)
+            if np.all(returned):
+                return value, False
+            # rows where the callee returns nothing have no value
+            return _select(returned, value, None), False
+
+        return run
+
+    def _compile_binary_op(self, expression: BinaryOp) -> Handler:
+        left = self.compile(expression.left)
+        right = self.compile(expression.right)
+        ufunc = BINARY_UFUNCS[expression.operator]
+        return lambda scope: (ufunc(left(scope)[0], right(scope)[0]), False)
+
+
+def vectorize_program(program: Program) -> VectorizedProgram:
+    """compile a program for batched concrete evaluation"""
+    return VectorizedProgram(program)
@@ -1,5 +1,10 @@
 """Infrastructure to use Z3 in the symbolic execution engine"""
-from typing import Any, Dict, List
+
+import itertools
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+from seereach.icp import ICPChecker, _children
 from seereach.lang import Name, Operator, Type
 from seereach.result import EvalResult
 from seereach.symlang import (
@@ -10,15 +15,405 @@ from seereach.symlang import (
     SBoolean,
     SReal,
     SInteger,
+    SIte,
     STuple,
 )
 from z3 import *
 
 
-class Z3SatConverter:
+def free_variables(
+    expr: SymLang, memo: Dict[SymLang, FrozenSet[Name]]
+) -> FrozenSet[Name]:
+    """
+    the names of the variables an expression depends on
+
+    :param memo: node -> variables, nodes are interned so shared subterms are visited once
+    """
+    variables = memo.get(expr)
+    if variables is not None:
+        return variables
+    # post-order with an explicit stack, as in convert
+    stack = [(expr, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node in memo:
+            continue
+        if not expanded:
+            stack.append((node, True))
+            stack += [(child, False) for child in _children(node) if child not in memo]
+        elif isinstance(node, SVariable):
+            memo[node] = frozenset((node.name,))
+        else:
+            memo[node] = frozenset().union(*(memo[c] for c in _children(node)))
+    return memo[expr]
+
+
+def is_nonlinear(expr: SymLang, memo: Dict[SymLang, bool], variables_of) -> bool:
+    """
+    whether an expression has a nonlinear term: sin or a power of a variable, a product of
+    two variable terms or a division by one
+
+    :param memo: node -> answer, shared subterms are visited once
+    :param variables_of: maps a node to its free variables
+    """
+    nonlinear = memo.get(expr)
+    if nonlinear is not None:
+        return nonlinear
+    nonlinear = False
+    if isinstance(expr, SBinaryOp):
+        operator = expr.operator
+        if operator == Operator.POW:
+            nonlinear = bool(variables_of(expr))
+        elif operator == Operator.MUL:
+            nonlinear = bool(variables_of(expr.left)) and bool(variables_of(expr.right))
+        elif operator == Operator.DIV:
+            nonlinear = bool(variables_of(expr.right))
+        nonlinear = (
+            nonlinear
+            or is_nonlinear(expr.left, memo, variables_of)
+            or is_nonlinear(expr.right, memo, variables_of)
+        )
+    elif isinstance(expr, SUnaryOp):
+        nonlinear = (
+            expr.operator == Operator.SIN and bool(variables_of(expr))
+        ) or is_nonlinear(expr.expression, memo, variables_of)
+    elif isinstance(expr, SIte):
+        nonlinear = any(
+            is_nonlinear(e, memo, variables_of)
+            for e in (expr.condition, expr.true_value, expr.false_value)
+        )
+    elif isinstance(expr, STuple):
+        nonlinear = any(is_nonlinear(e, memo, variables_of) for e in expr.elements)
+    memo[expr] = nonlinear
+    return nonlinear
+
+
+def independent_slice(conditions, touched, variables_of) -> FrozenSet[SymLang]:
+    """
+    the conditions that share variables, directly or transitively, with the touched ones
+
+    Ground conditions (without variables) are always part of the slice.
+
+    :param conditions: the conjuncts of a query
+    :param touched: the conjuncts the slice is grown from
+    :param variables_of: maps a conjunct to its free variables
+    """
+    sliced = set(touched)
+    variables = set()
+    for condition in sliced:
+        variables |= variables_of(condition)
+    rest = [c for c in conditions if c not in sliced]
+    grown = True
+    while grown:
+        grown = False
+        remaining = []
+        for condition in rest:
+            condition_variables = variables_of(condition)
+            if not condition_variables or not variables.isdisjoint(condition_variables):
+                sliced.add(condition)
+                variables |= condition_variables
+                grown = True
+            else:
+                remaining.append(condition)
+        rest = remaining
+    return frozenset(sliced)
+
+
+def independent_slices(conditions, variables_of) -> List[FrozenSet[SymLang]]:
+    """partition conditions into groups whose variables do not overlap"""
+    slices = []
+    rest = list(dict.fromkeys(conditions))
+    while rest:
+        group = independent_slice(rest, rest[:1], variables_of)
+        slices.append(group)
+        rest = [c for c in rest if c not in group]
+    return slices
+
+
+_MISSING = object()
+
+
+class VariableGroups:
+    """
+    The conditions on a solver stack, grouped by the variables they share
+
+    A union-find over variable names, without path compression so that every push can be
+    undone by the matching pop. Each root keeps the conditions of its group, and conditions
+    without variables form the group of None.
+    """
+
+    def __init__(self):
+        self.parent: Dict[Name, Name] = {}
+        self.size: Dict[Name, int] = {}
+        self.members: Dict[Optional[Name], FrozenSet[SymLang]] = {}
+        # per push, the entries it changed with their previous values
+        self._undo: List[List] = []
+
+    def find(self, name: Name) -> Name:
+        parent = self.parent.get(name, name)
+        while parent != name:
+            name = parent
+            parent = self.parent.get(name, name)
+        return name
+
+    def roots(self, variables) -> set:
+        """the groups of some variables, None for no variables"""
+        if not variables:
+            return {None}
+        return {self.find(v) for v in variables}
+
+    def _set(self, log, table, key, value):
+        log.append((table, key, table.get(key, _MISSING)))
+        table[key] = value
+
+    def push(self, condition: SymLang, variables: FrozenSet[Name]):
+        """add a condition, joining the groups of its variables"""
+        log = []
+        self._undo.append(log)
+        if condition is SBoolean(True):
+            return
+        roots = self.roots(variables)
+        root = max(roots, key=lambda r: self.size.get(r, 1))
+        members = self.members.get(root, frozenset())
+        for other in roots:
+            if other != root:
+                self._set(log, self.parent, other, root)
+                self._set(
+                    log,
+                    self.size,
+                    root,
+                    self.size.get(root, 1) + self.size.get(other, 1),
+                )
+                members = members.union(self.members.get(other, ()))
+        if condition not in members:
+            members = members.union((condition,))
+        self._set(log, self.members, root, members)
+
+    def pop(self):
+        """undo the latest push"""
+        for table, key, value in reversed(self._undo.pop()):
+            if value is _MISSING:
+                del table[key]
+            else:
+                table[key] = value
+
+    def group(self, roots) -> FrozenSet[SymLang]:
+        """the conditions of some groups"""
+        return frozenset().union(*(self.members.get(r, ()) for r in roots))
+
+
+class Z3QueryCache:
+    """
+    A counterexample cache for feasibility queries
+
+    Queries are keyed on the set of their (interned) conjuncts, so order and duplicates do not
+    matter. Besides exact hits, a query is answered without the solver when
+
+    * a cached UNSAT query is a subset of it: adding constraints keeps it UNSAT
+    * a model cached for an earlier SAT query satisfies all of its conjuncts
+
+    UNSAT queries are indexed by one of their conjuncts, so the subset test only runs on the
+    queries whose indexed conjunct the query contains. The cache can be shared between
+    sessions and between runs of the executor.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_model_probes: int = 8):
+        """
+        :param max_entries: number of queries kept before the least recently used is evicted
+        :param max_model_probes: number of recent models tried against a query that missed
+        """
+        self.max_entries = max_entries
+        self.max_model_probes = max_model_probes
+        self.results: "OrderedDict[FrozenSet[SymLang], Any]" = OrderedDict()
+        # unsat query -> the conjunct it is indexed by
+        self.unsat: "OrderedDict[FrozenSet[SymLang], SymLang]" = OrderedDict()
+        self._unsat_index: Dict[SymLang, List[FrozenSet[SymLang]]] = {}
+        self.models: "OrderedDict[FrozenSet[SymLang], Any]" = OrderedDict()
+        self.hits = 0
+        self.subset_hits = 0
+        self.model_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.stats()})"
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.results),
+            "hits": self.hits,
+            "subset_hits": self.subset_hits,
+            "model_hits": self.model_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        self.results.clear()
+        self.unsat.clear()
+        self._unsat_index.clear()
+        self.models.clear()
+
+    def lookup(self, query: FrozenSet[SymLang], term: Callable[[SymLang], Any]):
+        """
+        answer a query from the cache
+
+        :param query: the conjuncts of the query
+        :param term: converts a conjunct to z3, used to evaluate cached models
+        :returns: z3.sat or z3.unsat, or None if the solver has to be asked
+        """
+        result = self.results.get(query)
+        if result is not None:
+            self.results.move_to_end(query)
+            self.hits += 1
+            return result
+        for condition in query:
+            for unsat_query in self._unsat_index.get(condition, ()):
+                if unsat_query <= query:
+                    self.unsat.move_to_end(unsat_query)
+                    self.subset_hits += 1
+                    return self._remember(query, z3.unsat)
+        for probed, (model_query, model) in enumerate(reversed(self.models.items())):
+            if probed >= self.max_model_probes:
+                break
+            # the model satisfies the conjuncts of its own query
+            if all(
+                z3.is_true(model.eval(term(c), model_completion=True))
+                for c in query
+                if c not in model_query
+            ):
+                self.models.move_to_end(model_query)
+                self.model_hits += 1
+                return self._remember(query, z3.sat)
+        self.misses += 1
+        return None
+
+    def store(self, query: FrozenSet[SymLang], result, model=None):
+        """
+        record the solver's answer to a query
+
+        :param query: the conjuncts of the query
+        :param result: the z3 check result, unknown results are not cached
+        :param model: the model found for a satisfiable query
+        """
+        if result == z3.unsat:
+            if query not in self.unsat and len(query) > 0:
+                # index by the conjunct with the fewest queries, to keep the lists short
+                watch = min(query, key=lambda c: len(self._unsat_index.get(c, ())))
+                self.unsat[query] = watch
+                self._unsat_index.setdefault(watch, []).append(query)
+                if len(self.unsat) > self.max_entries:
+                    evicted, watch = self.unsat.popitem(last=False)
+                    indexed = self._unsat_index[watch]
+                    indexed.remove(evicted)
+                    if not indexed:
+                        del self._unsat_index[watch]
+        elif result == z3.sat and model is not None:
+            self.models[query] = model
+            self._evict(self.models)
+        else:
+            return
+        self._remember(query, result)
+
+    def _remember(self, query, result):
+        self.results[query] = result
+        self.results.move_to_end(query)
+        if len(self.results) > self.max_entries:
+            self.results.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def _evict(self, table):
+        if len(table) > self.max_entries:
+            table.popitem(last=False)
+
+
+# binary operators by their z3 counterpart
+_BINARY = {
+    Operator.ADD: lambda x, y: x + y,
+    Operator.SUB: lambda x, y: x - y,
+    Operator.MUL: lambda x, y: x * y,
+    Operator.DIV: lambda x, y: x / y,
+    Operator.EQUAL: lambda x, y: x == y,
+    Operator.LESS: lambda x, y: x < y,
+    Operator.LESS_EQUAL: lambda x, y: x <= y,
+    Operator.GREATER: lambda x, y: x > y,
+    Operator.GREATER_EQUAL: lambda x, y: x >= y,
+    Operator.AND: lambda x, y: z3.And(x, y),
+    Operator.OR: lambda x, y: z3.Or(x, y),
+}
+
+_SORTS = {
+    Type.REAL: z3.Real,
+    Type.INTEGER: z3.Int,
+    Type.BOOLEAN: z3.Bool,
+}
+
+
+class Z3VariableRegistry:
+    """
+    The z3 constants of the variables of an analysis, created once per name and type
+
+    Converters share the default registry unless given their own, so the same variable is
+    the same z3 term in every solver of an analysis.
+    """
+
     def __init__(self):
+        self.constants: Dict[tuple, Any] = {}
+
+    def constant(self, variable: SVariable):
+        """the z3 constant of a variable"""
+        key = (variable.name, variable.variable_type)
+        constant = self.constants.get(key)
+        if constant is None:
+            try:
+                sort = _SORTS[variable.variable_type]
+            except KeyError:
+                raise ValueError(
+                    f"Cannot convert a {variable.variable_type} variable to z3"
+                )
+            constant = sort(variable.name)
+            self.constants[key] = constant
+        return constant
+
+    def __len__(self):
+        return len(self.constants)
+
+
+VARIABLES = Z3VariableRegistry()
+
+
+class Z3SatConverter:
+    """
+    Converts SymLang conditions to z3 and checks them
+
+    Conversion is memoized by node (nodes are interned), so a subterm shared between
+    conditions, e.g. a controller output used in several guards, is converted once per
+    converter, and converting costs the number of distinct nodes rather than the size of
+    the expanded tree.
+
+    :param cache: a query cache for sat
+    :param registry: where the z3 constants of variables come from, the shared default one
+        unless given
+    """
+
+    def __init__(
+        self,
+        cache: Optional[Z3QueryCache] = None,
+        registry: Optional[Z3VariableRegistry] = None,
+    ):
         self.variables: Dict[Name, Any] = {}
         self.conditions: List[Any] = []
+        self.nodes: List[SymLang] = []
+        self.cache = cache
+        self.registry = VARIABLES if registry is None else registry
+        # node -> z3 term, and the nodes whose variables were collected; weakly, so nodes
+        # no longer on any path can be freed while the converter lives on in a session
+        self.terms: Dict[SymLang, Any] = weakref.WeakKeyDictionary()
+        self._collected = weakref.WeakSet()
 
     def add_condition(self, condition: SymLang):
         # add any unknown variables to the variable map
@@ -26,6 +421,7 @@ class Z3SatConverter:
 
         # convert the condition to a z3 expression
         self.conditions.append(self.convert(condition))
+        self.nodes.append(condition)
 
         return self
 
@@ -35,8 +431,29 @@ class Z3SatConverter:
         return self
 
     def sat(self):
-        s = self.z3_solver
-        return s.check()
+        """check the conjunction one independent group of conditions at a time"""
+        memo = {}
+        result = z3.sat
+        for query in independent_slices(self.nodes, lambda c: free_variables(c, memo)):
+            query_result = self._check_slice(query)
+            if query_result == z3.unsat:
+                return query_result
+            if query_result != z3.sat:
+                result = query_result
+        return result
+
+    def _check_slice(self, query):
+        if self.cache is not None:
+            result = self.cache.lookup(query, self.convert)
+            if result is not None:
+                return result
+        s = z3.Solver()
+        for condition in query:
+            s.add(self.convert(condition))
+        result = s.check()
+        if self.cache is not None:
+            self.cache.store(query, result, s.model() if result == z3.sat else None)
+        return result
 
     @property
     def is_sat(self):
@@ -44,9 +461,8 @@ class Z3SatConverter:
 
     @property
     def is_unsat(self):
-        s = self.z3_solver
-        return  s.check() == z3.unsat
-    
+        return self.sat() == z3.unsat
+
     @property
     def z3_solver(self):
         s = z3.Solver()
@@ -55,65 +471,295 @@ class Z3SatConverter:
         return s
 
     def collect_variables(self, expr: SymLang):
-        if isinstance(expr, SVariable):
-            if expr.name not in self.variables:
-                if expr.variable_type == Type.REAL:
-                    self.variables[expr.name] = z3.Real(expr.name)
-                elif expr.variable_type == Type.INTEGER:
-                    self.variables[expr.name] = z3.Int(expr.name)
-                elif expr.variable_type == Type.BOOLEAN:
-                    self.variables[expr.name] = z3.Bool(expr.name)
-                elif expr.variable_type == Type.TUPLE:
-                    self.variables[expr.name] = z3.Tuple(
-                        *[self.collect_variables(e) for e in expr.elements]
-                    )
-        elif isinstance(expr, SBinaryOp):
-            self.collect_variables(expr.left)
-            self.collect_variables(expr.right)
-        elif isinstance(expr, SUnaryOp):
-            return self.collect_variables(expr.expression)
-        else:
-            return None
+        """add the variables of an expression to the variable map"""
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            if node in self._collected:
+                continue
+            self._collected.add(node)
+            if isinstance(node, SVariable):
+                if node.name not in self.variables:
+                    self.variables[node.name] = self.registry.constant(node)
+            elif isinstance(node, SBinaryOp):
+                stack += [node.left, node.right]
+            elif isinstance(node, SUnaryOp):
+                stack.append(node.expression)
+            elif isinstance(node, SIte):
+                stack += [node.condition, node.true_value, node.false_value]
 
     def convert(self, expr: SymLang):
+        """the z3 term of an expression, converting each distinct node once"""
+        if not isinstance(expr, SymLang):
+            return expr
+        term = self.terms.get(expr)
+        if term is not None:
+            return term
+        # post-order with an explicit stack, so deep chains do not exhaust the Python stack
+        stack = [(expr, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in self.terms:
+                continue
+            if expanded:
+                self.terms[node] = self._term(node)
+                continue
+            stack.append((node, True))
+            stack += [
+                (child, False)
+                for child in _children(node)
+                if isinstance(child, SymLang) and child not in self.terms
+            ]
+        return self.terms[expr]
+
+    def _term(self, expr: SymLang):
+        """the z3 term of a node whose children are converted"""
         if isinstance(expr, SVariable):
-            return self.variables[expr.name]
+            term = self.variables.get(expr.name)
+            if term is None:
+                term = self.registry.constant(expr)
+                self.variables[expr.name] = term
+            return term
         elif isinstance(expr, SBinaryOp):
-            if expr.operator == Operator.ADD:
-                return self.convert(expr.left) + self.convert(expr.right)
-            elif expr.operator == Operator.SUB:
-                return self.convert(expr.left) - self.convert(expr.right)
-            elif expr.operator == Operator.MUL:
-                return self.convert(expr.left) * self.convert(expr.right)
-            elif expr.operator == Operator.DIV:
-                return self.convert(expr.left) / self.convert(expr.right)
-            elif expr.operator == Operator.EQUAL:
-                return self.convert(expr.left) == self.convert(expr.right)
-            elif expr.operator == Operator.LESS:
-                return self.convert(expr.left) < self.convert(expr.right)
-            elif expr.operator == Operator.LESS_EQUAL:
-                return self.convert(expr.left) <= self.convert(expr.right)
-            elif expr.operator == Operator.GREATER:
-                return self.convert(expr.left) > self.convert(expr.right)
-            elif expr.operator == Operator.GREATER_EQUAL:
-                return self.convert(expr.left) >= self.convert(expr.right)
-            elif expr.operator == Operator.AND:
-                return z3.And(self.convert(expr.left), self.convert(expr.right))
-            elif expr.operator == Operator.OR:
-                return z3.Or(self.convert(expr.left), self.convert(expr.right))
-            else:
+            try:
+                operator_func = _BINARY[expr.operator]
+            except KeyError:
                 raise ValueError(f"Invalid operator: {expr.operator}")
+            return operator_func(self.convert(expr.left), self.convert(expr.right))
         elif isinstance(expr, SUnaryOp):
             if expr.operator == Operator.NOT:
                 return z3.Not(self.convert(expr.expression))
-            else:
-                raise ValueError(f"Invalid operator: {expr.operator}")
+            raise ValueError(f"Invalid operator: {expr.operator}")
+        elif isinstance(expr, SIte):
+            return z3.If(
+                self.convert(expr.condition),
+                self.convert(expr.true_value),
+                self.convert(expr.false_value),
+            )
         elif isinstance(expr, SReal):
-            return expr.value
+            return z3.RealVal(expr.value)
         elif isinstance(expr, SInteger):
-            return expr.value
+            return z3.IntVal(expr.value)
         elif isinstance(expr, SBoolean):
-            return expr.value
+            # a z3 value, also for conditions that are constants, so models can eval it
+            return z3.BoolVal(expr.value)
         elif isinstance(expr, STuple):
             return z3.Tuple(*[self.convert(e) for e in expr.elements])
         return expr
+
+
+class Z3Session:
+    """
+    An incremental solver session that lives for a whole exploration
+
+    Branch constraints are pushed as the executor descends into a conditional and popped on
+    the way out, so a feasibility check only has to convert and assert the constraints that
+    are not already on the current path. Checks are answered from a query cache when
+    possible.
+
+    With slicing, the constraints on the stack are kept in groups whose variables do not
+    overlap (VariableGroups). Once a check finds the path satisfiable, a later check only
+    solves the groups touched by its new constraints and by the constraints pushed since,
+    split into independent slices, so the queries stay small as the number of inputs grows.
+    A query that covers the whole path uses the incremental solver.
+
+    A prefilter (an ICPChecker) answers the checks with nonlinear constraints it can decide
+    before z3 is asked, which covers constraints with sin; its unsat answers are only taken
+    for checks with constraints z3 is not given. With a prefilter, the constraints
+    z3 is not given are left out of its feasibility queries, so that z3 answers for the
+    rest: an unsat answer stays exact, and a sat answer keeps the path (and is not cached).
+    Without one, they raise ValueError like in model(), which never leaves them out.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[Z3QueryCache] = None,
+        slicing: bool = True,
+        prefilter: Optional[ICPChecker] = None,
+    ):
+        """
+        :param cache: a query cache to share with other sessions, a private one by default
+        :param slicing: solve only the independent slice touched by the newest constraints
+        :param prefilter: decides checks by interval constraint propagation ahead of z3
+        """
+        self.converter = Z3SatConverter()
+        self.cache = Z3QueryCache() if cache is None else cache
+        self.slicing = slicing
+        self.prefilter = prefilter
+        self._variables: Dict[SymLang, FrozenSet[Name]] = {}
+        self.solver = z3.Solver()
+        self.frames: List[SymLang] = []
+        self._on_stack: Dict[SymLang, int] = {}
+        # the conjuncts of the path up to each frame, so checks do not rebuild them
+        self._paths: List[FrozenSet[SymLang]] = [frozenset()]
+        self.groups = VariableGroups()
+        # number of frames known to be satisfiable together
+        self._checked = 0
+        # the conditions z3 is not given
+        self._opaque = set()
+        self._nonlinear: Dict[SymLang, bool] = {}
+        # called before every check, e.g. to count checks against a budget (it may raise)
+        self.on_check: Optional[Callable[[], None]] = None
+
+    def term(self, condition: SymLang):
+        """convert a condition to z3, converting each node only once per session"""
+        return self.converter.convert(condition)
+
+    def _relaxed(self, condition: SymLang):
+        """
+        the z3 term of a condition, None for one z3 is not given (e.g. with sin) when there
+        is a prefilter
+        """
+        if condition in self._opaque:
+            return None
+        try:
+            return self.term(condition)
+        except ValueError:
+            if self.prefilter is None:
+                raise
+            self._opaque.add(condition)
+            return None
+
+    def _cached_term(self, condition: SymLang):
+        """the term cached models are evaluated on: false where z3 is not given one"""
+        term = self._relaxed(condition)
+        return z3.BoolVal(False) if term is None else term
+
+    def _assert(self, solver, conditions):
+        for condition in conditions:
+            term = self._relaxed(condition)
+            if term is not None:
+                solver.add(term)
+
+    def push(self, condition: SymLang):
+        """enter a branch: assert its constraint in a new frame"""
+        self.solver.push()
+        self._assert(self.solver, [condition])
+        self.frames.append(condition)
+        self._on_stack[condition] = self._on_stack.get(condition, 0) + 1
+        path = self._paths[-1]
+        if condition not in path and condition is not SBoolean(True):
+            path = path.union((condition,))
+        self._paths.append(path)
+        self.groups.push(condition, self.variables_of(condition))
+        return self
+
+    def pop(self):
+        """leave the innermost branch"""
+        self.solver.pop()
+        self._paths.pop()
+        self.groups.pop()
+        condition = self.frames.pop()
+        self._checked = min(self._checked, len(self.frames))
+        if self._on_stack[condition] == 1:
+            del self._on_stack[condition]
+        else:
+            self._on_stack[condition] -= 1
+        return condition
+
+    def check(self, conditions=()):
+        """check the current path together with extra conditions not yet on it"""
+        if self.on_check is not None:
+            self.on_check()
+        new_conditions = [
+            c for c in conditions if c not in self._on_stack and c is not SBoolean(True)
+        ]
+        path = self._paths[-1]
+        if not self.slicing:
+            if new_conditions:
+                path = path.union(new_conditions)
+            return self._check_query(path, new_conditions, incremental=True)
+        # the groups nothing new was added to are known to be satisfiable
+        roots = set()
+        for condition in itertools.chain(self.frames[self._checked :], new_conditions):
+            roots |= self.groups.roots(self.variables_of(condition))
+        group = self.groups.group(roots)
+        touched = group.union(new_conditions)
+        result = z3.sat
+        if touched:
+            queries = independent_slices(touched, self.variables_of)
+            # a group as large as the path is the whole path
+            if len(queries) == 1 and len(group) == len(path):
+                result = self._check_query(touched, new_conditions, incremental=True)
+            else:
+                for query in queries:
+                    query_result = self._check_query(
+                        query, new_conditions, incremental=False
+                    )
+                    if query_result == z3.unsat:
+                        return query_result
+                    if query_result != z3.sat:
+                        result = query_result
+        if result == z3.sat:
+            self._checked = len(self.frames)
+        return result
+
+    def _check_query(self, query, new_conditions, incremental: bool):
+        result = self.cache.lookup(query, self._cached_term)
+        if result is not None:
+            return result
+        if self.prefilter is not None and any(self.is_nonlinear(c) for c in query):
+            # the prefilter keeps its own answers: they assume its bounds, and the query
+            # cache may be shared with sessions that do not
+            result = self.prefilter.decide(query)
+            # interval bounds are not exact: unsat is left to z3 when it has every condition
+            if result == z3.sat or (
+                result == z3.unsat and any(self._relaxed(c) is None for c in query)
+            ):
+                return result
+        if incremental:
+            result, model = self._check_incremental(new_conditions)
+        else:
+            result, model = self._check_slice(query)
+        if result == z3.unsat or not any(c in self._opaque for c in query):
+            # sat without some of the conditions is not an answer for the query
+            self.cache.store(query, result, model)
+        return result
+
+    def is_nonlinear(self, condition: SymLang) -> bool:
+        return is_nonlinear(condition, self._nonlinear, self.variables_of)
+
+    def variables_of(self, condition: SymLang) -> FrozenSet[Name]:
+        return free_variables(condition, self._variables)
+
+    def _check_incremental(self, new_conditions):
+        self.solver.push()
+        try:
+            self._assert(self.solver, new_conditions)
+            result = self.solver.check()
+            return result, self.solver.model() if result == z3.sat else None
+        finally:
+            self.solver.pop()
+
+    def _check_slice(self, query):
+        s = z3.Solver()
+        self._assert(s, query)
+        result = s.check()
+        return result, s.model() if result == z3.sat else None
+
+    def model(self, conditions=()):
+        """
+        check the current path together with extra conditions, for a model
+
+        :returns: the z3 check result, and a model if it is sat (None for unsat and unknown)
+        :raises ValueError: if z3 is not given one of the conditions (e.g. with sin)
+        """
+        for condition in itertools.chain(self.frames, conditions):
+            if condition in self._opaque:
+                raise ValueError(f"No z3 term for {condition}")
+            self.term(condition)
+        self.solver.push()
+        try:
+            self._assert(self.solver, conditions)
+            result = self.solver.check()
+            return result, self.solver.model() if result == z3.sat else None
+        finally:
+            self.solver.pop()
+
+    @property
+    def is_sat(self):
+        return self.check() == z3.sat
+
+    def is_feasible(self, result: EvalResult):
+        """whether a result's path condition is satisfiable along the current path"""
+        return self.check(result.path_condition) == z3.sat
@@ -0,0 +1,154 @@
+"""Programs shared by the tests"""
+
+import math
+from seereach.lang import Literal, Type, Value
+from seereach.parser import SReachParser
+from seereach.symlang import SVariable
+
+PENDULUM = """
+fn pendulum_dynamics(theta: real, omega: real, kp: real, kd: real) -> tuple {
+    let u: real = controller(theta, omega, kp, kd);
+    let g: real = -9.81;
+    let l: real = 2.0;
+    let thetap: real = omega;
+    let omegap: real = u + g / l * sin(theta);
+    return (thetap, omegap)
+}
+
+fn controller(x: real, omega: real, kp: real, kd: real) -> real {
+    let up: real = -1.0 * kp * x;
+    let ud: real = -1.0 * kd * omega;
+    let u: real = up + ud;
+    if u < -5.0 {
+        return -5.0
+    } else {
+        if u > 5.0 {
+            return 5.0
+        } else {
+            return u
+        }
+    }
+}
+"""
+
+SATURATE = """
+fn sat(x: real) -> real {
+    if x < -1.0 {
+        return -1.0
+    } else {
+        if x > 1.0 {
+            return 1.0
+        } else {
+            return x
+        }
+    }
+}
+"""
+
+# four independent saturations: 81 paths in four variable-disjoint groups
+INDEPENDENT = """
+fn plant(a: real, b: real, c: real, d: real) -> tuple {
+    let u: real = sat(a);
+    let v: real = sat(b);
+    let w: real = sat(c);
+    let z: real = sat(d);
+    return (u + v, w + z)
+}
+""" + SATURATE
+
+# saturations that share variables, so that some combinations are infeasible
+COUPLED = """
+fn plant(a: real, b: real, kp: real) -> tuple {
+    let u: real = sat(a * kp);
+    let v: real = sat(b * kp);
+    let w: real = sat(a + b);
+    return (u + v, w)
+}
+""" + SATURATE
+
+# nested branches where some combinations contradict each other
+CORRELATED = """
+fn branches(x: real, y: real) -> real {
+    if x < 0.0 {
+        if x > 1.0 {
+            return 1.0
+        } else {
+            return 2.0
+        }
+    } else {
+        if y > x {
+            if y < 0.0 {
+                return 3.0
+            } else {
+                return 4.0
+            }
+        } else {
+            return 5.0
+        }
+    }
+}
+"""
+
+# combinations of a call's paths with a later branch, infeasible in one of two
+# variable-independent groups
+DISJOINT = """
+fn two(x: real, y: real) -> real {
+    let a: real = sat(x);
+    let b: real = sat(y);
+    if y > 2.0 {
+        return a + b
+    } else {
+        return a
+    }
+}
+""" + SATURATE
+
+
+def _symbolic(program, funname):
+    return [
+        SVariable(p.name, p.variable_type)
+        for p in program.functions[funname].parameters
+    ]
+
+
+def cases():
+    """(name, program, function, signature) of every test program"""
+    pendulum = SReachParser.parse(PENDULUM)
+    gains = [
+        SVariable("theta", Type.REAL),
+        SVariable("omega", Type.REAL),
+        Literal(Value(Type.REAL, 1.0)),
+        Literal(Value(Type.REAL, 0.2)),
+    ]
+    independent = SReachParser.parse(INDEPENDENT)
+    coupled = SReachParser.parse(COUPLED)
+    correlated = SReachParser.parse(CORRELATED)
+    disjoint = SReachParser.parse(DISJOINT)
+    return [
+        ("pendulum", pendulum, "pendulum_dynamics", gains),
+        (
+            "pendulum-symbolic-gains",
+            pendulum,
+            "pendulum_dynamics",
+            _symbolic(pendulum, "pendulum_dynamics"),
+        ),
+        ("controller", pendulum, "controller", gains),
+        ("independent", independent, "plant", _symbolic(independent, "plant")),
+        ("coupled", coupled, "plant", _symbolic(coupled, "plant")),
+        ("correlated", correlated, "branches", _symbolic(correlated, "branches")),
+        ("disjoint", disjoint, "two", _symbolic(disjoint, "two")),
+    ]
+
+
+# the number of feasible paths of each program
+PATHS = {
+    "pendulum": 3,
+    "pendulum-symbolic-gains": 3,
+    "controller": 3,
+    "independent": 81,
+    "coupled": 27,
+    "correlated": 3,
+    "disjoint": 6,
+}
+
+BOUNDS = (-3 * math.pi, 3 * math.pi)
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from seereach.automaton import HybridAutomaton, _resolve
+from seereach.fanalysis import function_symbolic_execution
+from seereach.lang import Operator, Type
+from seereach.numeric import evaluate, evaluate_conjunction
+from seereach.symlang import SBinaryOp, SReal, SUnaryOp, SVariable
+from seereach.vectorized import VectorizedProgram
+from tests.programs import BOUNDS, PATHS, cases
+
+CASES = {name: rest for name, *rest in cases()}
+
+
+def automaton(name):
+    program, funname, signature = CASES[name]
+    results = function_symbolic_execution(program, funname, list(signature))
+    return HybridAutomaton(results)
+
+
+def test_independent_modes_merge():
+    merged = automaton("independent")
+    assert len(merged.paths) == PATHS["independent"] == 81
+    # each sum of two saturations has 8 distinct values: -1 + 1 and 1 + -1 fold to 0
+    assert len(merged) == 64
+    assert sorted(i for mode in merged for i in mode.paths) == list(range(81))
+    for mode in merged:
+        assert all(merged.mode_of[i] == mode.index for i in mode.paths)
+    assert len(merged.results()) == 64
+
+
+def test_resolution_undoes_case_splits():
+    x = SVariable("x", Type.REAL)
+    y = SVariable("y", Type.REAL)
+    a = SBinaryOp(x, Operator.LESS, SReal(0.0))
+    b = SBinaryOp(y, Operator.LESS, SReal(0.0))
+    not_a, not_b = SUnaryOp(Operator.NOT, a), SUnaryOp(Operator.NOT, b)
+    split = [frozenset(c) for c in ([a, b], [a, not_b], [not_a, b], [not_a, not_b])]
+    assert _resolve(split) == [frozenset()]
+    # a and b, a and not b, not a and b: a, or not a and b
+    assert set(_resolve(split[:3])) == {frozenset([a]), frozenset([not_a, b])}
+    assert _resolve([frozenset([a]), frozenset([a, b])]) == [frozenset([a])]
+
+
+def columns(name, rng, n):
+    program, funname, signature = CASES[name]
+    env = {}
+    arguments = []
+    for argument in signature:
+        if isinstance(argument, SVariable):
+            column = rng.uniform(*BOUNDS, n)
+            env[argument.name] = column
+        else:
+            column = np.full(n, float(argument.value.value))
+        arguments.append(column)
+    return env, VectorizedProgram(program).run(funname, *arguments)
+
+
+def agree(value, expected) -> np.ndarray:
+    if isinstance(value, tuple):
+        return np.logical_and.reduce([agree(v, e) for v, e in zip(value, expected)])
+    return np.isclose(value, expected, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_modes_agree_with_concrete_execution(name):
+    merged = automaton(name)
+    n = 2000
+    env, output = columns(name, np.random.default_rng(0), n)
+    hits = np.zeros(n, dtype=int)
+    with np.errstate(all="ignore"):
+        for mode in merged:
+            guard = evaluate_conjunction(mode.guard_conjuncts, env, n)
+            # the guard holds exactly where one of the mode's paths does
+            paths = np.zeros(n, dtype=bool)
+            for i in mode.paths:
+                paths |= evaluate_conjunction(merged.paths[i].path_condition, env, n)
+            assert np.array_equal(guard, paths)
+            hits += guard
+            if not guard.any():
+                continue
+            rows = {k: v[guard] for k, v in env.items()}
+            expected = evaluate(mode.flow, rows)
+            if isinstance(output, tuple):
+                value = tuple(o[guard] for o in output)
+                expected = tuple(np.broadcast_to(e, guard.sum()) for e in expected)
+            else:
+                value = output[guard]
+                expected = np.broadcast_to(expected, guard.sum())
+            assert agree(value, expected).all()
+    # the guards partition the sampled states
+    assert np.all(hits == 1)
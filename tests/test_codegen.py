@@ -0,0 +1,24 @@
+import numpy as np
+from seereach.codegen import compile_modes
+from seereach.numeric import evaluate, evaluate_conjunction
+from tests.test_exploration import CASES, explore
+
+
+def test_modes_agree_with_the_numeric_evaluator():
+    results = explore("pendulum-symbolic-gains")
+    _, _, signature = CASES["pendulum-symbolic-gains"]
+    names = [v.name for v in signature]
+    modes = compile_modes(results, names[:2])
+    rng = np.random.default_rng(0)
+    n = 500
+    states = rng.uniform(-3.0, 3.0, (n, 2))
+    gains = {"kp": rng.uniform(0.0, 2.0, n), "kd": rng.uniform(0.0, 1.0, n)}
+    mode, derivative = modes(states, **gains)
+    env = {names[0]: states[:, 0], names[1]: states[:, 1], **gains}
+    memo = {}
+    for m, result in enumerate(results):
+        rows = evaluate_conjunction(result.path_condition, env, n, memo)
+        np.testing.assert_array_equal(mode == m, rows)
+        for k, element in enumerate(result.expr_eval.elements):
+            expected = np.broadcast_to(evaluate(element, env, memo), (n,))
+            np.testing.assert_allclose(derivative[rows, k], expected[rows])
@@ -0,0 +1,210 @@
+"""
+The executor's options must not change what it finds: merging, summaries, the query cache,
+slicing and compilation are checked against a plain interpreted run, and every run against
+the concrete interpreter.
+"""
+
+import io
+import itertools
+import json
+import numpy as np
+import pytest
+from seereach.compile import compile_program
+from seereach.context import Context
+from seereach.fanalysis import (
+    iter_function_symbolic_execution,
+    parallel_function_symbolic_execution,
+    scheduled_function_symbolic_execution,
+)
+from seereach.lang import FunctionCall, Name
+from seereach.numeric import evaluate, evaluate_conjunction
+from seereach.serialize import read_jsonl, write_jsonl
+from seereach.summary import FunctionSummaryCache
+from seereach.symlang import SBoolean, STuple, SVariable
+from seereach.vectorized import VectorizedProgram
+from seereach.z3convert import Z3QueryCache, Z3Session
+from tests.programs import BOUNDS, PATHS, cases
+
+CASES = {name: case for name, *case in cases()}
+OPTIONS = list(itertools.product([False, True], repeat=5))
+
+
+def explore(
+    name, merge=False, summaries=False, cache=False, slicing=True, compiled=False
+):
+    program, funname, signature = CASES[name]
+    if compiled:
+        program = compile_program(program)
+    context = Context(
+        FunctionCall(Name(funname), signature),
+        session=Z3Session(cache=Z3QueryCache() if cache else None, slicing=slicing),
+        merge_policy=merge,
+        summaries=FunctionSummaryCache() if summaries else None,
+    )
+    return context.execute(program)
+
+
+def result_set(results):
+    """the results as a set, conjuncts unordered (nodes are interned)"""
+    return {
+        (
+            r.expr_eval,
+            frozenset(r.path_condition) - {SBoolean(True)},
+            r.is_return,
+        )
+        for r in results
+    }
+
+
+def concrete_agreement(name, results, n=2000, seed=0):
+    """
+    check the results against the concrete interpreter on random inputs: exactly one
+    path condition holds per input, and its value is what the program computes
+    """
+    program, funname, signature = CASES[name]
+    rng = np.random.default_rng(seed)
+    columns = []
+    env = {}
+    for argument in signature:
+        if isinstance(argument, SVariable):
+            column = rng.uniform(*BOUNDS, n)
+            env[argument.name] = column
+        else:
+            column = np.full(n, float(argument.value.value))
+        columns.append(column)
+    expected = VectorizedProgram(program).run(funname, *columns)
+    if not isinstance(expected, tuple):
+        expected = (expected,)
+    matched = np.zeros(n, dtype=int)
+    for result in results:
+        memo = {}
+        rows = evaluate_conjunction(result.path_condition, env, n, memo)
+        matched += rows
+        value = result.expr_eval
+        elements = value.elements if isinstance(value, STuple) else (value,)
+        for element, column in zip(elements, expected):
+            actual = np.broadcast_to(evaluate(element, env, memo), (n,))
+            np.testing.assert_allclose(actual[rows], column[rows], rtol=1e-9)
+    np.testing.assert_array_equal(matched, 1)
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_baseline_paths(name):
+    results = explore(name)
+    assert len(results) == PATHS[name]
+    concrete_agreement(name, results)
+
+
+@pytest.mark.parametrize("name", CASES)
+@pytest.mark.parametrize("merge,summaries,cache,slicing,compiled", OPTIONS)
+def test_options_agree(name, merge, summaries, cache, slicing, compiled):
+    results = explore(name, merge, summaries, cache, slicing, compiled)
+    concrete_agreement(name, results)
+    if not merge:
+        # merging changes the paths (into fewer, with if-then-else values), nothing else may
+        assert result_set(results) == result_set(explore(name))
+
+
+@pytest.mark.parametrize("name", CASES)
+@pytest.mark.parametrize(
+    "summaries,compiled", [(False, True), (True, False), (True, True)]
+)
+def test_merged_paths_agree(name, summaries, compiled):
+    """merged runs agree with each other whatever else is on"""
+    merged = explore(name, merge=True)
+    assert result_set(explore(name, True, summaries, True, True, compiled)) == (
+        result_set(merged)
+    )
+    assert len(merged) <= PATHS[name]
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_cache_reuse_between_runs(name):
+    """a shared query cache answers a second run without changing it"""
+    program, funname, signature = CASES[name]
+    shared = Z3QueryCache()
+    runs = []
+    for _ in range(2):
+        context = Context(
+            FunctionCall(Name(funname), signature),
+            session=Z3Session(cache=shared),
+        )
+        runs.append(result_set(context.execute(program)))
+    assert runs[0] == runs[1] == result_set(explore(name))
+    assert shared.misses > 0 and shared.hits > 0
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_summaries_reused(name):
+    program, funname, signature = CASES[name]
+    summaries = FunctionSummaryCache()
+    context = Context(
+        FunctionCall(Name(funname), signature), session=Z3Session(), summaries=summaries
+    )
+    assert result_set(context.execute(program)) == result_set(explore(name))
+    assert summaries.misses >= 1
+
+
+@pytest.mark.parametrize("name", CASES)
+@pytest.mark.parametrize("strategy", ["dfs", "bfs", "random", "shortest"])
+def test_strategies_find_the_same_paths(name, strategy):
+    program, funname, signature = CASES[name]
+    found = scheduled_function_symbolic_execution(
+        program, funname, signature, strategy=strategy
+    )
+    assert found.complete
+    assert result_set(found.results) == result_set(explore(name))
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_streaming_finds_the_same_paths(name):
+    program, funname, signature = CASES[name]
+    streamed = list(iter_function_symbolic_execution(program, funname, signature))
+    assert result_set(streamed) == result_set(explore(name))
+
+
+def test_parallel_finds_the_same_paths():
+    program, funname, signature = CASES["independent"]
+    results = parallel_function_symbolic_execution(
+        program, funname, signature, max_workers=2
+    )
+    assert result_set(results) == result_set(explore("independent"))
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_jsonl_round_trip(name):
+    results = explore(name)
+    stream = io.StringIO()
+    assert write_jsonl(results, stream) == len(results)
+    stream.seek(0)
+    for line in stream.getvalue().splitlines():
+        # a repeated node would repeat its entry, children are referenced by index
+        nodes = json.loads(line)["nodes"]
+        assert len({json.dumps(n) for n in nodes}) == len(nodes)
+    stream.seek(0)
+    read = list(read_jsonl(stream))
+    assert [r.expr_eval for r in read] == [r.expr_eval for r in results]
+    assert [tuple(r.path_condition) for r in read] == [
+        tuple(r.path_condition) for r in results
+    ]
+
+
+@pytest.mark.parametrize("name", ["independent", "coupled", "disjoint"])
+@pytest.mark.parametrize("budget", [1, 10, 25])
+def test_solver_budget_bounds_every_check(name, budget, monkeypatch):
+    program, funname, signature = CASES[name]
+    calls = []
+    check = Z3Session.check
+
+    def counted(session, conditions=()):
+        # a check refused by the budget raises before solving anything
+        result = check(session, conditions)
+        calls.append(conditions)
+        return result
+
+    monkeypatch.setattr(Z3Session, "check", counted)
+    found = scheduled_function_symbolic_execution(
+        program, funname, signature, max_solver_calls=budget
+    )
+    assert not found.complete
+    assert found.solver_calls == len(calls) <= budget
@@ -0,0 +1,34 @@
+import pytest
+import z3
+from seereach.guards import GuardSimplifier, z3_to_symlang
+from seereach.lang import Operator, Type
+from seereach.symlang import SBinaryOp, SBoolean, SInteger, SReal, SVariable
+
+n = SVariable("n", Type.INTEGER)
+x = SVariable("x", Type.REAL)
+
+
+def test_implied_conjuncts_are_dropped():
+    guard = [
+        SBinaryOp(x, Operator.GREATER, SReal(1.0)),
+        SBinaryOp(x, Operator.GREATER, SReal(0.0)),
+    ]
+    assert GuardSimplifier().simplify(guard) == guard[:1]
+
+
+def test_integer_division_is_kept_opaque():
+    # n = 1 satisfies n / 2 > 0, but not with Z3's rounded quotient
+    half = SBinaryOp(n, Operator.DIV, SInteger(2))
+    guard = [
+        SBinaryOp(half, Operator.GREATER, SInteger(0)),
+        SBinaryOp(n, Operator.LESS, SInteger(2)),
+    ]
+    simplified = GuardSimplifier().simplify(guard)
+    assert simplified != [SBoolean(False)]
+    assert simplified[0].left is half
+
+
+def test_integer_division_is_not_converted_back():
+    term = z3.Int("n") / 2 > 0
+    with pytest.raises(ValueError):
+        z3_to_symlang(term, {"n": n})
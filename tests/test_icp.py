@@ -0,0 +1,252 @@
+import math
+import random
+import numpy as np
+import pytest
+import z3
+from seereach.icp import ICPChecker, ICPStatus, _root, _sin_inverse
+from seereach.intervals import Interval, interval_evaluate
+from seereach.lang import Name, Operator, Type
+from seereach.numeric import evaluate_conjunction
+from seereach.symlang import SBinaryOp, SInteger, SIte, SReal, SUnaryOp, SVariable
+from seereach.z3convert import Z3Session
+
+VARIABLES = [SVariable(Name(n), Type.REAL) for n in "abc"]
+BOUND = 4.0
+
+
+def random_term(rng: random.Random, depth: int):
+    if depth == 0 or rng.random() < 0.25:
+        if rng.random() < 0.7:
+            return rng.choice(VARIABLES)
+        return SReal(round(rng.uniform(-3.0, 3.0), 2))
+    r = rng.random()
+    if r < 0.1:
+        return SUnaryOp(Operator.SIN, random_term(rng, depth - 1))
+    if r < 0.15:
+        return SBinaryOp(
+            random_term(rng, depth - 1), Operator.POW, SInteger(rng.choice([2, 3]))
+        )
+    if r < 0.2:
+        return SIte(
+            random_condition(rng, depth - 1),
+            random_term(rng, depth - 1),
+            random_term(rng, depth - 1),
+        )
+    operator = rng.choice(
+        [Operator.ADD, Operator.SUB, Operator.MUL, Operator.MUL, Operator.DIV]
+    )
+    return SBinaryOp(random_term(rng, depth - 1), operator, random_term(rng, depth - 1))
+
+
+def random_condition(rng: random.Random, depth: int):
+    r = rng.random()
+    if depth > 0 and r < 0.1:
+        return SUnaryOp(Operator.NOT, random_condition(rng, depth - 1))
+    if depth > 0 and r < 0.2:
+        return SBinaryOp(
+            random_condition(rng, depth - 1),
+            rng.choice([Operator.AND, Operator.OR]),
+            random_condition(rng, depth - 1),
+        )
+    comparison = rng.choice(
+        [Operator.LESS, Operator.LESS_EQUAL, Operator.GREATER, Operator.GREATER_EQUAL]
+    )
+    return SBinaryOp(random_term(rng, depth), comparison, random_term(rng, depth))
+
+
+def test_random_nonlinear_conjunctions():
+    """UNSAT is never refuted by sampling, SAT witnesses hold within the bounds"""
+    rng = random.Random(1)
+    checker = ICPChecker({v.name: (-BOUND, BOUND) for v in VARIABLES}, max_boxes=2048)
+    samples = np.random.default_rng(0)
+    n = 200000
+    env = {v.name: samples.uniform(-BOUND, BOUND, n) for v in VARIABLES}
+    statuses = set()
+    for _ in range(400):
+        conditions = [random_condition(rng, 3) for _ in range(rng.randint(1, 4))]
+        result = checker.check(conditions)
+        statuses.add(result.status)
+        with np.errstate(all="ignore"):
+            if result.status == ICPStatus.UNSAT:
+                assert not evaluate_conjunction(conditions, env, n).any(), conditions
+            elif result.status == ICPStatus.SAT:
+                witness = {k: np.array([v]) for k, v in result.witness.items()}
+                assert evaluate_conjunction(conditions, witness, 1)[0], conditions
+                assert all(-BOUND <= v <= BOUND for v in result.witness.values())
+    assert {ICPStatus.SAT, ICPStatus.UNSAT} <= statuses
+
+
+def random_boxes(rng, n, width=10.0):
+    lo = rng.uniform(-width, width, n)
+    return Interval(lo, lo + rng.uniform(0.0, width, n))
+
+
+def sample(rng, box: Interval):
+    return box.lo + rng.uniform(0.0, 1.0, box.lo.shape) * (box.hi - box.lo)
+
+
+def assert_contains(box: Interval, points, where):
+    assert np.all((box.lo[where] <= points[where]) & (points[where] <= box.hi[where]))
+
+
+def test_sin_inverse_keeps_every_solution():
+    rng = np.random.default_rng(0)
+    a = random_boxes(rng, 2000)
+    target_lo = rng.uniform(-1.2, 1.0, 2000)
+    target = Interval(target_lo, target_lo + rng.uniform(0.0, 0.8, 2000))
+    projected = _sin_inverse(a, target)
+    assert np.all((projected.lo >= a.lo) | (projected.lo > projected.hi))
+    assert np.all((projected.hi <= a.hi) | (projected.lo > projected.hi))
+    for _ in range(50):
+        x = sample(rng, a)
+        inside = (np.sin(x) >= target.lo) & (np.sin(x) <= target.hi)
+        assert_contains(projected, x, inside)
+
+
+def test_sin_inverse_narrows():
+    # sin(x) >= 0.5 on [0, pi] leaves [pi / 6, 5 pi / 6]
+    projected = _sin_inverse(Interval(0.0, math.pi), Interval(0.5, 1.0))
+    assert projected.lo == pytest.approx(math.pi / 6)
+    assert projected.hi == pytest.approx(5 * math.pi / 6)
+    # no solution
+    projected = _sin_inverse(Interval(0.0, 1.0), Interval(-1.0, -0.5))
+    assert projected.lo > projected.hi
+
+
+@pytest.mark.parametrize("n", [2, 3, 4])
+def test_root_keeps_every_solution(n):
+    rng = np.random.default_rng(n)
+    a = random_boxes(rng, 2000, width=3.0)
+    target_lo = rng.uniform(-20.0, 20.0, 2000)
+    target = Interval(target_lo, target_lo + rng.uniform(0.0, 20.0, 2000))
+    projected = _root(target, n, a)
+    for _ in range(50):
+        x = sample(rng, a)
+        inside = (x**n >= target.lo) & (x**n <= target.hi)
+        assert_contains(projected, x, inside)
+
+
+def test_root_picks_the_branch():
+    target = Interval(4.0, 9.0)
+    positive = _root(target, 2, Interval(0.0, 10.0))
+    assert (positive.lo, positive.hi) == (2.0, 3.0)
+    negative = _root(target, 2, Interval(-10.0, 0.0))
+    assert (negative.lo, negative.hi) == (-3.0, -2.0)
+    cube = _root(Interval(-8.0, 27.0), 3, Interval(-10.0, 10.0))
+    assert cube.lo == pytest.approx(-2.0) and cube.hi == pytest.approx(3.0)
+
+
+@pytest.mark.parametrize(
+    "operator, holds",
+    [
+        (Operator.LESS, np.less),
+        (Operator.LESS_EQUAL, np.less_equal),
+        (Operator.GREATER, np.greater),
+        (Operator.GREATER_EQUAL, np.greater_equal),
+    ],
+)
+@pytest.mark.parametrize("truth", [1.0, 0.0])
+def test_comparison_projection(operator, holds, truth):
+    rng = np.random.default_rng(0)
+    x, y = VARIABLES[:2]
+    node = SBinaryOp(x, operator, y)
+    values = {x: random_boxes(rng, 2000), y: random_boxes(rng, 2000)}
+    targets = {}
+    ICPChecker._project(node, Interval(np.full(2000, truth)), values, targets)
+    for _ in range(50):
+        xs, ys = sample(rng, values[x]), sample(rng, values[y])
+        inside = holds(xs, ys) == bool(truth)
+        assert_contains(targets[x], xs, inside)
+        assert_contains(targets[y], ys, inside)
+    # x < y with x in [0, 10] and y in [2, 5] leaves x in [0, 5] and y in [2, 5]
+    targets = {}
+    values = {x: Interval(0.0, 10.0), y: Interval(2.0, 5.0)}
+    ICPChecker._project(SBinaryOp(x, Operator.LESS, y), Interval(1.0), values, targets)
+    assert targets[x].hi == 5.0 and targets[y].lo == 0.0
+
+
+def test_ite_projection():
+    rng = np.random.default_rng(0)
+    c, t, f = SVariable("c", Type.BOOLEAN), VARIABLES[0], VARIABLES[1]
+    node = SIte(c, t, f)
+    n = 2000
+    truth_lo = rng.integers(0, 2, n).astype(float)
+    truth_hi = np.maximum(truth_lo, rng.integers(0, 2, n))
+    values = {
+        c: Interval(truth_lo, truth_hi),
+        t: random_boxes(rng, n),
+        f: random_boxes(rng, n),
+    }
+    value = random_boxes(rng, n)
+    targets = {}
+    ICPChecker._project(node, value, values, targets)
+    for _ in range(50):
+        cs = rng.uniform(truth_lo, truth_hi + 1.0) >= 1.0
+        cs = np.where(truth_lo == truth_hi, truth_lo == 1.0, cs)
+        ts, fs = sample(rng, values[t]), sample(rng, values[f])
+        result = np.where(cs, ts, fs)
+        inside = (value.lo <= result) & (result <= value.hi)
+        assert_contains(targets[c], cs.astype(float), inside)
+        assert_contains(targets[t], ts, inside)
+        assert_contains(targets[f], fs, inside)
+
+
+def test_ite_projection_narrows():
+    c, t, f = SVariable("c", Type.BOOLEAN), VARIABLES[0], VARIABLES[1]
+    node = SIte(c, t, f)
+    values = {c: Interval(0.0, 1.0), t: Interval(0.0, 1.0), f: Interval(5.0, 6.0)}
+    targets = {}
+    # only the true branch reaches [0, 2]
+    ICPChecker._project(node, Interval(0.0, 2.0), values, targets)
+    assert (targets[c].lo, targets[c].hi) == (1.0, 1.0)
+    values[c] = Interval(1.0, 1.0)
+    targets = {}
+    ICPChecker._project(node, Interval(0.5, 2.0), values, targets)
+    assert (targets[t].lo, targets[t].hi) == (0.5, 2.0)
+
+
+def equal(left, right):
+    return SBinaryOp(left, Operator.EQUAL, right)
+
+
+def test_decimal_constants_are_enclosed():
+    # 0.1 + 0.2 == 0.3 in the reals z3 reads the constants as, not in floating point
+    x, y = VARIABLES[:2]
+    checker = ICPChecker({v.name: (-1.0, 1.0) for v in VARIABLES})
+    conditions = [
+        equal(SBinaryOp(x, Operator.ADD, y), SReal(0.3)),
+        equal(x, SReal(0.1)),
+        equal(y, SReal(0.2)),
+    ]
+    assert checker.check(conditions).status != ICPStatus.UNSAT
+    square = SBinaryOp(x, Operator.MUL, x)
+    conditions = [equal(x, SReal(0.1)), equal(square, SReal(0.01))]
+    assert checker.check(conditions).status != ICPStatus.UNSAT
+    # clearly infeasible conjunctions are still refuted
+    conditions = [equal(x, SReal(0.1)), equal(square, SReal(0.02))]
+    assert checker.check(conditions).status == ICPStatus.UNSAT
+
+
+def test_outward_evaluation_encloses_decimals():
+    x = VARIABLES[0]
+    expr = SBinaryOp(SBinaryOp(x, Operator.MUL, x), Operator.SUB, SReal(0.01))
+    value = interval_evaluate(expr, {x.name: Interval(0.1)}, outward=True)
+    assert value.lo < 0.0 < value.hi
+    # without it, the float enclosure misses the exact value 0
+    plain = interval_evaluate(expr, {x.name: Interval(0.1)})
+    assert plain.lo == plain.hi > 0.0
+
+
+def test_session_leaves_exact_unsat_to_z3():
+    x = VARIABLES[0]
+    square = SBinaryOp(x, Operator.MUL, x)
+    for prefilter in (None, ICPChecker({x.name: (-1.0, 1.0)})):
+        session = Z3Session(prefilter=prefilter)
+        session.push(equal(x, SReal(0.1)))
+        session.push(equal(square, SReal(0.01)))
+        assert session.is_sat
+    # z3 has every condition, so it answers even where propagation refutes the query
+    session.pop()
+    assert session.check([equal(square, SReal(0.02))]) == z3.unsat
+    query = frozenset((equal(x, SReal(0.1)), equal(square, SReal(0.02))))
+    assert prefilter.answers and session.cache.results[query] == z3.unsat
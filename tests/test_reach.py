@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from seereach.fanalysis import function_symbolic_execution
+from seereach.intervals import Interval, interval_evaluate
+from seereach.lang import Operator, Type
+from seereach.parser import SReachParser
+from seereach.reach import ReachabilityAnalysis
+from seereach.simulate import HybridSimulator
+from seereach.symlang import SBinaryOp, SReal, SUnaryOp, SVariable
+from tests.programs import PENDULUM
+
+STATE = ["theta", "omega"]
+# gains that saturate the controller, so the sets meet several modes
+GAINS = {"kp": 4.0, "kd": 1.0}
+
+
+def sample(rng, lo, hi, shape):
+    return lo + rng.uniform(0.0, 1.0, shape) * (hi - lo)
+
+
+def test_sin_encloses_samples():
+    rng = np.random.default_rng(0)
+    lo = rng.uniform(-10.0, 10.0, 5000)
+    hi = lo + rng.exponential(1.0, 5000)
+    enclosure = Interval(lo, hi).sin()
+    for _ in range(50):
+        values = np.sin(sample(rng, lo, hi, lo.shape))
+        assert np.all((enclosure.lo <= values) & (values <= enclosure.hi))
+    # the extrema inside an interval are reached
+    peak = Interval(0.0, 2.0).sin()
+    assert peak.hi == 1.0 and peak.lo == 0.0
+
+
+def test_interval_evaluate_encloses_samples():
+    x, y = SVariable("x", Type.REAL), SVariable("y", Type.REAL)
+    expr = SBinaryOp(
+        SUnaryOp(Operator.SIN, SBinaryOp(x, Operator.MUL, y)),
+        Operator.DIV,
+        SBinaryOp(SReal(2.0), Operator.ADD, SBinaryOp(x, Operator.MUL, x)),
+    )
+    rng = np.random.default_rng(1)
+    lo = {n: rng.uniform(-3.0, 3.0, 2000) for n in "xy"}
+    hi = {n: lo[n] + rng.uniform(0.0, 2.0, 2000) for n in "xy"}
+    enclosure = interval_evaluate(expr, {n: Interval(lo[n], hi[n]) for n in "xy"})
+    for _ in range(50):
+        xs, ys = (sample(rng, lo[n], hi[n], 2000) for n in "xy")
+        values = np.sin(xs * ys) / (2.0 + xs * xs)
+        assert np.all((enclosure.lo <= values) & (values <= enclosure.hi))
+
+
+@pytest.mark.parametrize("method", ["zonotope", "interval"])
+def test_trajectories_stay_in_the_flowpipe(method):
+    results = function_symbolic_execution(
+        SReachParser.parse(PENDULUM), "pendulum_dynamics"
+    )
+    lower = np.array([[0.4, -0.1], [1.5, 0.0], [-1.0, 0.5]])
+    upper = lower + 0.05
+    step, t_final = 0.05, 1.0
+    reach = ReachabilityAnalysis(results, STATE, method=method).reach(
+        lower, upper, t_final, step, **GAINS
+    )
+    assert not reach.escaped.any()
+    rng = np.random.default_rng(2)
+    simulator = HybridSimulator(results, STATE)
+    for i in range(len(lower)):
+        x0 = sample(rng, lower[i], upper[i], (200, 2))
+        # corners too
+        x0 = np.concatenate([x0, lower[i : i + 1], upper[i : i + 1]])
+        simulation = simulator.simulate(x0, t_final, step / 10, **GAINS)
+        assert len(simulation.times) == 10 * (len(reach.times) - 1) + 1
+        for k in range(len(reach.times) - 1):
+            # the states over step k, at the output times within it
+            states = simulation.states[10 * k : 10 * k + 11]
+            assert np.all(reach.lower[k, i] - 1e-9 <= states)
+            assert np.all(states <= reach.upper[k, i] + 1e-9)
+        final_lower, final_upper = reach.final_box()
+        final = simulation.states[-1]
+        assert np.all(final_lower[i] - 1e-9 <= final)
+        assert np.all(final <= final_upper[i] + 1e-9)
+    assert reach.modes.any(axis=(0, 1)).sum() >= 2
@@ -0,0 +1,48 @@
+import pytest
+from seereach.lang import Name, Operator, Type
+from seereach.result import EMPTY_PATH_CONDITION, PathCondition
+from seereach.symlang import SBinaryOp, SReal, SVariable
+
+x = SVariable(Name("x"), Type.REAL)
+a, b, c, d = (SBinaryOp(x, Operator.LESS, SReal(float(i))) for i in range(4))
+
+
+def test_append_shares_tail():
+    base = PathCondition.of([a, b])
+    left, right = base.append(c), base.append(d)
+    assert left.parent is base and right.parent is base
+    assert list(left) == [a, b, c] and list(right) == [a, b, d]
+
+
+def test_add_shares_extension():
+    base = PathCondition.of([a, b])
+    extended = base.append(c)
+    assert base + extended is extended
+    assert extended + base is extended
+    assert EMPTY_PATH_CONDITION + base is base
+    assert base + [] is base
+
+
+def test_add_does_not_repeat_conjuncts():
+    left = PathCondition.of([a, b])
+    right = PathCondition.of([b, c])
+    joined = left + right
+    assert list(joined) == [a, b, c]
+    assert joined.prefix(2) is left
+
+
+def test_getitem_walks_chain():
+    pc = PathCondition.of([a, b, c, d])
+    assert [pc[i] for i in range(4)] == [a, b, c, d]
+    assert pc[-1] is d and pc[-4] is a
+    assert pc[1:3] == (b, c)
+    with pytest.raises(IndexError):
+        pc[4]
+    with pytest.raises(IndexError):
+        pc[-5]
+
+
+def test_equality_and_hash():
+    assert PathCondition.of([a, b]) == PathCondition.of([a, b])
+    assert hash(PathCondition.of([a, b])) == hash(PathCondition.of([a, b]))
+    assert PathCondition.of([a, b]) != PathCondition.of([b, a])
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from seereach.fanalysis import function_symbolic_execution
+from seereach.parser import SReachParser
+from seereach.simulate import HybridSimulator
+from tests.programs import PENDULUM
+
+# x' = x below 1 and x' = 2 x above: from x0 the switch is at ln(1 / x0)
+GROWTH = """
+fn growth(x: real) -> real {
+    if x < 1.0 {
+        return x
+    } else {
+        return 2.0 * x
+    }
+}
+"""
+
+
+def pendulum():
+    program = SReachParser.parse(PENDULUM)
+    return function_symbolic_execution(program, "pendulum_dynamics")
+
+
+def initial_states(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-2.0, 2.0, (n, 2))
+
+
+@pytest.mark.parametrize("method", ["rk4", "dopri5"])
+def test_switching_time(method):
+    results = function_symbolic_execution(SReachParser.parse(GROWTH), "growth")
+    x0 = np.linspace(0.3, 0.9, 7)
+    simulation = HybridSimulator(results, ["x"], method=method).simulate(
+        x0[:, None], 2.0, 0.05
+    )
+    switch = np.log(1.0 / x0)
+    events = simulation.events
+    assert len(events) == len(x0)
+    order = np.argsort(events.trajectory)
+    np.testing.assert_allclose(events.time[order], switch, rtol=1e-5)
+    np.testing.assert_allclose(events.state[order, 0], 1.0, rtol=1e-5)
+    np.testing.assert_allclose(
+        simulation.states[-1, :, 0], np.exp(2 * (2.0 - switch)), rtol=1e-4
+    )
+
+
+def test_rk4_agrees_with_dopri5():
+    results = pendulum()
+    # gains that saturate the controller, so trajectories switch
+    gains = {"kp": 4.0, "kd": 1.0}
+    x0 = initial_states()
+    fixed = HybridSimulator(results, ["theta", "omega"], method="rk4").simulate(
+        x0, 3.0, 0.01, **gains
+    )
+    adaptive = HybridSimulator(
+        results, ["theta", "omega"], method="dopri5", rtol=1e-9, atol=1e-12
+    ).simulate(x0, 3.0, 0.01, **gains)
+    assert len(fixed.events) > 0
+    np.testing.assert_allclose(fixed.states, adaptive.states, atol=1e-5)
+    np.testing.assert_array_equal(fixed.modes[-1], adaptive.modes[-1])
+
+
+@pytest.mark.parametrize("method", ["rk4", "dopri5"])
+def test_batch_agrees_with_single_states(method):
+    simulator = HybridSimulator(pendulum(), ["theta", "omega"], method=method)
+    x0 = initial_states(8, seed=1)
+    kp = np.linspace(0.5, 6.0, len(x0))
+    batch = simulator.simulate(x0, 2.0, 0.05, kp=kp, kd=0.2)
+    assert len(batch.events) > 0
+    for i, state in enumerate(x0):
+        single = simulator.simulate(state[None, :], 2.0, 0.05, kp=kp[i], kd=0.2)
+        np.testing.assert_allclose(batch.states[:, i], single.states[:, 0])
+        np.testing.assert_array_equal(batch.modes[:, i], single.modes[:, 0])
+        mine = batch.events.trajectory == i
+        np.testing.assert_allclose(batch.events.time[mine], single.events.time)
@@ -0,0 +1,69 @@
+from seereach.compile import compile_program
+from seereach.context import Context
+from seereach.lang import FunctionCall, Name, Type
+from seereach.parser import SReachParser
+from seereach.summary import FunctionSummaryCache
+from seereach.symlang import SVariable
+from seereach.z3convert import Z3Session
+
+CALLER = """
+fn main(x: real) -> real {
+    let y: real = f(x);
+    return y
+}
+"""
+
+DOUBLE = """
+fn f(x: real) -> real {
+    return 2.0 * x
+}
+"""
+
+CLAMP = """
+fn f(x: real) -> real {
+    if x > 0.0 {
+        return x
+    } else {
+        return 0.0
+    }
+}
+"""
+
+
+def run(program, summaries=None):
+    context = Context(
+        FunctionCall(Name("main"), [SVariable("x", Type.REAL)]),
+        session=Z3Session(),
+        summaries=summaries,
+    )
+    return {r.expr_eval for r in context.execute(program)}
+
+
+def test_functions_of_the_same_name_do_not_share_summaries():
+    summaries = FunctionSummaryCache()
+    double = SReachParser.parse(CALLER + DOUBLE)
+    clamp = SReachParser.parse(CALLER + CLAMP)
+    assert run(double, summaries) == run(double)
+    assert run(clamp, summaries) == run(clamp)
+    assert len(run(clamp)) == 2
+
+
+def test_compiled_program_shares_summaries():
+    summaries = FunctionSummaryCache()
+    program = SReachParser.parse(CALLER + CLAMP)
+    run(program, summaries)
+    misses = summaries.misses
+    run(compile_program(program), summaries)
+    assert summaries.misses == misses
+
+
+def test_key_fields():
+    summaries = FunctionSummaryCache()
+    program = SReachParser.parse(CALLER + CLAMP)
+    run(program, summaries)
+    (key,) = [k for k in summaries.summaries if k.function.name == "f"]
+    assert key.function is program.functions["f"]
+    assert key.merge is False
+    assert key.arguments == (
+        FunctionSummaryCache.placeholder(key.function, key.function.parameters[0]),
+    )
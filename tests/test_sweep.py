@@ -0,0 +1,31 @@
+import numpy as np
+import z3
+from seereach.parser import SReachParser
+from seereach.sweep import ParameterSweep
+from tests.programs import PENDULUM
+
+
+def sweep():
+    program = SReachParser.parse(PENDULUM)
+    return ParameterSweep(program, "controller", ["kp", "kd"])
+
+
+def test_feasible_modes():
+    gains = np.array([[1.0, 0.2], [0.0, 0.0], [0.0, 1.0]])
+    feasible = sweep().feasible(gains)
+    assert feasible.shape == (3, 3)
+    # without gains the controller output is 0, so only the unsaturated mode remains
+    assert feasible[1].sum() == 1
+    assert feasible[0].all() and feasible[2].all()
+
+
+def test_unknown_keeps_the_rows():
+    analysis = sweep()
+    gains = np.array([[1.0, 0.2], [1.0, 0.2], [0.0, 0.0]])
+    analysis.session.model = lambda conditions=(): (z3.unknown, None)
+    feasible = analysis.feasible(gains)
+    assert feasible[:2].all()
+    # the conditions fold to false without gains, the solver is not asked
+    assert feasible[2].sum() == 1
+    # two rows per mode with gains, and the unsaturated mode without them
+    assert analysis.undecided == 7
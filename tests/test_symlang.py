@@ -0,0 +1,26 @@
+import pickle
+from seereach.lang import Name, Operator, Type
+from seereach.symlang import SBinaryOp, SInteger, SReal, STuple, SVariable
+
+x = SVariable(Name("x"), Type.REAL)
+y = SVariable(Name("y"), Type.REAL)
+
+
+def test_nodes_are_interned():
+    assert SBinaryOp(x, Operator.ADD, y) is SBinaryOp(x, Operator.ADD, y)
+    assert SVariable(Name("x"), Type.REAL) is x
+    assert SReal(1.0) is not SInteger(1)
+
+
+def test_tuple_is_not_changed_through_the_callers_list():
+    elements = [x, y]
+    t = STuple(elements)
+    elements.append(SReal(1.0))
+    assert t.elements == (x, y)
+    assert STuple([x, y]) is t
+    assert STuple((x, y)) is t
+
+
+def test_pickle_keeps_interning():
+    t = STuple([x, SBinaryOp(x, Operator.MUL, y)])
+    assert pickle.loads(pickle.dumps(t)) is t
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+import sympy
+from seereach.lang import Operator, Type
+from seereach.numeric import evaluate
+from seereach.symlang import SBinaryOp, SIte, SReal, SUnaryOp, SVariable
+from seereach.sympyconvert import SymPyConverter
+
+x = SVariable("x", Type.REAL)
+y = SVariable("y", Type.REAL)
+z = SVariable("z", Type.REAL)
+w = SVariable("w", Type.REAL)
+
+
+def less(left, right):
+    return SBinaryOp(left, Operator.LESS, right)
+
+
+def variables(expr):
+    """the names of the variables of a SymLang expression"""
+    if isinstance(expr, SVariable):
+        return {expr.name}
+    if isinstance(expr, SBinaryOp):
+        return variables(expr.left) | variables(expr.right)
+    if isinstance(expr, SUnaryOp):
+        return variables(expr.expression)
+    if isinstance(expr, SIte):
+        return (
+            variables(expr.condition)
+            | variables(expr.true_value)
+            | variables(expr.false_value)
+        )
+    return set()
+
+
+def samples(n=100):
+    rng = np.random.default_rng(0)
+    return {v.name: rng.uniform(-2.0, 2.0, n) for v in (x, y, z, w)}
+
+
+@pytest.mark.parametrize("nary", [sympy.Add, sympy.Mul])
+def test_nary_terms_keep_every_argument(nary):
+    converter = SymPyConverter()
+    symbols = [converter.symbol(v) for v in (x, y, z, w)]
+    expr = nary(*symbols)
+    assert len(expr.args) == 4
+    converted = converter.from_sympy(expr)
+    assert variables(converted) == {"x", "y", "z", "w"}
+    env = samples()
+    expected = sympy.lambdify(symbols, expr)(*(env[v.name] for v in (x, y, z, w)))
+    assert np.allclose(evaluate(converted, env), expected)
+    assert converter.to_sympy(converted) == expr
+
+
+@pytest.mark.parametrize(
+    "nary, operator", [(sympy.And, Operator.AND), (sympy.Or, Operator.OR)]
+)
+def test_nary_conditions_keep_every_argument(nary, operator):
+    converter = SymPyConverter()
+    conditions = [less(v, SReal(float(i))) for i, v in enumerate((x, y, z, w))]
+    expr = nary(*(converter.to_sympy(c) for c in conditions))
+    assert len(expr.args) == 4
+    converted = converter.from_sympy(expr)
+    assert variables(converted) == {"x", "y", "z", "w"}
+    env = samples()
+    values = [evaluate(c, env) for c in conditions]
+    combine = np.logical_and if operator == Operator.AND else np.logical_or
+    assert np.array_equal(evaluate(converted, env), combine.reduce(values))
+    assert converter.to_sympy(converted) == expr
+
+
+def test_chains_convert_to_nary_sympy():
+    converter = SymPyConverter()
+    chain = SBinaryOp(
+        SBinaryOp(SBinaryOp(x, Operator.ADD, y), Operator.ADD, z), Operator.ADD, w
+    )
+    converted = converter.to_sympy(chain)
+    assert isinstance(converted, sympy.Add) and len(converted.args) == 4
+
+
+@pytest.mark.parametrize("variable_type", [Type.REAL, Type.INTEGER, Type.BOOLEAN])
+def test_variable_types_survive_the_round_trip(variable_type):
+    converter = SymPyConverter()
+    variable = SVariable("v", variable_type)
+    assert converter.from_sympy(converter.to_sympy(variable)) is variable
+    # a fresh converter can only guess from the symbol
+    assert SymPyConverter().from_sympy(sympy.Symbol("v")).name == "v"
+
+
+def test_ite_and_piecewise():
+    converter = SymPyConverter()
+    ite = SIte(less(x, SReal(0.5)), y, SBinaryOp(y, Operator.POW, SReal(2.0)))
+    piecewise = converter.to_sympy(ite)
+    assert isinstance(piecewise, sympy.Piecewise)
+    assert converter.from_sympy(piecewise) is ite
+    # more pieces nest in front of the last one
+    a, b = converter.symbol(x), converter.symbol(y)
+    pieces = sympy.Piecewise((1.0, a < 0.5), (2.0, b < 0.5), (3.0, True))
+    nested = converter.from_sympy(pieces)
+    assert nested is SIte(
+        less(x, SReal(0.5)),
+        SReal(1.0),
+        SIte(less(y, SReal(0.5)), SReal(2.0), SReal(3.0)),
+    )
+    env = samples()
+    expected = np.where(env["x"] < 0.5, 1.0, np.where(env["y"] < 0.5, 2.0, 3.0))
+    assert np.array_equal(evaluate(nested, env), expected)
+
+
+def memo_size(expr):
+    """the number of distinct non-number subterms of a sympy expression"""
+    return len({e for e in sympy.preorder_traversal(expr) if not e.is_Number})
+
+
+def test_memo_is_reused_across_calls():
+    converter = SymPyConverter()
+    shared = SBinaryOp(SUnaryOp(Operator.SIN, x), Operator.MUL, y)
+    first = converter.to_sympy(SBinaryOp(shared, Operator.SUB, z))
+    memo = dict(converter._to_memo)
+    assert converter.to_sympy(shared) is memo[shared]
+    second = converter.to_sympy(SBinaryOp(shared, Operator.DIV, z))
+    assert set(converter._to_memo) - set(memo) == {SBinaryOp(shared, Operator.DIV, z)}
+    assert first.has(memo[shared]) and second.has(memo[shared])
+    back = converter.from_sympy(first)
+    assert converter.from_sympy(first) is back
+    assert len(converter._from_memo) == memo_size(first)
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from seereach.lang import Operator, Type
+from seereach.parser import SReachParser
+from seereach.symlang import SBinaryOp, SInteger, SReal, SVariable
+from seereach import testgen
+from tests.programs import INDEPENDENT, PENDULUM, cases
+
+PER_MODE = 5
+
+
+def generator(name, **kwargs):
+    (case,) = [c for c in cases() if c[0] == name]
+    _, program, funname, signature = case
+    return testgen.TestGenerator(
+        program, funname, signature_params=signature, per_mode=PER_MODE, **kwargs
+    )
+
+
+@pytest.mark.parametrize("name", ["controller", "pendulum", "coupled", "disjoint"])
+def test_vectors_per_mode(name):
+    tests = generator(name)
+    vectors = tests.generate(max_workers=1)
+    counts = np.bincount(vectors.modes, minlength=len(tests.results))
+    assert counts.tolist() == [PER_MODE] * len(tests.results)
+    assert vectors.inputs.shape == (len(vectors), len(tests.names))
+    assert tests.replay(vectors).all()
+
+
+def test_literal_arguments_are_fixed():
+    vectors = generator("controller").generate(max_workers=1)
+    assert np.all(vectors.inputs[:, 2] == 1.0) and np.all(vectors.inputs[:, 3] == 0.2)
+
+
+def test_worker_processes():
+    tests = generator("controller")
+    vectors = tests.generate(max_workers=2)
+    assert np.bincount(vectors.modes).tolist() == [PER_MODE] * 3
+    assert tests.replay(vectors).all()
+
+
+def test_replay_rejects_wrong_modes():
+    tests = generator("controller")
+    vectors = tests.generate(max_workers=1)
+    shuffled = testgen.TestVectors(
+        vectors.names, vectors.inputs, (vectors.modes + 1) % 3
+    )
+    assert not tests.replay(shuffled).any()
+    # at the origin only the unsaturated mode's guard holds
+    inputs = vectors.inputs.copy()
+    inputs[:, :2] = 0.0
+    landed = tests.replay(testgen.TestVectors(vectors.names, inputs, vectors.modes))
+    (unsaturated,) = [
+        m for m, r in enumerate(tests.results) if not isinstance(r.expr_eval, SReal)
+    ]
+    assert landed.tolist() == (vectors.modes == unsaturated).tolist()
+
+
+def test_blocking_clauses_spread_the_inputs():
+    x = SVariable("x", Type.REAL)
+    conditions = [
+        SBinaryOp(SReal(0.0), Operator.LESS, x),
+        SBinaryOp(x, Operator.LESS, SReal(10.0)),
+    ]
+    rows = testgen.generate_inputs(conditions, [x], 20)
+    assert rows.shape == (20, 1)
+    assert np.all((0.0 < rows) & (rows < 10.0))
+    assert len(np.unique(rows)) == 20
+    # the first models are at least a box width apart
+    first = np.sort(rows[:5, 0])
+    assert np.all(np.diff(first) >= 0.1)
+
+
+def test_blocking_clauses_shrink_to_the_models():
+    i = SVariable("i", Type.INTEGER)
+    conditions = [
+        SBinaryOp(SInteger(0), Operator.LESS_EQUAL, i),
+        SBinaryOp(i, Operator.LESS_EQUAL, SInteger(3)),
+    ]
+    rows = testgen.generate_inputs(conditions, [i], 10, spread=2.0)
+    assert sorted(rows[:, 0].tolist()) == [0.0, 1.0, 2.0, 3.0]
+    assert testgen.generate_inputs(
+        conditions + [SBinaryOp(i, Operator.LESS, SInteger(0))], [i], 3
+    ).shape == (0, 1)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".npz"])
+def test_save_load_round_trip(tmp_path, suffix):
+    program = SReachParser.parse(INDEPENDENT)
+    tests = testgen.TestGenerator(program, "plant", per_mode=2)
+    vectors = tests.generate(max_workers=1)
+    path = tmp_path / f"vectors{suffix}"
+    vectors.save(str(path))
+    loaded = testgen.TestVectors.load(str(path))
+    assert loaded.names == ["a", "b", "c", "d"]
+    assert np.array_equal(loaded.modes, vectors.modes)
+    assert np.array_equal(loaded.inputs, vectors.inputs)
+    assert tests.replay(loaded).all()
+
+
+def test_csv_with_one_vector(tmp_path):
+    vectors = testgen.TestVectors(["x"], np.array([[0.1]]), np.array([2]))
+    path = str(tmp_path / "one.csv")
+    vectors.save(path)
+    loaded = testgen.TestVectors.load(path)
+    assert loaded.inputs.tolist() == [[0.1]] and loaded.modes.tolist() == [2]
+
+
+def test_arguments_must_be_variables_or_constants():
+    program = SReachParser.parse(PENDULUM)
+    theta = SVariable("theta", Type.REAL)
+    signature = [SBinaryOp(theta, Operator.MUL, SReal(2.0))] + [
+        SVariable(n, Type.REAL) for n in ("omega", "kp", "kd")
+    ]
+    with pytest.raises(ValueError):
+        testgen.TestGenerator(
+            program, "controller", results=[], signature_params=signature
+        )
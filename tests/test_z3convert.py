@@ -0,0 +1,195 @@
+import pytest
+import z3
+from seereach.icp import ICPChecker
+from seereach.lang import Operator, Type
+from seereach.symlang import SBinaryOp, SBoolean, SReal, SUnaryOp, SVariable
+from seereach.z3convert import Z3QueryCache, Z3SatConverter, Z3Session
+
+x = SVariable("x", Type.REAL)
+y = SVariable("y", Type.REAL)
+
+
+def less(left, right):
+    return SBinaryOp(left, Operator.LESS, right)
+
+
+def test_cache_answers_supersets_of_unsat_queries():
+    session = Z3Session()
+    cache = session.cache
+    core = frozenset((less(x, SReal(0.0)), less(SReal(1.0), x)))
+    cache.store(core, z3.unsat)
+    query = core | {less(y, SReal(0.0))}
+    assert cache.lookup(query, session.term) == z3.unsat
+    assert cache.subset_hits == 1
+    assert cache.lookup(frozenset((less(y, SReal(0.0)),)), session.term) is None
+
+
+def test_unsat_index_follows_eviction():
+    session = Z3Session()
+    cache = Z3QueryCache(max_entries=2)
+    queries = [
+        frozenset((less(x, SReal(float(i))), less(SReal(float(i + 1)), x)))
+        for i in range(4)
+    ]
+    for query in queries:
+        cache.store(query, z3.unsat)
+    assert list(cache.unsat) == queries[2:]
+    indexed = [q for qs in cache._unsat_index.values() for q in qs]
+    assert sorted(indexed, key=queries.index) == queries[2:]
+    assert cache.lookup(queries[0], session.term) is None
+    assert cache.lookup(queries[3], session.term) == z3.unsat
+
+
+def test_cache_answers_from_models():
+    session = Z3Session()
+    cache = session.cache
+    query = frozenset((less(x, SReal(0.0)),))
+    solver = z3.Solver()
+    solver.add(session.term(less(x, SReal(0.0))), session.term(less(y, SReal(0.0))))
+    assert solver.check() == z3.sat
+    cache.store(query, z3.sat, solver.model())
+    wider = query | {less(y, SReal(1.0))}
+    assert cache.lookup(wider, session.term) == z3.sat
+    assert cache.model_hits == 1
+
+
+def test_path_follows_push_and_pop():
+    session = Z3Session()
+    session.push(less(x, SReal(0.0)))
+    session.push(less(y, SReal(0.0)))
+    assert session._paths[-1] == frozenset(session.frames)
+    assert session.check([less(SReal(1.0), y)]) == z3.unsat
+    session.pop()
+    assert session._paths[-1] == frozenset(session.frames)
+    assert session.check([less(SReal(1.0), y)]) == z3.sat
+    session.pop()
+    assert session._paths == [frozenset()]
+
+
+def test_groups_undo_on_pop():
+    session = Z3Session()
+    groups = session.groups
+    session.push(less(x, SReal(0.0)))
+    session.push(less(y, SReal(0.0)))
+    assert groups.find(x.name) != groups.find(y.name)
+    session.push(less(x, y))
+    assert groups.find(x.name) == groups.find(y.name)
+    assert groups.group(groups.roots({x.name})) == frozenset(session.frames)
+    session.pop()
+    assert groups.find(x.name) != groups.find(y.name)
+    assert groups.group(groups.roots({y.name})) == {less(y, SReal(0.0))}
+    session.pop()
+    session.pop()
+    assert groups.parent == {} and groups.members == {}
+
+
+def test_pushed_conditions_are_checked():
+    session = Z3Session()
+    session.push(less(x, SReal(0.0)))
+    session.push(less(y, SReal(0.0)))
+    assert session.is_sat
+    session.push(less(SReal(1.0), x))
+    assert session.check() == z3.unsat
+    session.pop()
+    assert session.check([less(x, y)]) == z3.sat
+    assert session.check([less(SReal(1.0), x), less(x, y)]) == z3.unsat
+
+
+def test_check_solves_the_touched_group():
+    session = Z3Session()
+    for v in (x, y):
+        session.push(less(v, SReal(0.0)))
+    assert session.is_sat
+    misses = session.cache.misses
+    assert session.check([less(SReal(-1.0), y)]) == z3.sat
+    assert session.cache.misses == misses + 1
+    assert (
+        frozenset((less(y, SReal(0.0)), less(SReal(-1.0), y))) in session.cache.results
+    )
+
+
+def sin(e):
+    return SUnaryOp(Operator.SIN, e)
+
+
+def test_opaque_conditions_raise_without_a_prefilter():
+    with pytest.raises(ValueError):
+        Z3Session().check([less(sin(x), SReal(0.5))])
+
+
+def test_model_keeps_opaque_conditions():
+    session = Z3Session(prefilter=ICPChecker({"x": (-4.0, 4.0)}))
+    session.push(less(SReal(2.0), sin(x)))
+    assert session.check() == z3.unsat
+    with pytest.raises(ValueError):
+        session.model()
+    session.pop()
+    with pytest.raises(ValueError):
+        session.model([less(SReal(2.0), sin(x))])
+
+
+def test_relaxed_sat_is_not_cached():
+    # propagation gives up, z3 only sees 0 < x
+    prefilter = ICPChecker({"x": (-4.0, 4.0)}, max_boxes=1)
+    session = Z3Session(prefilter=prefilter)
+    query = [less(SReal(0.0), x), less(SReal(0.5), sin(x))]
+    assert session.check(query) == z3.sat
+    assert frozenset(query) not in session.cache.results
+    assert session.check(query) == z3.sat
+    assert prefilter.hits == 1
+
+
+def test_prefilter_decides_nonlinear_queries_only():
+    prefilter = ICPChecker({"x": (-4.0, 4.0), "y": (-4.0, 4.0)})
+    session = Z3Session(prefilter=prefilter)
+    assert session.check([less(x, y), less(y, x)]) == z3.unsat
+    assert prefilter.answers == {}
+    square = SBinaryOp(x, Operator.MUL, x)
+    assert session.check([less(square, SReal(-1.0))]) == z3.unsat
+    assert len(prefilter.answers) == 1
+
+
+def test_nonlinear_terms():
+    session = Z3Session()
+    two = SReal(2.0)
+    assert not session.is_nonlinear(less(SBinaryOp(two, Operator.MUL, x), y))
+    assert not session.is_nonlinear(less(SBinaryOp(x, Operator.DIV, two), y))
+    assert session.is_nonlinear(less(SBinaryOp(two, Operator.DIV, x), y))
+    assert session.is_nonlinear(less(SBinaryOp(x, Operator.MUL, y), two))
+    assert session.is_nonlinear(less(SBinaryOp(x, Operator.POW, two), y))
+    assert session.is_nonlinear(less(sin(x), y))
+    assert not session.is_nonlinear(less(sin(two), y))
+
+
+def test_models_evaluate_constant_conditions():
+    cache = Z3QueryCache()
+    converter = Z3SatConverter(cache)
+    converter.add_condition(less(SReal(1.0), x))
+    assert converter.is_sat
+    converter = Z3SatConverter(cache)
+    converter.add_condition(less(SReal(0.0), x)).add_condition(SBoolean(True))
+    assert converter.is_sat
+    assert cache.model_hits == 1
+    session = Z3Session(cache=cache)
+    assert session.check([less(SReal(0.0), x), SBoolean(False)]) == z3.unsat
+
+
+def test_long_chains_convert():
+    total = x
+    for i in range(3000):
+        total = SBinaryOp(total, Operator.ADD, SReal(float(i)))
+    condition = less(total, SReal(0.0))
+    converter = Z3SatConverter()
+    converter.add_condition(condition)
+    assert converter.is_sat
+    assert converter.add_condition(less(SReal(0.0), x)).is_unsat
+
+
+def test_converted_terms_are_not_kept_alive():
+    converter = Z3SatConverter()
+    converter.convert(less(SBinaryOp(x, Operator.ADD, SReal(123.25)), y))
+    # only the variables are still referenced
+    assert set(converter.terms) == {x, y}
+    condition = less(SBinaryOp(x, Operator.ADD, SReal(123.25)), y)
+    converter.convert(condition)
+    assert condition in converter.terms and len(converter.terms) == 5